@@ -0,0 +1,113 @@
+# Configuração de produção do gunicorn para a API (src/api/app.py).
+# Uso: gunicorn -c gunicorn.conf.py src.api.app:app   (a partir de senna-project/)
+#
+# Variáveis de ambiente (todas opcionais):
+#   SENNA_BIND                 endereço de escuta (padrão 0.0.0.0:5001)
+#   SENNA_GUNICORN_WORKERS     processos (padrão: nº de CPUs, mín. 2)
+#   SENNA_GUNICORN_THREADS     threads por processo (padrão 4; 1 = worker sync)
+#   SENNA_GUNICORN_TIMEOUT     segundos até um worker parado ser reiniciado (padrão 180)
+#   SENNA_PRELOAD              1/0 carrega a app no master antes do fork (padrão 1)
+#   SENNA_WARMUP               1/0 processa um MDR sintético antes de aceitar tráfego (padrão 1)
+#   SENNA_MAX_REQUESTS         pedidos por worker antes de reciclá-lo (padrão 500; 0 = nunca)
+#   SENNA_MAX_REQUESTS_JITTER  variação aleatória do limite acima (padrão 50)
+#   SENNA_METRICS_DIR          pasta onde os workers partilham as métricas do /metrics
+#                              (padrão: /dev/shm/senna-metricas; sem /dev/shm, maps/metricas)
+import gc
+import os
+import sys
+import glob
+
+_base = os.path.dirname(os.path.abspath(__file__))
+
+def _env_bool(nome, padrao):
+    return os.getenv(nome, "1" if padrao else "0").strip().lower() in ("1", "true", "yes", "sim")
+
+# mesmo PYTHONPATH do Dockerfile: "src.api..." e "services..." resolvem a partir daqui
+pythonpath = f"{_base},{os.path.join(_base, 'src')}"
+
+bind = os.getenv("SENNA_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("SENNA_GUNICORN_WORKERS", max(2, os.cpu_count() or 1)))
+threads = int(os.getenv("SENNA_GUNICORN_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = int(os.getenv("SENNA_GUNICORN_TIMEOUT", "180"))
+graceful_timeout = 60
+
+# --preload: regexes compiladas, tabela de bancos e mapas de produtos são criados uma vez no
+# master e partilhados pelos workers (copy-on-write) em vez de serem recriados por processo
+preload_app = _env_bool("SENNA_PRELOAD", True)
+aquecer_app = _env_bool("SENNA_WARMUP", True)
+
+# recicla workers periodicamente para limitar o crescimento de memória do PIL/poppler no OCR;
+# os jobs assíncronos em curso no worker reciclado são esperados/devolvidos à fila no worker_exit
+max_requests = int(os.getenv("SENNA_MAX_REQUESTS", "500"))
+max_requests_jitter = int(os.getenv("SENNA_MAX_REQUESTS_JITTER", "50"))
+
+# espera pelos jobs em curso no encerramento de um worker: abaixo do graceful_timeout, depois do
+# qual o master mata o worker, para ainda haver tempo de devolver à fila os que não terminaram
+espera_jobs = max(1, graceful_timeout - 5)
+
+def _pasta_metricas():
+    # tmpfs: os workers regravam o snapshot a cada SENNA_METRICS_PERSIST_SECONDS; o /tmp do
+    # container é overlay (lento) e pode nem ser gravável
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return os.path.join("/dev/shm", "senna-metricas")
+    return os.path.join(os.getenv("SENNA_MAPS_DIR") or os.path.join(_base, "maps"), "metricas")
+
+# cada worker grava as suas métricas nesta pasta e o /metrics soma todas; definida antes do
+# import da app (Config lê a variável no import)
+metricas_dir = os.environ.setdefault("SENNA_METRICS_DIR", _pasta_metricas())
+
+def _modulo_da_app(wsgi_app):
+    # o Flask foi criado com __name__, que é "src.api.app" ou "api.app" conforme o import
+    return sys.modules[wsgi_app.import_name]
+
+def _aquecer(log, wsgi_app, onde):
+    try:
+        _modulo_da_app(wsgi_app).aquecer()
+        log.info("Aquecimento concluído (%s).", onde)
+    except Exception as e:
+        # um aquecimento falhado não impede o serviço; o primeiro pedido paga o custo
+        log.warning("Falha no aquecimento (%s): %s", onde, e)
+
+def on_starting(server):
+    # os contadores recomeçam a cada arranque do servidor
+    os.makedirs(metricas_dir, exist_ok=True)
+    for caminho in glob.glob(os.path.join(metricas_dir, "metricas_*.json")):
+        os.remove(caminho)
+
+def worker_exit(server, worker):
+    # no processo do worker: sem isso as threads dos jobs morriam a meio e o job ficava
+    # "running" até SENNA_JOB_STALE_SECONDS, atrasando também o callback
+    try:
+        devolvidos = _modulo_da_app(worker.wsgi).encerrar(espera_jobs)
+        if devolvidos:
+            server.log.info("Worker %s devolveu %s job(s) à fila.", worker.pid, devolvidos)
+    except Exception as e:
+        server.log.warning("Falha ao encerrar a fila de jobs do worker %s: %s", worker.pid, e)
+
+    # o estado das métricas desde a última gravação periódica não se perde
+    from services.metrics import metrics
+    try:
+        metrics.persistir(metricas_dir)
+    except OSError as e:
+        server.log.warning("Falha ao gravar as métricas do worker %s: %s", worker.pid, e)
+
+def child_exit(server, worker):
+    # worker reciclado/encerrado: as suas métricas passam para o arquivo dos encerrados
+    from services.metrics import Metrics
+    try:
+        Metrics.consolidar(metricas_dir, worker.pid)
+    except OSError as e:
+        server.log.warning("Falha ao consolidar as métricas do worker %s: %s", worker.pid, e)
+
+def when_ready(server):
+    if preload_app and aquecer_app:
+        _aquecer(server.log, server.app.wsgi(), "master")
+    if preload_app:
+        # move o que já existe para a geração permanente: o GC dos workers não volta a
+        # tocar nesses objetos e as páginas herdadas do master continuam partilhadas
+        gc.freeze()
+
+def post_worker_init(worker):
+    if aquecer_app and not preload_app:
+        _aquecer(worker.log, worker.wsgi, f"worker {worker.pid}")
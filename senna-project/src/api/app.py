@@ -1,7 +1,10 @@
-from flask import Flask, request, jsonify
-import tempfile
-import os
+from flask import Flask, request, jsonify, url_for, Response, stream_with_context, g
+import time
 import uuid
+import logging
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from unidecode import unidecode
 
 # ✅ imports ajustados para a nova estrutura
@@ -9,50 +12,274 @@ from services.pdf_decryptor import PDFDecryptor
 from services.pdf_text_extractor import PDFTextExtractor
 from services.pdf_data_extractor import PDFDataExtractor
 from services.senninha import Senninha
+from services.text_cache import TextCache
+from services.job_queue import JobQueue
+from handlers.results_db import ResultsDB
+from services.metrics import metrics, HTTP_SEGUNDOS
+from config import Config
+from utils.log_config import configurar_logging
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_UPLOAD_MB * 1024 * 1024
+
+# logging, cache de texto, fila de jobs e base de resultados nascem na primeira utilização
+# (pedido, aquecimento ou __main__), não no import: importar a app não cria pastas nem SQLite
+_servicos = {}
+_servicos_lock = threading.Lock()
+
+def _servico(nome, criar):
+    if nome not in _servicos:
+        with _servicos_lock:
+            if nome not in _servicos:
+                _servicos[nome] = criar()
+    return _servicos[nome]
+
+def _iniciar_logging():
+    _servico("logging", configurar_logging)
+
+def _text_cache():
+    return _servico("text_cache", TextCache)
+
+def _job_queue():
+    return _servico("job_queue", lambda: JobQueue(processar=_processar_job))
+
+def _results_db():
+    return _servico("results_db", ResultsDB)
+
+def encerrar(timeout=30):
+    """
+    Fim do processo (worker_exit do gunicorn): para a fila de jobs deste processo, se chegou a
+    ser criada, esperando até timeout segundos pelos jobs em curso. Devolve quantos voltaram à fila.
+    """
+    fila = _servicos.get("job_queue")
+    return fila.stop(timeout) if fila is not None else 0
+
+@app.before_request
+def _inicio_pedido():
+    _iniciar_logging()
+    if Config.METRICS_DIR:
+        # o snapshot vai para a pasta partilhada numa thread, não a cada pedido
+        metrics.persistir_periodicamente(Config.METRICS_DIR, Config.METRICS_PERSIST_SECONDS)
+    g.inicio_pedido = time.perf_counter()
+
+@app.after_request
+def _medir_pedido(response):
+    # em /perfilamento/lote (streaming) mede o tempo até o início da resposta
+    inicio = g.pop("inicio_pedido", None)
+    if inicio is not None:
+        rota = request.url_rule.rule if request.url_rule else "desconhecida"
+        metrics.observar(HTTP_SEGUNDOS, time.perf_counter() - inicio,
+                         rota=rota, metodo=request.method, status=response.status_code)
+    return response
 
 @app.route('/perfilamento', methods=['POST'])
 def perfilamento():
-    print("📥 Requisição recebida para /perfilamento")
+    logger.info("📥 Requisição recebida para /perfilamento")
 
     if 'mdr' not in request.files:
-        print("❌ Campo 'mdr' não foi enviado.")
+        logger.warning("❌ Campo 'mdr' não foi enviado.")
         return jsonify({"error": "Arquivo PDF não enviado no campo 'mdr'"}), 400
 
     arquivo = request.files['mdr']
+    return jsonify(processar_mapa(arquivo.read()))
+
+@app.route('/perfilamento/lote', methods=['POST'])
+def perfilamento_lote():
+    """
+    Vários MDR num único pedido: todos os arquivos do campo 'mdr' (PDFs e/ou .zip com PDFs)
+    são processados em paralelo e a resposta é NDJSON, uma linha por mapa na ordem em que
+    terminam, no formato de /perfilamento mais o campo "arquivo" com o nome enviado.
+    """
+    logger.info("📥 Requisição recebida para /perfilamento/lote")
+
+    arquivos = request.files.getlist('mdr')
+    if not arquivos:
+        logger.warning("❌ Campo 'mdr' não foi enviado.")
+        return jsonify({"error": "Arquivos PDF não enviados no campo 'mdr'"}), 400
+
+    try:
+        itens = list(_itens_do_lote(arquivos))
+    except (zipfile.BadZipFile, ValueError) as e:
+        logger.warning(f"❌ Zip inválido no lote: {e}")
+        return jsonify({"error": f"Arquivo zip inválido: {e}"}), 400
+    logger.info(f"🗂️ Lote com {len(itens)} mapas.")
+
+    def gerar():
+        executor = ThreadPoolExecutor(max_workers=Config.BATCH_WORKERS)
+        try:
+            futuros = {executor.submit(_processar_item_lote, ler): nome for nome, ler in itens}
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                yield app.json.dumps({"arquivo": futuros[futuro], **resultado}) + "\n"
+        finally:
+            # cliente desconectado: não processa o resto do lote
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(stream_with_context(gerar()), mimetype="application/x-ndjson")
+
+def _itens_do_lote(arquivos):
+    """
+    (nome, função que lê os bytes) de cada PDF enviado, abrindo os .zip. Os limites de
+    Config.BATCH_ZIP_* são verificados pelo diretório central, antes de descompactar qualquer
+    membro (ValueError acima deles); membros que não são .pdf nunca são lidos.
+    """
+    max_membro = Config.BATCH_ZIP_MAX_MEMBER_MB * 1024 * 1024
+    max_total = Config.BATCH_ZIP_MAX_TOTAL_MB * 1024 * 1024
+    membros = total = 0
+    for arquivo in arquivos:
+        nome = arquivo.filename or "mdr.pdf"
+        if nome.lower().endswith(".zip"):
+            pacote = zipfile.ZipFile(arquivo.stream)
+            for info in pacote.infolist():
+                if info.is_dir():
+                    continue
+                if not info.filename.lower().endswith(".pdf"):
+                    logger.warning(f"⚠️ Ignorado no lote (não é .pdf): {nome}/{info.filename}")
+                    continue
+                membros += 1
+                total += info.file_size
+                if membros > Config.BATCH_ZIP_MAX_MEMBERS:
+                    raise ValueError(f"mais de {Config.BATCH_ZIP_MAX_MEMBERS} PDFs nos zip do lote")
+                if info.file_size > max_membro:
+                    raise ValueError(f"{info.filename} tem mais de {Config.BATCH_ZIP_MAX_MEMBER_MB} MB descompactado")
+                if total > max_total:
+                    raise ValueError(f"os zip do lote têm mais de {Config.BATCH_ZIP_MAX_TOTAL_MB} MB descompactados")
+                yield f"{nome}/{info.filename}", (lambda p=pacote, i=info: _ler_membro(p, i))
+        else:
+            yield nome, arquivo.read
+
+def _ler_membro(pacote, info):
+    # o tamanho do diretório central pode mentir: nunca descompacta mais do que o declarado
+    with pacote.open(info) as membro:
+        conteudo = membro.read(info.file_size + 1)
+    if len(conteudo) > info.file_size:
+        raise ValueError(f"{info.filename} descompacta além do tamanho declarado")
+    return conteudo
+
+def _processar_item_lote(ler):
+    try:
+        return processar_mapa(ler())
+    except Exception as e:
+        logger.error(f"🔥 Erro ao ler arquivo do lote: {e}")
+        return _mapa_invalido()
+
+@app.route('/jobs', methods=['POST'])
+def criar_job():
+    """Enfileira o PDF e responde na hora com o id do job (202)."""
+    logger.info("📥 Requisição recebida para /jobs")
+
+    if 'mdr' not in request.files:
+        logger.warning("❌ Campo 'mdr' não foi enviado.")
+        return jsonify({"error": "Arquivo PDF não enviado no campo 'mdr'"}), 400
+
+    callback_url = request.form.get('callback_url') or request.args.get('callback_url')
+    try:
+        job_id = _job_queue().submit(request.files['mdr'].read(), callback_url=callback_url)
+    except ValueError as e:
+        logger.warning(f"❌ callback_url recusado: {e}")
+        return jsonify({"error": f"callback_url inválido: {e}"}), 400
+    logger.info(f"🗂️ Job {job_id} enfileirado.")
+    return jsonify({
+        "job_id": job_id,
+        "status": JobQueue.STATUS_QUEUED,
+        "status_url": url_for('status_job', job_id=job_id)
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def status_job(job_id):
+    """Status e tempos do job; com status "done", "result" traz o mesmo JSON de /perfilamento."""
+    job = _job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado", "job_id": job_id}), 404
+    return jsonify(job)
+
+@app.route('/jobs', methods=['GET'])
+def estatisticas_jobs():
+    """Profundidade da fila e tempos médios de espera/processamento."""
+    return jsonify(_job_queue().stats())
+
+@app.route('/clientes/<nif>', methods=['GET'])
+def consultar_cliente(nif):
+    """
+    Último perfil exportado do NIF (customers e no_perfila) e o histórico, mais recente
+    primeiro, lidos da base de resultados; ?historico=N limita o histórico (padrão configurável).
+    """
+    limite = request.args.get('historico', default=Config.RESULTS_HISTORY_LIMIT, type=int)
+    limite = min(max(limite, 1), 500)
+    cliente = _results_db().consultar_nif(nif.strip(), limite=limite)
+    if cliente is None:
+        return jsonify({"error": "NIF sem perfis exportados", "nif": nif}), 404
+    return jsonify(cliente)
+
+@app.route('/metrics', methods=['GET'])
+def metricas():
+    """
+    Métricas no formato de exposição do Prometheus: duração por etapa do pipeline, páginas
+    (texto/OCR), blocos e linhas por página e duração dos pedidos HTTP. Com SENNA_METRICS_DIR
+    (gunicorn com vários workers) soma os registros de todos os workers.
+    """
+    registro = metrics.agregado(Config.METRICS_DIR) if Config.METRICS_DIR else metrics
+    return Response(registro.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def aquecer():
+    """
+    Passa um MDR sintético pelo pipeline completo (sem cache de texto nem fila de jobs) para
+    compilar regexes e carregar tabelas de bancos/produtos antes do primeiro pedido real.
+    Com o gunicorn em --preload isso corre no master e os workers herdam tudo via fork.
+    """
+    from utils.mapa_sintetico import pdf_mapa_exemplo
+
+    _iniciar_logging()
+    inicio = time.perf_counter()
+    decrypted_stream = PDFDecryptor().decrypt_bytes(pdf_mapa_exemplo())
+    textos = PDFTextExtractor().extract_text_from_stream(decrypted_stream, "aquecimento.pdf")
+    df = Senninha.aplicar(PDFDataExtractor().extract_data(textos))
+    # mesma serialização da resposta de /perfilamento
+    for registro in df.where(df.notnull(), None).to_dict(orient="records"):
+        renomear_chaves_para_snake_case(registro)
+    logger.info(f"🔥 Aquecimento concluído em {time.perf_counter() - inicio:.2f}s ({len(df)} linhas).")
+    # o MDR sintético não entra nas métricas (nem é herdado pelos workers do gunicorn)
+    metrics.zerar()
+    return not df.empty
+
+def processar_mapa(conteudo):
+    """Pipeline completo de um MDR em memória; devolve o dict de resposta de /perfilamento."""
     filename = f"{uuid.uuid4().hex}.pdf"
-    temp_input = os.path.join(tempfile.gettempdir(), filename)
-    print(f"📎 PDF salvo temporariamente como: {temp_input}")
-    arquivo.save(temp_input)
+    logger.info(f"📎 PDF recebido em memória como: {filename} ({len(conteudo)} bytes)")
 
-    decrypted_path = None
     try:
-        print("🔐 Descriptografando PDF...")
-        decryptor = PDFDecryptor()
-        decrypted_path = decryptor.decrypt_single_pdf(temp_input)
-        if not decrypted_path:
-            print("❌ Falha na descriptografia.")
-            return _mapa_invalido_response()
-
-        print(f"📄 Extraindo texto de: {decrypted_path}")
-        extractor = PDFTextExtractor(
-            input_folder=os.path.dirname(decrypted_path),
-            processed_folder=os.path.dirname(decrypted_path)
-        )
-        textos = extractor.extract_text_from_pdfs([decrypted_path])
-        if not textos:
-            print("❌ Nenhum texto foi extraído.")
-            return _mapa_invalido_response()
-
-        print("📊 Extraindo dados estruturados...")
+        text_cache = _text_cache()
+        chave = text_cache.hash_bytes(conteudo) if text_cache.enabled else None
+        paginas = text_cache.get(chave)
+        if paginas is not None:
+            logger.debug("♻️ Texto recuperado do cache (mapa já processado).")
+            textos = {filename: paginas}
+        else:
+            logger.debug("🔐 Descriptografando PDF...")
+            decryptor = PDFDecryptor()
+            decrypted_stream = decryptor.decrypt_bytes(conteudo)
+            if decrypted_stream is None:
+                logger.warning("❌ Falha na descriptografia.", extra={"arquivo": filename, "etapa": "descriptografia"})
+                return _mapa_invalido()
+
+            logger.debug(f"📄 Extraindo texto de: {filename}")
+            extractor = PDFTextExtractor()
+            textos = extractor.extract_text_from_stream(decrypted_stream, filename)
+            if not textos:
+                logger.warning("❌ Nenhum texto foi extraído.", extra={"arquivo": filename, "etapa": "extracao_texto"})
+                return _mapa_invalido()
+            text_cache.put(chave, textos.get(filename))
+
+        logger.debug("📊 Extraindo dados estruturados...")
         data_extractor = PDFDataExtractor()
         df = data_extractor.extract_data(textos)
         if df.empty:
-            print("❌ Nenhum dado estruturado encontrado.")
-            return _mapa_invalido_response()
+            logger.warning("❌ Nenhum dado estruturado encontrado.", extra={"arquivo": filename, "etapa": "parsing"})
+            return _mapa_invalido()
 
-        print("🧠 Aplicando perfilamento...")
+        logger.debug("🧠 Aplicando perfilamento...")
         df = Senninha.aplicar(df)
         df = df.where(df.notnull(), None)
 
@@ -60,45 +287,37 @@ def perfilamento():
         nif = df.iloc[0].get('nif', '')
         perfila = any(df['perfila'])
 
-        print(f"✅ Resultado: {nome} - {nif} - {'PERFILA' if perfila else 'NÃO PERFILA'}")
+        logger.info(f"✅ Resultado: {nome} - {nif} - {'PERFILA' if perfila else 'NÃO PERFILA'}",
+                    extra={"arquivo": filename, "nif": nif, "perfila": bool(perfila)})
 
         info = df.to_dict(orient="records")
         info_snake = [renomear_chaves_para_snake_case(reg) for reg in info]
 
-        return jsonify({
+        return {
             "nome": unidecode(nome.lower().replace(" ", "")) if nome else None,
             "nif": nif,
             "perfila": bool(perfila),
             "valid_map": True,
             "info_institutions": info_snake
-        })
+        }
 
     except Exception as e:
-        print(f"🔥 Erro crítico no processamento: {e}")
-        return _mapa_invalido_response()
+        logger.exception(f"🔥 Erro crítico no processamento: {e}", extra={"arquivo": filename})
+        return _mapa_invalido()
 
-    finally:
-        # limpeza de temporários
-        try:
-            if os.path.exists(temp_input):
-                os.remove(temp_input)
-        except Exception:
-            pass
-        try:
-            if decrypted_path and os.path.exists(decrypted_path):
-                os.remove(decrypted_path)
-        except Exception:
-            pass
+def _processar_job(conteudo):
+    # serializado pelo mesmo provider JSON do Flask que responde /perfilamento
+    return app.json.dumps(processar_mapa(conteudo))
 
-def _mapa_invalido_response():
-    print("⚠️ Resposta gerada: Mapa inválido")
-    return jsonify({
+def _mapa_invalido():
+    logger.info("⚠️ Resposta gerada: Mapa inválido")
+    return {
         "nome": None,
         "nif": None,
         "perfila": False,
         "valid_map": False,
         "info_institutions": []
-    })
+    }
 
 def renomear_chaves_para_snake_case(d: dict) -> dict:
     """normaliza chaves e strings: minúsculas, sem acentos, sem espaços/hífens."""
@@ -113,5 +332,6 @@ def renomear_chaves_para_snake_case(d: dict) -> dict:
     return resultado
 
 if __name__ == '__main__':
+    _iniciar_logging()
     # ✅ escutar em todas as interfaces para que o n8n (outro container) consiga acessar
     app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
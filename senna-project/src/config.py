@@ -2,7 +2,8 @@ import os
 
 class Config:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    MAPS_DIR = os.path.join(BASE_DIR, "..", "maps")
+    # SENNA_MAPS_DIR troca a raiz de todas as pastas de dados (ex.: benchmarks num diretório temporário)
+    MAPS_DIR = os.getenv("SENNA_MAPS_DIR") or os.path.join(BASE_DIR, "..", "maps")
 
     # Pastas fonte e destino
     ENCRYPTED_FOLDER = os.path.join(MAPS_DIR, "encrypted")
@@ -14,17 +15,105 @@ class Config:
     OUTPUT_FOLDER = os.path.join(MAPS_DIR, "outputs")
     CSV_OUTPUT = os.path.join(OUTPUT_FOLDER, "csv")
     JSON_OUTPUT = os.path.join(OUTPUT_FOLDER, "json")
+    PARQUET_OUTPUT = os.path.join(OUTPUT_FOLDER, "parquet")
     CUSTOMERS_OUTPUT = os.path.join(MAPS_DIR, "customers")
 
-    # Criar pastas se não existirem
-    for folder in [
-        ENCRYPTED_FOLDER,
-        DECRYPTED_FOLDER,
-        PROCESSED_ENCRYPTED_FOLDER,
-        PROCESSED_DECRYPTED_FOLDER,
-        OUTPUT_FOLDER,
-        CSV_OUTPUT,
-        JSON_OUTPUT,
-        CUSTOMERS_OUTPUT
-    ]:
-        os.makedirs(folder, exist_ok=True)
\ No newline at end of file
+    # Resultados da extração: segmentos JSON Lines append-only (+ o antigo array JSON, lido até ser compactado)
+    RESULT_STORE_FOLDER = os.path.join(JSON_OUTPUT, "resultado_extracao")
+    RESULT_JSON_LEGACY = os.path.join(JSON_OUTPUT, "resultado_extracao.json")
+
+    # Exportação analítica em Parquet (particionada por anomapa/mesmapa)
+    PARQUET_ROW_GROUP_SIZE = int(os.getenv("SENNA_PARQUET_ROW_GROUP_SIZE", "50000"))
+
+    # Cache de texto extraído (chave = SHA-256 do PDF original), com limite de tamanho em disco
+    TEXT_CACHE_FOLDER = os.path.join(MAPS_DIR, "cache", "texto")
+    TEXT_CACHE_MAX_MB = int(os.getenv("SENNA_TEXT_CACHE_MAX_MB", "512"))
+
+    # OCR: threads do poppler e workers do Tesseract por documento
+    OCR_WORKERS = int(os.getenv("SENNA_OCR_WORKERS", os.cpu_count() or 1))
+    # OCR adaptativo: passagem rápida em tons de cinza binarizados e nova passagem em DPI alto só
+    # para as páginas com confiança baixa ou sem "Total em dívida"/"Produto financeiro" legíveis
+    OCR_ADAPTATIVO = os.getenv("SENNA_OCR_ADAPTIVE", "1") != "0"
+    OCR_DPI = int(os.getenv("SENNA_OCR_DPI", "200"))
+    OCR_DPI_ALTO = int(os.getenv("SENNA_OCR_DPI_HIGH", "300"))
+    OCR_CONFIANCA_MINIMA = float(os.getenv("SENNA_OCR_MIN_CONFIDENCE", "75"))
+    # 6 = bloco uniforme: lê as linhas rótulo/valor do MDR de cima para baixo
+    OCR_PSM = int(os.getenv("SENNA_OCR_PSM", "6"))
+
+    # API assíncrona (/jobs): fila SQLite e pool de workers por processo
+    JOBS_DB = os.path.join(MAPS_DIR, "jobs", "jobs.sqlite")
+    JOB_WORKERS = int(os.getenv("SENNA_JOB_WORKERS", "2"))
+    JOB_STALE_SECONDS = int(os.getenv("SENNA_JOB_STALE_SECONDS", "900"))
+    JOB_RETENTION_HOURS = int(os.getenv("SENNA_JOB_RETENTION_HOURS", "24"))
+    JOB_CALLBACK_TIMEOUT = int(os.getenv("SENNA_JOB_CALLBACK_TIMEOUT", "10"))
+    # Intervalo em que o worker renova o heartbeat do job em curso: só um job sem heartbeat há
+    # mais de JOB_STALE_SECONDS (worker morto) volta a ser reivindicado
+    JOB_HEARTBEAT_SECONDS = int(os.getenv("SENNA_JOB_HEARTBEAT_SECONDS", "60"))
+    # Hosts aceitos no callback_url (separados por vírgula; ".exemplo.pt" aceita os subdomínios).
+    # Vazio: qualquer host com endereço público (nunca loopback, rede privada ou link-local)
+    JOB_CALLBACK_ALLOWED_HOSTS = [
+        h.strip().lower() for h in os.getenv("SENNA_JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if h.strip()
+    ]
+
+    # Mapas processados em paralelo por pedido em /perfilamento/lote
+    BATCH_WORKERS = int(os.getenv("SENNA_BATCH_WORKERS", "4"))
+    # Limites dos uploads: tamanho do pedido (413 acima dele, em todas as rotas) e, nos .zip do
+    # lote, número de PDFs e tamanho descompactado de cada um e do total (400 acima deles)
+    MAX_UPLOAD_MB = int(os.getenv("SENNA_MAX_UPLOAD_MB", "100"))
+    BATCH_ZIP_MAX_MEMBERS = int(os.getenv("SENNA_BATCH_ZIP_MAX_MEMBERS", "500"))
+    BATCH_ZIP_MAX_MEMBER_MB = int(os.getenv("SENNA_BATCH_ZIP_MAX_MEMBER_MB", "50"))
+    BATCH_ZIP_MAX_TOTAL_MB = int(os.getenv("SENNA_BATCH_ZIP_MAX_TOTAL_MB", "500"))
+
+    # Registro de progresso por PDF (SHA-256 do conteúdo): evita reprocessar e exportar duplicados
+    LEDGER_DB = os.path.join(MAPS_DIR, "ledger", "processamento.sqlite")
+    LEDGER_ENABLED = os.getenv("SENNA_LEDGER", "1") != "0"
+    LEDGER_STALE_SECONDS = int(os.getenv("SENNA_LEDGER_STALE_SECONDS", "900"))
+
+    # Modo daemon (main.py --watch): debounce de arquivos em gravação e micro-lotes
+    WATCH_DEBOUNCE_SECONDS = float(os.getenv("SENNA_WATCH_DEBOUNCE_SECONDS", "2"))
+    WATCH_BATCH_SIZE = int(os.getenv("SENNA_WATCH_BATCH_SIZE", "20"))
+    WATCH_BATCH_WINDOW_SECONDS = float(os.getenv("SENNA_WATCH_BATCH_WINDOW_SECONDS", "1"))
+    WATCH_POLL_SECONDS = float(os.getenv("SENNA_WATCH_POLL_SECONDS", "2"))
+    WATCH_RESCAN_SECONDS = float(os.getenv("SENNA_WATCH_RESCAN_SECONDS", "60"))
+    # 0 força o polling (ex.: pastas em NFS/SMB, onde o inotify não recebe eventos)
+    WATCH_INOTIFY = os.getenv("SENNA_WATCH_INOTIFY", "1") != "0"
+
+    # Base SQLite com o histórico dos perfis por NIF (GET /clientes/<nif>)
+    RESULTS_DB = os.path.join(OUTPUT_FOLDER, "resultados.sqlite")
+    RESULTS_CACHE_SIZE = int(os.getenv("SENNA_RESULTS_CACHE_SIZE", "1024"))
+    RESULTS_HISTORY_LIMIT = int(os.getenv("SENNA_RESULTS_HISTORY_LIMIT", "20"))
+
+    # Métricas: resumo de tempos por execução do main.py e pasta onde os workers do gunicorn
+    # partilham os seus registros para o /metrics (sem ela, cada worker expõe só os seus)
+    METRICS_OUTPUT = os.path.join(OUTPUT_FOLDER, "metricas")
+    METRICS_DIR = os.getenv("SENNA_METRICS_DIR")
+    # Intervalo (s) em que cada worker regrava o seu snapshot em METRICS_DIR (só se mudou)
+    METRICS_PERSIST_SECONDS = float(os.getenv("SENNA_METRICS_PERSIST_SECONDS", "5"))
+
+    # Logging (utils/log_config.py): nível (WARNING = modo silencioso), formato "texto" ou "json"
+    # (uma linha JSON por registro) e arquivo que recebe os erros (relativo à pasta de execução)
+    LOG_LEVEL = os.getenv("SENNA_LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("SENNA_LOG_FORMAT", "texto").lower()
+    LOG_ERROR_FILE = os.getenv("SENNA_LOG_ERROR_FILE", os.path.join(".", "logs", "erros_processamento.txt"))
+
+    # Threads para gravar os JSON por cliente
+    EXPORT_WORKERS = int(os.getenv("SENNA_EXPORT_WORKERS", "8"))
+
+    # Nomes de instituição distintos memorizados pelo resolvedor de bancos
+    BANK_CACHE_SIZE = int(os.getenv("SENNA_BANK_CACHE_SIZE", "4096"))
+
+    @classmethod
+    def criar_pastas(cls):
+        """Cria as pastas do pipeline em lote (no início do processamento, não no import)."""
+        for folder in [
+            cls.ENCRYPTED_FOLDER,
+            cls.DECRYPTED_FOLDER,
+            cls.PROCESSED_ENCRYPTED_FOLDER,
+            cls.PROCESSED_DECRYPTED_FOLDER,
+            cls.OUTPUT_FOLDER,
+            cls.CSV_OUTPUT,
+            cls.JSON_OUTPUT,
+            cls.PARQUET_OUTPUT,
+            cls.CUSTOMERS_OUTPUT
+        ]:
+            os.makedirs(folder, exist_ok=True)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import os
+import uuid
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from config import Config
+from services.senninha import Senninha
+
+# Esquema compacto das colunas conhecidas (textos ficam com dictionary encoding no Parquet;
+# datas como date32; flags como bool). Colunas extras são gravadas com o tipo inferido.
+ESQUEMA_COLUNAS = {
+    'arquivopdf': pa.string(),
+    'paginapdf': pa.string(),
+    'nome': pa.string(),
+    'nif': pa.string(),
+    'instituicao': pa.string(),
+    'banco': pa.string(),
+    'divida': pa.float64(),
+    'litigio': pa.string(),
+    'parcela': pa.float64(),
+    'numdevedores': pa.int16(),
+    'prodfinanceiro': pa.string(),
+    'datinicio': pa.date32(),
+    'datfim': pa.date32(),
+    'entradaincumpr': pa.date32(),
+    'garantias': pa.float32(),
+    'categoria_produto': pa.string(),
+    'perfil_individual': pa.bool_(),
+    'perfila': pa.bool_(),
+    'total_nif_mapa_banco': pa.float64(),
+    'pari_persi': pa.bool_(),
+    'reprovacao_litigio': pa.bool_(),
+    'reprovacao_garantia': pa.bool_(),
+    'reprovacao_instituicao': pa.bool_(),
+}
+
+COLUNAS_PARTICAO = ['anomapa', 'mesmapa']
+ANO_REGEX = r'((?:19|20|21)\d{2})'
+ESQUEMA_PARTICAO = pa.schema([(coluna, pa.string()) for coluna in COLUNAS_PARTICAO])
+PARTICIONAMENTO = ds.partitioning(ESQUEMA_PARTICAO, flavor="hive")
+# esquema de leitura: colunas ausentes em arquivos de execuções antigas são lidas como nulas
+ESQUEMA_LEITURA = pa.unify_schemas([pa.schema(list(ESQUEMA_COLUNAS.items())), ESQUEMA_PARTICAO])
+
+class ParquetStore:
+    """
+    Exportação analítica em Parquet, particionada por anomapa/mesmapa (hive: anomapa=.../mesmapa=...).
+    Cada execução grava arquivos novos nas partições dos seus mapas, ordenados por nif e
+    instituição para que as estatísticas dos row groups permitam descartar blocos nas consultas.
+    """
+
+    def __init__(self, folder=Config.PARQUET_OUTPUT, row_group_size=Config.PARQUET_ROW_GROUP_SIZE):
+        self.folder = folder
+        self.row_group_size = row_group_size
+        os.makedirs(self.folder, exist_ok=True)
+
+    @staticmethod
+    def _to_table(dataframe):
+        df = dataframe.copy()
+        if 'instituicao' in df.columns and 'banco' not in df.columns:
+            df['banco'] = Senninha.bank_resolver().resolve(df['instituicao'].astype(str))
+
+        for coluna in COLUNAS_PARTICAO:
+            if coluna not in df.columns:
+                df[coluna] = None
+            df[coluna] = df[coluna].map(lambda v: None if pd.isna(v) else str(v))
+        # linhas antigas traziam só o século em anomapa ("20"): o ano vem do mesmapa ("maio de 2024")
+        ano_mes = df['mesmapa'].str.extract(ANO_REGEX, expand=False)
+        incompleto = ~df['anomapa'].fillna("").str.fullmatch(ANO_REGEX)
+        df.loc[incompleto & ano_mes.notna(), 'anomapa'] = ano_mes
+
+        campos = []
+        for coluna in df.columns:
+            tipo = pa.string() if coluna in COLUNAS_PARTICAO else ESQUEMA_COLUNAS.get(coluna)
+            if tipo == pa.date32():
+                df[coluna] = pd.to_datetime(df[coluna], format="%Y-%m-%d", errors="coerce").dt.date
+            elif tipo in (pa.float64(), pa.float32(), pa.int16()):
+                df[coluna] = pd.to_numeric(df[coluna], errors="coerce")
+            elif tipo == pa.bool_():
+                df[coluna] = df[coluna].astype("boolean")
+            elif tipo == pa.string():
+                df[coluna] = df[coluna].map(lambda v: None if v is None or (isinstance(v, float) and pd.isna(v)) else str(v))
+            if tipo is None:
+                tipo = pa.Array.from_pandas(df[coluna]).type
+            campos.append(pa.field(coluna, tipo))
+
+        df = df.sort_values([c for c in ('nif', 'instituicao') if c in df.columns], na_position="last", kind="stable")
+        return pa.Table.from_pandas(df, schema=pa.schema(campos), preserve_index=False)
+
+    def append(self, dataframe):
+        """Grava as linhas do DataFrame como novos arquivos nas partições anomapa/mesmapa."""
+        if dataframe.empty:
+            return 0
+        tabela = self._to_table(dataframe)
+        tag = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        ds.write_dataset(
+            tabela,
+            self.folder,
+            format="parquet",
+            partitioning=PARTICIONAMENTO,
+            basename_template=f"{tag}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+            max_rows_per_group=self.row_group_size,
+            min_rows_per_group=min(self.row_group_size, tabela.num_rows),
+        )
+        return tabela.num_rows
@@ -1,20 +1,17 @@
 import os
+import logging
+import csv
 import json
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-import numpy as np
 from config import Config
+from handlers.result_store import ResultStore
+from handlers.results_db import ResultsDB, TIPO_CLIENTE
+from services.senninha import Senninha
+from services.metrics import metrics
+from utils.arquivos import converter_json, gravar_atomico
 
-# 🔄 Conversor robusto para JSON (resolve problemas com tipos NumPy)
-def _converter_json(obj):
-    if isinstance(obj, (np.bool_, bool)):
-        return bool(obj)
-    if isinstance(obj, (np.integer, int)):
-        return int(obj)
-    if isinstance(obj, (np.floating, float)):
-        return float(obj)
-    if isinstance(obj, (np.ndarray,)):
-        return obj.tolist()
-    return str(obj)
+logger = logging.getLogger(__name__)
 
 class PDFOutputHandler:
     def __init__(self):
@@ -24,54 +21,83 @@ class PDFOutputHandler:
 
         self.csv_path = os.path.join(self.csv_folder, "resultado_extracao.csv")
         self.json_path = os.path.join(self.json_folder, "resultado_extracao.json")
+        self.result_store = ResultStore(legacy_json_path=self.json_path)
+        self._parquet_store = None
+        self.results_db = ResultsDB()
 
         os.makedirs(self.csv_folder, exist_ok=True)
         os.makedirs(self.json_folder, exist_ok=True)
         os.makedirs(self.client_json_folder, exist_ok=True)
 
+    @metrics.cronometrado("exportacao_csv")
     def save_to_csv(self, dataframe):
         if not dataframe.empty:
             mode = 'a' if os.path.exists(self.csv_path) else 'w'
             header = not os.path.exists(self.csv_path)
+            if not header:
+                dataframe = self._alinhar_ao_cabecalho_csv(dataframe)
             dataframe.to_csv(self.csv_path, mode=mode, header=header, index=False)
-            print(f"📄 Dados adicionados ao CSV: {self.csv_path}")
+            logger.info(f"📄 Dados adicionados ao CSV: {self.csv_path}")
         else:
-            print("⚠️ Nenhum dado a salvar no CSV.")
+            logger.warning("⚠️ Nenhum dado a salvar no CSV.")
+
+    def _alinhar_ao_cabecalho_csv(self, dataframe):
+        """Mantém as colunas do CSV existente (o append não reescreve o cabeçalho)."""
+        with open(self.csv_path, 'r', encoding='utf-8', newline='') as f:
+            cabecalho = next(csv.reader(f), None)
+        if not cabecalho or list(dataframe.columns) == cabecalho:
+            return dataframe
+        novas = [c for c in dataframe.columns if c not in cabecalho]
+        if novas:
+            logger.warning(f"⚠️ Colunas fora do cabeçalho do CSV existente não foram gravadas nele: {novas}")
+        return dataframe.reindex(columns=cabecalho)
+
+    @property
+    def parquet_store(self):
+        # pyarrow é carregado só quando há exportação Parquet
+        if self._parquet_store is None:
+            from handlers.parquet_store import ParquetStore
+            self._parquet_store = ParquetStore()
+        return self._parquet_store
+
+    @metrics.cronometrado("exportacao_parquet")
+    def save_to_parquet(self, dataframe):
+        """Exporta as linhas para o dataset Parquet particionado (consultas em handlers.results_query)."""
+        if not dataframe.empty:
+            linhas = self.parquet_store.append(dataframe)
+            logger.info(f"📦 {linhas} linhas exportadas para o Parquet: {self.parquet_store.folder}")
+        else:
+            logger.warning("⚠️ Nenhum dado a salvar no Parquet.")
 
+    @metrics.cronometrado("exportacao_json")
     def save_to_json(self, dataframe):
+        """Acrescenta só as linhas desta execução ao armazém JSON Lines (sem reler o histórico)."""
         if not dataframe.empty:
-            if os.path.exists(self.json_path):
-                with open(self.json_path, 'r', encoding='utf-8') as json_file:
-                    try:
-                        existing_data = json.load(json_file)
-                    except json.JSONDecodeError:
-                        existing_data = []
-            else:
-                existing_data = []
-
-            new_data = dataframe.to_dict(orient="records")
-            new_data = json.loads(json.dumps(new_data, default=_converter_json))
-
-            updated_data = existing_data + new_data
-
-            with open(self.json_path, 'w', encoding='utf-8') as json_file:
-                json.dump(updated_data, json_file, ensure_ascii=False, indent=2)
-            print(f"🧾 Dados adicionados ao JSON geral: {self.json_path}")
+            segmento = self.result_store.append(dataframe)
+            logger.info(f"🧾 Dados adicionados ao JSON geral: {segmento}")
         else:
-            print("⚠️ Nenhum dado a salvar no JSON geral.")
+            logger.warning("⚠️ Nenhum dado a salvar no JSON geral.")
 
+    @metrics.cronometrado("exportacao_clientes")
     def save_json_by_client(self, dataframe):
-        """Salva um arquivo JSON separado por NIF com bloco de resumo e lista de dívidas."""
+        """
+        Salva um arquivo JSON separado por NIF com bloco de resumo e lista de dívidas.
+        Os registros são convertidos uma única vez (to_dict do DataFrame inteiro), repartidos
+        por NIF com groupby().indices e serializados diretamente; os arquivos são gravados em
+        paralelo (threads), cada um com escrita atômica (arquivo temporário + rename).
+        Os mesmos documentos são acrescentados ao histórico da base de resultados (ResultsDB).
+        """
         if dataframe.empty:
-            print("⚠️ Nenhum dado válido para salvar por cliente.")
+            logger.warning("⚠️ Nenhum dado válido para salvar por cliente.")
             return
 
         df_validos = dataframe[dataframe['nif'].notna()]
-        clientes_salvos = 0
+        registros = df_validos.to_dict(orient="records")
+        map_ids = Senninha.build_map_id(df_validos).tolist()
+        grupos = df_validos.groupby("nif").indices
 
-        for nif, group in df_validos.groupby("nif"):
-            dividas = group.to_dict(orient="records")
-            dividas = json.loads(json.dumps(dividas, default=_converter_json))
+        def salvar(nif, posicoes):
+            dividas = [registros[i] for i in posicoes]
 
             # ✅ Total de dívidas elegíveis
             total_elegivel = sum(item["divida"] for item in dividas if item.get("perfil_individual"))
@@ -80,31 +106,33 @@ class PDFOutputHandler:
             # ✅ Novo: checa se alguma dívida tem pari_persi = True
             pari_persi_cliente = any(item.get("pari_persi") for item in dividas)
 
-            # ✅ Monta o JSON final
-            json_data = {
-                "resumo": {
-                    "nif": str(nif),
-                    "divida_total_elegivel": round(total_elegivel, 2),
-                    "perfila": bool(perfila),
-                    "pari_persi": bool(pari_persi_cliente)
-                },
-                "dividas": dividas
+            resumo = {
+                "nif": str(nif),
+                "divida_total_elegivel": round(total_elegivel, 2),
+                "perfila": bool(perfila),
+                "pari_persi": bool(pari_persi_cliente)
             }
 
             json_path = os.path.join(self.client_json_folder, f"{nif}.json")
+            documento = _json_cliente(resumo, dividas)
+            dividas_db = [dict(dividas[j], map_id=map_ids[i]) for j, i in enumerate(posicoes)]
             try:
-                # ✅ Conversão total antes de salvar
-                serializable_data = json.loads(json.dumps(json_data, default=_converter_json))
-
-                # DEBUG opcional
-                print(f"🧪 Salvando JSON de cliente {nif}")
-                print(json.dumps(serializable_data, indent=2))
-
-                with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(serializable_data, f, ensure_ascii=False, indent=2)
-
-                clientes_salvos += 1
+                gravar_atomico(json_path, documento)
+                return nif, resumo, documento, dividas_db
             except Exception as e:
-                print(f"❌ Erro ao salvar JSON para NIF {nif}: {e}")
-
-        print(f"\n✅ {clientes_salvos} arquivos JSON salvos no novo formato em: {self.client_json_folder}")
\ No newline at end of file
+                logger.error(f"❌ Erro ao salvar JSON para NIF {nif}: {e}", extra={"nif": str(nif), "etapa": "exportacao_clientes"})
+                return None
+
+        with ThreadPoolExecutor(max_workers=Config.EXPORT_WORKERS) as executor:
+            resultados = [r for r in executor.map(lambda item: salvar(*item), grupos.items()) if r]
+        clientes_salvos = len(resultados)
+
+        logger.info(f"✅ {clientes_salvos} arquivos JSON salvos no novo formato em: {self.client_json_folder}")
+        try:
+            self.results_db.gravar_perfis(TIPO_CLIENTE, resultados)
+            logger.info(f"🗄️ {clientes_salvos} perfis acrescentados à base de resultados: {self.results_db.db_path}")
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar perfis na base de resultados: {e}")
+
+def _json_cliente(resumo, dividas):
+    return json.dumps({"resumo": resumo, "dividas": dividas}, ensure_ascii=False, indent=2, default=converter_json)
@@ -0,0 +1,128 @@
+import os
+import json
+import uuid
+import glob
+from datetime import datetime
+from config import Config
+from utils.arquivos import converter_json, criar_temporario
+
+class ResultStore:
+    """
+    Armazém append-only dos resultados de extração em JSON Lines (um registro por linha).
+
+    Cada execução grava apenas as suas linhas num segmento novo ("<tag>.jsonl", com tag
+    ordenável por data), sem ler nem reescrever o histórico. A compactação junta os
+    segmentos (e o antigo resultado_extracao.json, se existir) num único "base-<tag>.jsonl",
+    onde <tag> é o último segmento incluído; a leitura usa a base mais recente e só os
+    segmentos posteriores a ela, então uma compactação interrompida não duplica registros.
+    """
+
+    def __init__(self, folder=Config.RESULT_STORE_FOLDER, legacy_json_path=Config.RESULT_JSON_LEGACY):
+        self.folder = folder
+        self.legacy_json_path = legacy_json_path
+        os.makedirs(self.folder, exist_ok=True)
+
+    @staticmethod
+    def _new_tag():
+        return f"{datetime.now():%Y%m%dT%H%M%S%f}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def _bases(self):
+        return sorted(glob.glob(os.path.join(self.folder, "base-*.jsonl")))
+
+    def _base(self):
+        """Retorna (caminho, tag) da base mais recente, ou (None, "")."""
+        bases = self._bases()
+        if not bases:
+            return None, ""
+        path = bases[-1]
+        return path, os.path.basename(path)[len("base-"):-len(".jsonl")]
+
+    def _segments(self, after_tag=""):
+        segmentos = []
+        for path in sorted(glob.glob(os.path.join(self.folder, "*.jsonl"))):
+            tag = os.path.basename(path)[:-len(".jsonl")]
+            if not tag.startswith("base-") and tag > after_tag:
+                segmentos.append(path)
+        return segmentos
+
+    def append(self, dataframe):
+        """Grava as linhas do DataFrame num segmento novo; retorna o caminho (ou None)."""
+        if dataframe.empty:
+            return None
+        fd, tmp_path = criar_temporario(self.folder, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for record in dataframe.to_dict(orient="records"):
+                f.write(json.dumps(record, ensure_ascii=False, default=converter_json))
+                f.write("\n")
+        # o segmento só fica visível quando completo (tag gerada no momento da publicação)
+        path = os.path.join(self.folder, f"{self._new_tag()}.jsonl")
+        os.replace(tmp_path, path)
+        return path
+
+    def _legacy_records(self):
+        if not self.legacy_json_path or not os.path.exists(self.legacy_json_path):
+            return []
+        with open(self.legacy_json_path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return []
+
+    @staticmethod
+    def _read_jsonl(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_records(self):
+        """Itera todos os registros (dicts), do mais antigo para o mais recente, em streaming."""
+        base, tag = self._base()
+        if base is None:
+            yield from self._legacy_records()
+        else:
+            yield from self._read_jsonl(base)
+        for segmento in self._segments(after_tag=tag):
+            yield from self._read_jsonl(segmento)
+
+    def read_all(self):
+        """Lista com todos os registros (equivalente ao antigo array de resultado_extracao.json)."""
+        return list(self.iter_records())
+
+    def read_dataframe(self):
+        # o pandas só é carregado aqui: a CLI importa o ResultStore e não precisa dele no --help/--compact
+        import pandas as pd
+        return pd.DataFrame(self.read_all())
+
+    def compact(self):
+        """Junta base, segmentos e o JSON legado numa nova base; retorna o número de registros."""
+        base, tag = self._base()
+        segmentos = self._segments(after_tag=tag)
+        legado = base is None and self.legacy_json_path and os.path.exists(self.legacy_json_path)
+        if not segmentos and not legado:
+            return None
+
+        nova_tag = os.path.basename(segmentos[-1])[:-len(".jsonl")] if segmentos else self._new_tag()
+        nova_base = os.path.join(self.folder, f"base-{nova_tag}.jsonl")
+        total = 0
+        fd, tmp_path = criar_temporario(self.folder, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            registros = self._legacy_records() if base is None else self._read_jsonl(base)
+            for record in registros:
+                f.write(json.dumps(record, ensure_ascii=False, default=converter_json))
+                f.write("\n")
+                total += 1
+            for segmento in segmentos:
+                with open(segmento, "r", encoding="utf-8") as seg:
+                    for line in seg:
+                        if line.strip():
+                            f.write(line if line.endswith("\n") else line + "\n")
+                            total += 1
+        os.replace(tmp_path, nova_base)
+
+        # a nova base já cobre tudo: o resto pode ser removido
+        for path in [p for p in self._bases() if p != nova_base] + segmentos:
+            os.remove(path)
+        if legado:
+            os.replace(self.legacy_json_path, self.legacy_json_path + ".migrado")
+        return total
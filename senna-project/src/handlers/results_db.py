@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from config import Config
+
+TIPO_CLIENTE = "cliente"          # mesmo conteúdo de maps/customers/{nif}.json
+TIPO_NAO_PERFILA = "nao_perfila"  # mesmo conteúdo de maps/no_perfila/{nif}.json
+
+class ResultsDB:
+    """
+    Base SQLite com o histórico dos perfis por NIF, alimentada pelas duas exportações por
+    cliente (customers e no_perfila). Cada exportação acrescenta um perfil por NIF (nada é
+    sobrescrito) com o documento JSON gravado no arquivo e as suas dívidas indexadas por
+    nif, mapa e instituição.
+
+    consultar_nif() guarda as respostas num LRU em memória, validado pelo último id do NIF
+    (consulta só ao índice): um perfil novo gravado por outro processo invalida a entrada.
+    """
+
+    def __init__(self, db_path=Config.RESULTS_DB, cache_size=Config.RESULTS_CACHE_SIZE):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS perfis (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nif TEXT NOT NULL,
+                    tipo TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    perfila INTEGER,
+                    divida_total_elegivel REAL,
+                    documento TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS perfis_nif ON perfis (nif, id);
+                CREATE TABLE IF NOT EXISTS dividas (
+                    perfil_id INTEGER NOT NULL REFERENCES perfis (id),
+                    nif TEXT NOT NULL,
+                    map_id TEXT,
+                    instituicao TEXT,
+                    divida REAL,
+                    perfila INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS dividas_nif ON dividas (nif);
+                CREATE INDEX IF NOT EXISTS dividas_map_id ON dividas (map_id);
+                CREATE INDEX IF NOT EXISTS dividas_instituicao ON dividas (instituicao);
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            yield conn
+        finally:
+            conn.close()
+
+    # ----------------------------------------------------------------- escrita
+
+    def gravar_perfis(self, tipo, perfis):
+        """
+        Acrescenta os perfis de uma exportação numa única transação.
+        perfis: iterável de (nif, resumo, documento_json, dividas), em que dividas é uma lista
+        de dicts com map_id, instituicao, divida e perfila (podem faltar).
+        """
+        agora = time.time()
+        total = 0
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for nif, resumo, documento, dividas in perfis:
+                    cursor = conn.execute(
+                        "INSERT INTO perfis (nif, tipo, criado_em, perfila, divida_total_elegivel, documento) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (str(nif), tipo, agora, _bool_ou_none(resumo.get("perfila")),
+                         resumo.get("divida_total_elegivel"), documento),
+                    )
+                    conn.executemany(
+                        "INSERT INTO dividas (perfil_id, nif, map_id, instituicao, divida, perfila) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(cursor.lastrowid, str(nif), d.get("map_id"), d.get("instituicao"),
+                          _float_ou_none(d.get("divida")), _bool_ou_none(d.get("perfila"))) for d in dividas],
+                    )
+                    total += 1
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return total
+
+    # ----------------------------------------------------------------- consulta
+
+    def _ultimo_id(self, conn, nif):
+        return conn.execute("SELECT MAX(id) FROM perfis WHERE nif = ?", (nif,)).fetchone()[0]
+
+    def consultar_nif(self, nif, limite=Config.RESULTS_HISTORY_LIMIT):
+        """
+        Perfil mais recente de cada tipo e histórico (mais recente primeiro, até 'limite'
+        perfis) de um NIF, ou None se o NIF nunca foi exportado.
+        """
+        nif = str(nif)
+        chave = (nif, limite)
+        with self._connect() as conn:
+            ultimo_id = self._ultimo_id(conn, nif)
+            if ultimo_id is None:
+                return None
+            with self._lock:
+                em_cache = self._cache.get(chave)
+                if em_cache is not None and em_cache[0] == ultimo_id:
+                    self._cache.move_to_end(chave)
+                    return em_cache[1]
+
+            rows = conn.execute(
+                "SELECT id, tipo, criado_em, perfila, divida_total_elegivel, documento FROM perfis "
+                "WHERE nif = ? ORDER BY id DESC LIMIT ?",
+                (nif, limite),
+            ).fetchall()
+            ultimos = {}
+            for tipo in (TIPO_CLIENTE, TIPO_NAO_PERFILA):
+                row = conn.execute(
+                    "SELECT id, tipo, criado_em, perfila, divida_total_elegivel, documento FROM perfis "
+                    "WHERE nif = ? AND tipo = ? ORDER BY id DESC LIMIT 1",
+                    (nif, tipo),
+                ).fetchone()
+                ultimos[tipo] = _perfil(row) if row else None
+
+        resposta = {
+            "nif": nif,
+            "perfil": ultimos[TIPO_CLIENTE],
+            "nao_perfila": ultimos[TIPO_NAO_PERFILA],
+            "historico": [_perfil(row) for row in rows],
+        }
+        with self._lock:
+            self._cache[chave] = (ultimo_id, resposta)
+            self._cache.move_to_end(chave)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return resposta
+
+    def cache_info(self):
+        with self._lock:
+            return {"entradas": len(self._cache), "limite": self.cache_size}
+
+def _perfil(row):
+    return {
+        "id": row["id"],
+        "tipo": row["tipo"],
+        "criado_em": row["criado_em"],
+        "perfila": None if row["perfila"] is None else bool(row["perfila"]),
+        "divida_total_elegivel": row["divida_total_elegivel"],
+        "documento": json.loads(row["documento"]),
+    }
+
+def _bool_ou_none(valor):
+    return None if valor is None else int(bool(valor))
+
+def _float_ou_none(valor):
+    try:
+        return None if valor is None else float(valor)
+    except (TypeError, ValueError):
+        return None
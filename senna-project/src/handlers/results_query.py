@@ -0,0 +1,65 @@
+"""
+Consultas sobre a exportação Parquet (handlers.parquet_store).
+
+Os filtros viram uma expressão do pyarrow.dataset: os de anomapa/mesmapa descartam
+diretórios inteiros (partições) e os demais são avaliados primeiro contra as estatísticas
+min/max de cada row group, de modo que só os arquivos e blocos relevantes são lidos.
+
+Exemplo: todas as dívidas perfiladas no Santander em maio de 2024
+    consultar(mesmapa="maio de 2024", banco="santander", perfila=True)
+"""
+import os
+import pyarrow as pa
+import pyarrow.dataset as ds
+from config import Config
+from handlers.parquet_store import PARTICIONAMENTO, ESQUEMA_LEITURA
+
+FILTROS_TEXTO = ('nif', 'instituicao', 'banco', 'anomapa', 'mesmapa', 'categoria_produto')
+FILTROS_FLAG = ('perfil_individual', 'perfila', 'pari_persi',
+                'reprovacao_litigio', 'reprovacao_garantia', 'reprovacao_instituicao')
+
+def _condicao(coluna, valor):
+    campo = ds.field(coluna)
+    if isinstance(valor, (list, tuple, set)):
+        return campo.isin([str(v) for v in valor])
+    return campo == str(valor)
+
+def montar_filtro(**filtros):
+    """Monta a expressão de filtro; valores de texto aceitam um valor ou uma lista de valores."""
+    expressao = None
+    for coluna, valor in filtros.items():
+        if valor is None:
+            continue
+        if coluna in FILTROS_TEXTO:
+            condicao = _condicao(coluna, valor)
+        elif coluna in FILTROS_FLAG:
+            condicao = ds.field(coluna) == bool(valor)
+        else:
+            raise ValueError(f"Filtro desconhecido: {coluna}")
+        expressao = condicao if expressao is None else expressao & condicao
+    return expressao
+
+def abrir_dataset(folder=Config.PARQUET_OUTPUT):
+    """Abre o dataset com o esquema conhecido unido ao inferido (arquivos antigos podem não ter todas as colunas)."""
+    dataset = ds.dataset(folder, format="parquet", partitioning=PARTICIONAMENTO)
+    esquema = pa.unify_schemas([ESQUEMA_LEITURA, dataset.schema])
+    return ds.dataset(folder, format="parquet", partitioning=PARTICIONAMENTO, schema=esquema)
+
+def consultar(nif=None, instituicao=None, banco=None, anomapa=None, mesmapa=None,
+              categoria_produto=None, perfil_individual=None, perfila=None, pari_persi=None,
+              reprovacao_litigio=None, reprovacao_garantia=None, reprovacao_instituicao=None,
+              colunas=None, folder=Config.PARQUET_OUTPUT):
+    """
+    Retorna um DataFrame com as linhas que atendem a todos os filtros informados.
+    colunas limita as colunas lidas do disco (None = todas).
+    """
+    if not os.path.isdir(folder):
+        raise FileNotFoundError(f"Exportação Parquet não encontrada em: {folder}")
+    filtro = montar_filtro(
+        nif=nif, instituicao=instituicao, banco=banco, anomapa=anomapa, mesmapa=mesmapa,
+        categoria_produto=categoria_produto, perfil_individual=perfil_individual,
+        perfila=perfila, pari_persi=pari_persi, reprovacao_litigio=reprovacao_litigio,
+        reprovacao_garantia=reprovacao_garantia, reprovacao_instituicao=reprovacao_instituicao,
+    )
+    tabela = abrir_dataset(folder).to_table(columns=colunas, filter=filtro)
+    return tabela.to_pandas()
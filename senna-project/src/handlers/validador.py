@@ -1,64 +1,103 @@
 import os
+import logging
 import json
 import numpy as np
+import pandas as pd
 from config import Config
+from handlers.results_db import ResultsDB, TIPO_NAO_PERFILA
+from services.senninha import Senninha
+from services.metrics import metrics
+from utils.arquivos import converter_json
+
+logger = logging.getLogger(__name__)
 
 # Diretório onde os reprovados são salvos
 NO_PERFILA_DIR = os.path.join(Config.MAPS_DIR, "no_perfila")
-os.makedirs(NO_PERFILA_DIR, exist_ok=True)
-
-# 🔄 Conversor robusto para serialização JSON
-def _converter_json(obj):
-    if isinstance(obj, (np.bool_, bool)):
-        return bool(obj)
-    if isinstance(obj, (np.integer, int)):
-        return int(obj)
-    if isinstance(obj, (np.floating, float)):
-        return float(obj)
-    if isinstance(obj, (np.ndarray,)):
-        return obj.tolist()
-    return str(obj)
-
-def salvar_nao_perfilar(df):
-    df_nao_perfila = df[df["perfila"] == False]
 
-    if df_nao_perfila.empty:
-        print("✅ Nenhum cliente reprovado. Nada a salvar.")
-        return
+MOTIVO_LITIGIO = "Litígio judicial"
+MOTIVO_GARANTIA = "Dívida com garantia"
+MOTIVO_INSTITUICAO = "Instituição tem outra dívida com garantia/litigio"
+MOTIVO_PADRAO = "Regras de perfilamento não atendidas"
+
+# colunas de motivo (booleanas) acrescentadas ao DataFrame de resultados, na ordem dos motivos
+COLUNAS_MOTIVOS = {
+    "reprovacao_litigio": MOTIVO_LITIGIO,
+    "reprovacao_garantia": MOTIVO_GARANTIA,
+    "reprovacao_instituicao": MOTIVO_INSTITUICAO,
+}
+
+@metrics.cronometrado("motivos")
+def aplicar_motivos(df):
+    """
+    Calcula os motivos de reprovação como colunas booleanas (só verdadeiras em linhas com
+    perfila == False):
+      - reprovacao_litigio: a dívida está em litígio judicial;
+      - reprovacao_garantia: a dívida tem garantia;
+      - reprovacao_instituicao: o mesmo NIF tem, entre as dívidas reprovadas, alguma dívida
+        com litígio ou garantia na mesma instituição (groupby().transform).
+    """
+    df = df.copy()
+    reprovada = df["perfila"] == False
 
-    for nif, grupo in df_nao_perfila.groupby("nif"):
-        dividas_com_motivos = []
+    litigio = df["litigio"].astype(str).str.strip().str.lower() == "sim"
+    garantia = pd.to_numeric(df["garantias"], errors="coerce").fillna(0).astype(float) > 0
+    bloqueia = (litigio | garantia)[reprovada]
 
-        for _, row in grupo.iterrows():
-            motivos = []
+    # instituição nula nunca é "a mesma" instituição (como na comparação com ==)
+    rep = df[reprovada]
+    instituicao = (
+        bloqueia.groupby([rep["nif"], rep["instituicao"]], dropna=False)
+                .transform("any")
+                .reindex(df.index, fill_value=False)
+                .astype(bool)
+    ) & df["instituicao"].notna()
 
-            litigio_str = str(row.get("litigio", "")).strip().lower()
-            garantias_val = float(row.get("garantias") or 0)
+    df["reprovacao_litigio"] = litigio & reprovada
+    df["reprovacao_garantia"] = garantia & reprovada
+    df["reprovacao_instituicao"] = instituicao & reprovada
+    return df
 
-            if litigio_str == "sim":
-                motivos.append("Litígio judicial")
-            if garantias_val > 0:
-                motivos.append("Dívida com garantia")
+def _motivos_da_linha(flags):
+    return [motivo for flag, motivo in zip(flags, COLUNAS_MOTIVOS.values()) if flag] or [MOTIVO_PADRAO]
 
-            outras = grupo[
-                (grupo["instituicao"] == row["instituicao"]) & (
-                    (grupo["litigio"].astype(str).str.strip().str.lower() == "sim") |
-                    (grupo["garantias"].fillna(0).astype(float) > 0)
-                )
-            ]
-            if not outras.empty:
-                motivos.append("Instituição tem outra dívida com garantia/litigio")
+@metrics.cronometrado("exportacao_nao_perfila")
+def salvar_nao_perfilar(df, results_db=None):
+    """
+    Grava maps/no_perfila/{nif}.json com os motivos de reprovação de cada cliente não
+    perfilado e acrescenta os mesmos documentos ao histórico da base de resultados.
+    """
+    if not all(coluna in df.columns for coluna in COLUNAS_MOTIVOS):
+        df = aplicar_motivos(df)
+    os.makedirs(NO_PERFILA_DIR, exist_ok=True)
+    df_nao_perfila = df[df["perfila"] == False]
+
+    if df_nao_perfila.empty:
+        logger.info("✅ Nenhum cliente reprovado. Nada a salvar.")
+        return
+
+    instituicoes = df_nao_perfila["instituicao"].tolist() if "instituicao" in df_nao_perfila.columns \
+        else ["desconhecida"] * len(df_nao_perfila)
+    # uma única conversão: "valor" de cada dívida (NaN como antes) e total sem os NaN
+    dividas = df_nao_perfila["divida"].to_numpy(dtype=float, na_value=np.nan)
+    valores = dividas.tolist()
+    flags = list(zip(*(df_nao_perfila[coluna].tolist() for coluna in COLUNAS_MOTIVOS)))
+    map_ids = Senninha.build_map_id(df_nao_perfila).tolist()
+    perfis = []
 
-            dividas_com_motivos.append({
-                "instituicao": row.get("instituicao", "desconhecida"),
-                "valor": float(row.get("divida") or 0),
-                "motivos_reprovacao": list(set(motivos)) or ["Regras de perfilamento não atendidas"]
-            })
+    for nif, posicoes in df_nao_perfila.groupby("nif").indices.items():
+        dividas_com_motivos = [
+            {
+                "instituicao": instituicoes[i],
+                "valor": valores[i],
+                "motivos_reprovacao": _motivos_da_linha(flags[i])
+            }
+            for i in posicoes
+        ]
 
         estrutura = {
             "resumo": {
                 "nif": nif,
-                "divida_total_elegivel": float(grupo["divida"].sum()),
+                "divida_total_elegivel": float(np.nansum(dividas[posicoes])),
                 "perfila": False
             },
             "motivos": dividas_com_motivos
@@ -66,8 +105,20 @@ def salvar_nao_perfilar(df):
 
         caminho = os.path.join(NO_PERFILA_DIR, f"{nif}.json")
         try:
+            documento = json.dumps(estrutura, ensure_ascii=False, indent=2, default=converter_json)
             with open(caminho, "w", encoding="utf-8") as f:
-                json.dump(estrutura, f, ensure_ascii=False, indent=2, default=_converter_json)
-            print(f"💾 JSON de não perfilamento salvo em: {caminho}")
+                f.write(documento)
+            logger.debug("💾 JSON de não perfilamento salvo em: %s", caminho, extra={"nif": nif})
         except Exception as e:
-            print(f"❌ Erro ao salvar JSON de {nif}: {e}")
\ No newline at end of file
+            logger.error(f"❌ Erro ao salvar JSON de {nif}: {e}", extra={"nif": nif, "etapa": "exportacao_nao_perfila"})
+            continue
+        perfis.append((nif, estrutura["resumo"], documento, [
+            {"map_id": map_ids[i], "instituicao": instituicoes[i], "divida": valores[i], "perfila": False}
+            for i in posicoes
+        ]))
+
+    try:
+        results_db = results_db or ResultsDB()
+        results_db.gravar_perfis(TIPO_NAO_PERFILA, perfis)
+    except Exception as e:
+        logger.error(f"❌ Erro ao gravar não perfilados na base de resultados: {e}")
@@ -1,47 +1,76 @@
-import pandas as pd
+import argparse
+import time
+import logging
 import json
 
 # ✅ Imports ajustados para a nova estrutura
-from services.pdf_decryptor import PDFDecryptor
-from services.pdf_text_extractor import PDFTextExtractor
-from services.pdf_data_extractor import PDFDataExtractor
-from services.senninha import Senninha
-from handlers.pdf_output_handler import PDFOutputHandler
-from handlers.validador import salvar_nao_perfilar  # salva clientes não perfilados
-
-def process_pdfs():
-    print("🚀 Iniciando processamento dos PDFs...")
-
-    # 🔓 Descriptografar
-    decryptor = PDFDecryptor()
-    decrypted_pdfs = decryptor.decrypt_pdfs_with_progress()
-    if not decrypted_pdfs:
-        print(json.dumps({"status": "empty", "mensagem": "Nenhum PDF para descriptografar."}, ensure_ascii=False))
-        return
+from config import Config
+from handlers.result_store import ResultStore
+from utils.log_config import configurar_logging, esvaziar_logs
+
+logger = logging.getLogger(__name__)
+
+def emit_result(dados):
+    """Linha JSON para o n8n: sempre no stdout, como última linha (depois de todos os logs)."""
+    linha = json.dumps(dados, ensure_ascii=False)
+    esvaziar_logs()
+    print(linha, flush=True)
+
+def process_pdfs(workers=1):
+    # carregado aqui para que --help e --compact não importem pikepdf/PyPDF2/pyarrow
+    from services.pdf_batch_processor import PDFBatchProcessor
 
-    # 📝 Extração de texto (inclui fallback OCR)
-    extractor = PDFTextExtractor()
-    pdfs_text = extractor.extract_text_from_pdfs()
-    if not pdfs_text:
-        print(json.dumps({"status": "empty", "mensagem": "Nenhum texto extraído dos PDFs."}, ensure_ascii=False))
+    inicio = time.perf_counter()
+    logger.info("🚀 Iniciando processamento dos PDFs...")
+
+    # 🔓📝🔍 Descriptografar → extrair texto (com fallback OCR) → extrair dados, por PDF
+    processor = PDFBatchProcessor(workers=workers)
+    tarefas = processor.list_tasks()
+    if not tarefas:
+        emit_result({"status": "empty", "mensagem": "Nenhum PDF para descriptografar."})
         return
 
-    # 🔍 Extração de dados estruturados
-    data_extractor = PDFDataExtractor()
-    df = data_extractor.extract_data(pdfs_text)
+    df = processor.pending_export(processor.process(tarefas))
     if df.empty:
-        print(json.dumps({"status": "empty", "mensagem": "Nenhum dado extraído do texto."}, ensure_ascii=False))
+        write_run_summary(inicio, modo="lote", pdfs=len(tarefas), registros=0)
+        emit_result({"status": "empty", "mensagem": "Nenhum dado extraído do texto."})
         return
 
-    print(f"📊 Total de registros extraídos: {len(df)}")
+    logger.info(f"📊 Total de registros extraídos: {len(df)}")
+
+    df = profile_and_export(df, processor)
+    write_run_summary(inicio, modo="lote", pdfs=len(tarefas), registros=len(df))
+
+    logger.info("✅ Todos os arquivos foram processados e salvos com sucesso!")
+
+    # ✅ Retornar um JSON parseável para o n8n
+    try:
+        if not df.empty:
+            output_data = df.head(1).to_dict(orient="records")[0]
+            emit_result(output_data)
+        else:
+            emit_result({"status": "vazio", "mensagem": "Nenhum dado perfilado."})
+    except Exception as e:
+        emit_result({"error": "Erro ao gerar saída JSON", "details": str(e)})
+
+def profile_and_export(df, processor=None):
+    """
+    Perfilamento, motivos de reprovação e exportações (append) das linhas extraídas.
+    Com o processor do lote, as etapas perfilado/exportado ficam registradas no ledger.
+    """
+    from services.processing_ledger import ProcessingLedger
+    from services.senninha import Senninha
+    from handlers.pdf_output_handler import PDFOutputHandler
+    from handlers.validador import aplicar_motivos, salvar_nao_perfilar  # salva clientes não perfilados
+    import pandas as pd
 
     # 🧠 Regras de perfilamento
     df = Senninha.aplicar(df)
+    if processor is not None:
+        processor.mark_stage(ProcessingLedger.PERFILADO)
 
-    # 💾 Exportação JSON por cliente (perfilados)
-    Senninha.exportar_json_com_resumo(df)
-
-    # ❌ Exportar não perfilados com motivo
+    # ❌ Motivos de reprovação (colunas do resultado) e exportação dos não perfilados
+    df = aplicar_motivos(df)
     salvar_nao_perfilar(df)
 
     # 🧹 Preparar dados para exportação
@@ -50,20 +79,111 @@ def process_pdfs():
     # 📤 Exportações finais
     output_handler = PDFOutputHandler()
     output_handler.save_to_csv(df)
+    output_handler.save_to_parquet(df)
     output_handler.save_to_json(df)
     output_handler.save_json_by_client(df)
+    if processor is not None:
+        processor.mark_stage(ProcessingLedger.EXPORTADO)
+    return df
 
-    print("✅ Todos os arquivos foram processados e salvos com sucesso!")
+def write_run_summary(inicio, **contexto):
+    """Tempos por etapa desta execução: gravados em outputs/metricas e resumidos no log."""
+    from services.metrics import metrics
 
-    # ✅ Retornar um JSON parseável para o n8n
+    caminho, resumo = metrics.gravar_resumo(
+        Config.METRICS_OUTPUT, duracao_s=round(time.perf_counter() - inicio, 3), **contexto
+    )
+    logger.info(f"⏱️ Tempo por etapa ({resumo['duracao_s']:.2f}s no total):")
+    for etapa, dados in resumo["etapas"].items():
+        logger.info(f"   {etapa:<24}{dados['chamadas']:>6}x {dados['total_s']:>9.3f}s   "
+                    f"média {dados['media_ms']} ms, p95 ≈ {dados['p95_ms']} ms", extra={"etapa": etapa, **dados})
+    logger.info(f"📈 Resumo da execução gravado em: {caminho}")
+
+def watch_pdfs(workers=1):
+    """
+    Modo daemon: observa a pasta de criptografados e processa os PDFs que chegam em
+    micro-lotes no mesmo processo (bibliotecas e tabelas já carregadas, pool de processos
+    aberto uma única vez). Cada lote é exportado assim que termina. Encerra com SIGINT/SIGTERM
+    depois de concluir o lote em andamento.
+    """
+    import signal
+    from concurrent.futures import ProcessPoolExecutor
+    from services.pdf_batch_processor import PDFBatchProcessor
+    from services.folder_watcher import FolderWatcher
+
+    processor = PDFBatchProcessor(workers=workers)
+    watcher = FolderWatcher(processor.source_folder)
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sinal, lambda *_: watcher.stop())
+    executor = ProcessPoolExecutor(max_workers=processor.workers, initializer=configurar_logging,
+                                   initargs=(logging.getLogger().level,)) if processor.workers > 1 else None
+
+    def processar_lote(tarefas):
+        inicio = time.perf_counter()
+        try:
+            df = processor.pending_export(processor.process(tarefas, executor=executor))
+            if df.empty:
+                logger.warning(f"⚠️ Lote de {len(tarefas)} PDFs sem dados a exportar.")
+                return
+            df = profile_and_export(df, processor)
+            logger.info(f"✅ Lote de {len(tarefas)} PDFs ({len(df)} registros) perfilado em "
+                        f"{time.perf_counter() - inicio:.2f}s.")
+        except Exception as e:
+            logger.error(f"🔥 Erro ao processar lote de {len(tarefas)} PDFs: {e}")
+
+    logger.info(f"👀 Observando {processor.source_folder} ({watcher.modo}). Ctrl+C para encerrar.")
+    inicio_daemon = time.perf_counter()
     try:
-        if not df.empty:
-            output_data = df.head(1).to_dict(orient="records")[0]
-            print(json.dumps(output_data, ensure_ascii=False))
-        else:
-            print(json.dumps({"status": "vazio", "mensagem": "Nenhum dado perfilado."}, ensure_ascii=False))
-    except Exception as e:
-        print(json.dumps({"error": "Erro ao gerar saída JSON", "details": str(e)}, ensure_ascii=False))
+        # PDFs deixados no meio por uma execução interrompida (os novos vêm do watcher)
+        pendentes = processor.list_tasks(incluir_criptografados=False)
+        if pendentes:
+            processar_lote(pendentes)
+        for lote in watcher.lotes():
+            logger.info(f"📥 {len(lote)} PDF(s) novo(s) na pasta.")
+            tarefas = processor.prepare_tasks([(path, False) for path in lote])
+            if tarefas:
+                processar_lote(tarefas)
+    finally:
+        watcher.close()
+        if executor is not None:
+            executor.shutdown()
+        write_run_summary(inicio_daemon, modo="daemon")
+        logger.info("👋 Modo daemon encerrado.")
+
+def compact_results():
+    """Junta os segmentos JSON Lines (e o antigo resultado_extracao.json) numa única base."""
+    total = ResultStore().compact()
+    if total is None:
+        logger.info("✅ Nada a compactar.")
+    else:
+        logger.info(f"🗜️ Resultados compactados: {total} registros.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Processamento em lote dos mapas de responsabilidades (MDR).")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Número de processos para descriptografar/extrair/parsear os PDFs em paralelo (0 = todos os cores)."
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Modo daemon: observa a pasta de criptografados e processa os PDFs assim que chegam."
+    )
+    parser.add_argument(
+        "--quiet", action="store_true",
+        help="Modo silencioso: só avisos e erros no log (a linha JSON final continua no stdout)."
+    )
+    parser.add_argument(
+        "--compact", action="store_true",
+        help="Compacta o armazém de resultados (JSON Lines) e sai, sem processar PDFs."
+    )
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    process_pdfs()
\ No newline at end of file
+    args = parse_args()
+    configurar_logging(nivel="WARNING" if args.quiet else Config.LOG_LEVEL)
+    if args.compact:
+        compact_results()
+    elif args.watch:
+        watch_pdfs(workers=args.workers)
+    else:
+        process_pdfs(workers=args.workers)
\ No newline at end of file
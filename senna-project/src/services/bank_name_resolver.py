@@ -0,0 +1,56 @@
+import re
+from functools import lru_cache
+import pandas as pd
+from config import Config
+
+class BankNameResolver:
+    """
+    Resolve nomes de instituição (texto livre do mapa) para um nome/chave canónica.
+
+    As regras são uma lista ordenada de (resultado, [regex, ...]); vence a primeira regra,
+    pela ordem, com algum padrão encontrado no nome normalizado — como no laço original.
+    Todos os padrões são compilados uma única vez numa só alternância de lookaheads
+    ancorada no início, que o motor de regex testa pela mesma ordem das regras.
+    O resultado é memorizado por nome distinto (cache LRU limitado).
+    """
+
+    def __init__(self, regras, normalizar=None, fallback=None, cache_size=Config.BANK_CACHE_SIZE):
+        self.resultados = []
+        alternativas = []
+        for resultado, padroes in regras:
+            for padrao in padroes:
+                alternativas.append(f"(?=.*?(?:{padrao}))(?P<r{len(self.resultados)}>)")
+                self.resultados.append(resultado)
+        self.regex = re.compile(f"^(?:{'|'.join(alternativas)})", re.DOTALL) if alternativas else None
+        self.normalizar = normalizar or (lambda nome: nome)
+        self.fallback = fallback or (lambda nome: None)
+        self._resolver_cache = lru_cache(maxsize=cache_size)(self._resolver)
+
+    def _resolver(self, nome):
+        base = self.normalizar(nome)
+        match = self.regex.match(base) if self.regex is not None else None
+        if match:
+            return self.resultados[int(match.lastgroup[1:])]
+        return self.fallback(nome)
+
+    def resolve_one(self, nome):
+        try:
+            return self._resolver_cache(nome)
+        except TypeError:  # valor não hashable: resolve sem cache
+            return self._resolver(nome)
+
+    def resolve(self, serie: pd.Series) -> pd.Series:
+        """
+        Resolve uma série inteira: cada valor distinto é resolvido uma só vez
+        (pd.factorize) e o resultado é espalhado pelas linhas.
+        """
+        codigos, unicos = pd.factorize(serie)
+        resultados = [self.resolve_one(nome) for nome in unicos]
+        nulos = codigos == -1
+        if nulos.any():
+            resultados.append(self.resolve_one(serie[nulos].iloc[0]))
+        valores = pd.Series(resultados, dtype=object).to_numpy()
+        return pd.Series(valores[codigos], index=serie.index, dtype=object)
+
+    def cache_info(self):
+        return self._resolver_cache.cache_info()
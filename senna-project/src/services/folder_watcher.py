@@ -0,0 +1,171 @@
+import os
+import logging
+import time
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# eventos do inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+MASCARA_EVENTOS = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+CABECALHO_EVENTO = struct.Struct("iIII")  # wd, mask, cookie, len
+
+class _Inotify:
+    """Observador inotify mínimo (Linux, via libc) de um único diretório."""
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), MASCARA_EVENTOS) < 0:
+            erro = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(erro, f"inotify_add_watch falhou para {folder}")
+
+    def esperar(self, timeout):
+        """
+        Espera eventos por até timeout segundos.
+        Devolve (nomes de arquivos tocados, precisa_reescanear).
+        """
+        prontos, _, _ = select.select([self.fd], [], [], timeout)
+        if not prontos:
+            return set(), False
+        try:
+            dados = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set(), False
+
+        nomes, reescanear, pos = set(), False, 0
+        while pos + CABECALHO_EVENTO.size <= len(dados):
+            _, mascara, _, tamanho = CABECALHO_EVENTO.unpack_from(dados, pos)
+            pos += CABECALHO_EVENTO.size
+            nome = dados[pos:pos + tamanho].rstrip(b"\0")
+            pos += tamanho
+            if mascara & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF):
+                reescanear = True
+            elif nome:
+                nomes.add(os.fsdecode(nome))
+        return nomes, reescanear
+
+    def close(self):
+        os.close(self.fd)
+
+class FolderWatcher:
+    """
+    Observa uma pasta e entrega em micro-lotes os PDFs novos já completamente gravados.
+
+    Usa inotify quando disponível (Linux) e, caso contrário, lista a pasta a cada
+    poll_seconds. Um arquivo só é entregue depois de ficar debounce_seconds sem mudar de
+    tamanho/mtime (cópias em andamento não são lidas pela metade). Os prontos são agrupados
+    por até batch_window_seconds ou batch_size arquivos, o que vier primeiro.
+    Um arquivo entregue não volta a ser entregue enquanto não mudar (ex.: falha na
+    descriptografia e o original fica na pasta).
+    """
+
+    def __init__(self, folder=Config.ENCRYPTED_FOLDER, debounce_seconds=Config.WATCH_DEBOUNCE_SECONDS,
+                 batch_size=Config.WATCH_BATCH_SIZE, batch_window_seconds=Config.WATCH_BATCH_WINDOW_SECONDS,
+                 poll_seconds=Config.WATCH_POLL_SECONDS, rescan_seconds=Config.WATCH_RESCAN_SECONDS,
+                 usar_inotify=Config.WATCH_INOTIFY):
+        self.folder = folder
+        self.debounce_seconds = debounce_seconds
+        self.batch_size = max(1, batch_size)
+        self.batch_window_seconds = batch_window_seconds
+        self.poll_seconds = poll_seconds
+        self.rescan_seconds = rescan_seconds
+        self._parar = threading.Event()
+        self._inotify = None
+        os.makedirs(self.folder, exist_ok=True)
+        if usar_inotify:
+            try:
+                self._inotify = _Inotify(self.folder)
+            except (OSError, AttributeError) as e:
+                logger.warning(f"⚠️ inotify indisponível ({e}); observando a pasta por polling.")
+
+    @property
+    def modo(self):
+        return "inotify" if self._inotify else "polling"
+
+    def stop(self):
+        """Pede o fim de lotes() (seguro a partir de um signal handler)."""
+        self._parar.set()
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+    def _listar(self):
+        try:
+            return {e.name for e in os.scandir(self.folder) if e.is_file()}
+        except FileNotFoundError:
+            return set()
+
+    def lotes(self):
+        """Gera listas de caminhos de PDFs prontos até stop() ser chamado."""
+        observados = {}   # nome -> (assinatura, visto_desde)
+        entregues = {}    # nome -> assinatura entregue
+        prontos = {}      # nome -> instante em que ficou pronto
+        candidatos = self._listar()
+        ultimo_scan = time.monotonic()
+
+        while not self._parar.is_set():
+            agora = time.monotonic()
+            for nome in candidatos:
+                if nome.lower().endswith(".pdf"):
+                    observados.setdefault(nome, (None, agora))
+            candidatos = set()
+
+            # debounce: pronto quando tamanho e mtime não mudam por debounce_seconds
+            for nome, (assinatura, desde) in list(observados.items()):
+                try:
+                    st = os.stat(os.path.join(self.folder, nome))
+                except FileNotFoundError:
+                    observados.pop(nome)
+                    entregues.pop(nome, None)
+                    prontos.pop(nome, None)
+                    continue
+                atual = (st.st_size, st.st_mtime_ns)
+                if atual != assinatura:
+                    observados[nome] = (atual, agora)
+                    prontos.pop(nome, None)
+                elif st.st_size > 0 and agora - desde >= self.debounce_seconds \
+                        and entregues.get(nome) != atual and nome not in prontos:
+                    prontos[nome] = agora
+
+            if prontos and (len(prontos) >= self.batch_size
+                            or agora - min(prontos.values()) >= self.batch_window_seconds):
+                lote = sorted(prontos, key=prontos.get)[:self.batch_size]
+                for nome in lote:
+                    entregues[nome] = observados[nome][0]
+                    prontos.pop(nome)
+                yield [os.path.join(self.folder, nome) for nome in lote]
+                continue
+
+            # enquanto há arquivos em observação, acorda a tempo de reavaliar o debounce
+            espera = self.poll_seconds
+            if any(nome not in entregues or entregues[nome] != assinatura
+                   for nome, (assinatura, _) in observados.items()):
+                espera = min(espera, max(0.05, self.debounce_seconds / 4))
+            if self._inotify:
+                nomes, reescanear = self._inotify.esperar(espera)
+                candidatos |= nomes
+                if reescanear or time.monotonic() - ultimo_scan >= self.rescan_seconds:
+                    candidatos |= self._listar()
+                    ultimo_scan = time.monotonic()
+            else:
+                self._parar.wait(espera)
+                candidatos = self._listar()
@@ -0,0 +1,350 @@
+import os
+import logging
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import ipaddress
+import threading
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def validar_callback_url(url, hosts_permitidos=None):
+    """
+    Levanta ValueError se o callback_url não for http(s) para um host aceito: com a lista
+    hosts_permitidos, só esses hosts (".exemplo.pt" aceita os subdomínios); sem ela, só hosts
+    cujos endereços sejam todos públicos (evita que o pedido chegue a serviços internos).
+    """
+    partes = urllib.parse.urlsplit(url)
+    if partes.scheme not in ("http", "https"):
+        raise ValueError(f"callback_url deve usar http ou https (recebido: '{partes.scheme}')")
+    host = (partes.hostname or "").lower()
+    if not host:
+        raise ValueError("callback_url sem host")
+    if hosts_permitidos:
+        if not any(host == h or (h.startswith(".") and host.endswith(h)) for h in hosts_permitidos):
+            raise ValueError(f"host '{host}' não está em SENNA_JOB_CALLBACK_ALLOWED_HOSTS")
+        return
+    try:
+        enderecos = {info[4][0] for info in socket.getaddrinfo(host, partes.port or None)}
+    except (socket.gaierror, UnicodeError, ValueError) as e:
+        raise ValueError(f"host '{host}' não resolvido: {e}")
+    for endereco in enderecos:
+        ip = ipaddress.ip_address(endereco.split("%", 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"host '{host}' resolve para um endereço não público ({ip})")
+
+class _SemRedirect(urllib.request.HTTPRedirectHandler):
+    # um 3xx para outro host contornaria a validação do callback_url: vira erro
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+class JobQueue:
+    """
+    Fila de jobs persistida em SQLite, processada por um pool limitado de threads.
+
+    O SQLite permite que vários processos (workers do gunicorn) partilhem a fila: qualquer
+    processo aceita jobs e responde ao status, e cada job é reivindicado por um único worker
+    (UPDATE condicionado ao status). O PDF fica na tabela só até o job terminar.
+
+    Enquanto corre, o job tem o heartbeat renovado pelo worker dono (coluna worker, um token por
+    reivindicação): só um job sem heartbeat há mais de stale_seconds volta para a fila, e só o
+    dono atual grava o resultado e dispara o callback.
+
+    stop() é chamado quando o processo vai terminar (ex.: worker do gunicorn reciclado por
+    max_requests): deixa de reivindicar jobs, espera os que estão a correr e devolve à fila os
+    que não terminarem a tempo, para outro worker os retomar já, sem esperar stale_seconds.
+
+    processar(conteudo) recebe os bytes do PDF e devolve o resultado já serializado em JSON.
+    """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    def __init__(self, processar, db_path=Config.JOBS_DB, workers=Config.JOB_WORKERS,
+                 stale_seconds=Config.JOB_STALE_SECONDS, retention_hours=Config.JOB_RETENTION_HOURS,
+                 callback_timeout=Config.JOB_CALLBACK_TIMEOUT, heartbeat_seconds=Config.JOB_HEARTBEAT_SECONDS,
+                 callback_hosts=Config.JOB_CALLBACK_ALLOWED_HOSTS):
+        self.processar = processar
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.stale_seconds = stale_seconds
+        self.retention_seconds = retention_hours * 3600
+        self.callback_timeout = callback_timeout
+        # pelo menos três renovações dentro da janela de stale_seconds
+        self.heartbeat_seconds = max(0.05, min(heartbeat_seconds, stale_seconds / 3))
+        self.callback_hosts = list(callback_hosts or [])
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._parar = threading.Event()
+        self._threads = []
+        self._em_curso = {}  # job_id -> token de dono, dos jobs deste processo
+        self._pid = None
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    pdf BLOB,
+                    callback_url TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    worker TEXT,
+                    heartbeat_at REAL
+                )
+            """)
+            # bases criadas antes do heartbeat
+            colunas = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for coluna, tipo in (("worker", "TEXT"), ("heartbeat_at", "REAL")):
+                if coluna not in colunas:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {coluna} {tipo}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            yield conn
+        finally:
+            conn.close()
+
+    # ----------------------------------------------------------------- API pública
+
+    def start(self):
+        """Sobe as threads do pool (uma vez por processo; seguro depois de um fork)."""
+        with self._lock:
+            # parado com stop(): não volta a subir neste processo (um get() do callback, por exemplo)
+            if self._pid == os.getpid() and (self._threads or self._parar.is_set()):
+                return
+            self._pid = os.getpid()
+            self._parar.clear()
+            self._em_curso = {}
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"senna-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=30):
+        """
+        Para o pool deste processo: nenhum job novo é reivindicado, os que estão a correr têm até
+        timeout segundos para terminar e os restantes voltam para a fila. Devolve quantos voltaram.
+        """
+        with self._lock:
+            if self._pid != os.getpid() or not self._threads:
+                return 0
+            threads, self._threads = self._threads, []
+            self._parar.set()
+        self._wakeup.set()
+        limite = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0, limite - time.monotonic()))
+
+        with self._lock:
+            em_curso = list(self._em_curso.items())
+        devolvidos = 0
+        with self._connect() as conn:
+            for job_id, worker in em_curso:
+                # o token deixa de valer: se o processamento ainda acabar, _finish não grava nada
+                devolvidos += conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL, started_at = NULL, heartbeat_at = NULL "
+                    "WHERE id = ? AND worker = ? AND status = ?",
+                    (self.STATUS_QUEUED, job_id, worker, self.STATUS_RUNNING),
+                ).rowcount
+        if devolvidos:
+            logger.warning(f"⚠️ {devolvidos} job(s) ainda em curso devolvido(s) à fila no encerramento do worker.")
+        return devolvidos
+
+    def submit(self, conteudo, callback_url=None):
+        """Enfileira um PDF e devolve o id do job (ValueError se o callback_url não for aceito)."""
+        if callback_url:
+            validar_callback_url(callback_url, self.callback_hosts)
+        self.start()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, pdf, callback_url, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, self.STATUS_QUEUED, sqlite3.Binary(conteudo), callback_url, time.time()),
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Estado do job (com o resultado quando concluído), ou None se não existir."""
+        self.start()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        agora = time.time()
+        inicio = row["started_at"]
+        fim = row["finished_at"]
+        job = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "started_at": inicio,
+            "finished_at": fim,
+            "queue_seconds": round((inicio or agora) - row["created_at"], 3),
+            "run_seconds": round((fim or agora) - inicio, 3) if inicio else None,
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"]:
+            job["error"] = row["error"]
+        return job
+
+    def stats(self):
+        """Profundidade da fila e tempos médios dos jobs concluídos."""
+        with self._connect() as conn:
+            contagens = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            medias = conn.execute(
+                "SELECT AVG(started_at - created_at), AVG(finished_at - started_at) "
+                "FROM jobs WHERE status IN (?, ?) AND finished_at IS NOT NULL",
+                (self.STATUS_DONE, self.STATUS_FAILED),
+            ).fetchone()
+        return {
+            "queued": contagens.get(self.STATUS_QUEUED, 0),
+            "running": contagens.get(self.STATUS_RUNNING, 0),
+            "done": contagens.get(self.STATUS_DONE, 0),
+            "failed": contagens.get(self.STATUS_FAILED, 0),
+            "workers_per_process": self.workers,
+            "avg_queue_seconds": round(medias[0], 3) if medias[0] is not None else None,
+            "avg_run_seconds": round(medias[1], 3) if medias[1] is not None else None,
+        }
+
+    # ----------------------------------------------------------------- pool
+
+    def _claim(self):
+        """
+        Reivindica o job mais antigo na fila (ou um 'running' cujo worker deixou de renovar o
+        heartbeat). Devolve a linha do job mais o token de dono ("worker"), ou None.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                agora = time.time()
+                row = conn.execute(
+                    "SELECT id, pdf, callback_url FROM jobs "
+                    "WHERE status = ? OR (status = ? AND COALESCE(heartbeat_at, started_at) < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (self.STATUS_QUEUED, self.STATUS_RUNNING, agora - self.stale_seconds),
+                ).fetchone()
+                if row is not None:
+                    worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ?, worker = ? WHERE id = ?",
+                        (self.STATUS_RUNNING, agora, agora, worker, row["id"]),
+                    )
+                    row = {**dict(row), "worker": worker}
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _heartbeat(self, job_id, worker, parar):
+        while not parar.wait(self.heartbeat_seconds):
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                        (time.time(), job_id, worker, self.STATUS_RUNNING),
+                    )
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao renovar o heartbeat do job {job_id}: {e}", extra={"job_id": job_id})
+
+    def _finish(self, job_id, worker, status, result=None, error=None):
+        """Grava o resultado se o job ainda for deste worker; False se outro o reivindicou."""
+        with self._connect() as conn:
+            gravado = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, pdf = NULL "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (status, result, error, time.time(), job_id, worker, self.STATUS_RUNNING),
+            ).rowcount > 0
+            conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - self.retention_seconds,),
+            )
+        return gravado
+
+    def _worker_loop(self):
+        while not self._parar.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"⚠️ Erro ao ler a fila de jobs: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        job_id = job["id"]
+        logger.info(f"⚙️ Job {job_id} iniciado.", extra={"job_id": job_id})
+        with self._lock:
+            self._em_curso[job_id] = job["worker"]
+        try:
+            self._executar(job)
+        finally:
+            with self._lock:
+                self._em_curso.pop(job_id, None)
+
+    def _executar(self, job):
+        job_id = job["id"]
+        worker = job["worker"]
+        inicio = time.time()
+        parar = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, worker, parar),
+                                     name=f"senna-heartbeat-{job_id[:8]}", daemon=True)
+        heartbeat.start()
+        try:
+            resultado = self.processar(bytes(job["pdf"]))
+            gravado = self._finish(job_id, worker, self.STATUS_DONE, result=resultado)
+            logger.info(f"✅ Job {job_id} concluído em {time.time() - inicio:.2f}s.", extra={"job_id": job_id})
+        except Exception as e:
+            gravado = self._finish(job_id, worker, self.STATUS_FAILED, error=str(e))
+            logger.error(f"❌ Job {job_id} falhou: {e}", extra={"job_id": job_id})
+        finally:
+            parar.set()
+            heartbeat.join()
+        if not gravado:
+            # outro worker reivindicou o job (heartbeat perdido) ou ele voltou à fila no stop():
+            # o resultado e o callback são de quem o reivindicar
+            logger.warning(f"⚠️ Job {job_id} já não é deste worker; resultado descartado.",
+                           extra={"job_id": job_id})
+            return
+        if job["callback_url"]:
+            self._callback(job["callback_url"], self.get(job_id))
+
+    def _callback(self, url, job):
+        try:
+            # validado de novo na entrega: a resolução do host pode ter mudado desde o submit
+            validar_callback_url(url, self.callback_hosts)
+            req = urllib.request.Request(
+                url, data=json.dumps(job, ensure_ascii=False).encode("utf-8"),
+                headers={"Content-Type": "application/json"}, method="POST",
+            )
+            opener = urllib.request.build_opener(_SemRedirect)
+            with opener.open(req, timeout=self.callback_timeout) as resp:
+                logger.info(f"📨 Callback do job {job['job_id']} entregue ({resp.status}).")
+        except Exception as e:
+            logger.warning(f"⚠️ Falha no callback do job {job['job_id']} para {url}: {e}")
@@ -0,0 +1,310 @@
+import os
+import json
+import glob
+import time
+import bisect
+import threading
+import functools
+from contextlib import contextmanager
+from utils.arquivos import criar_temporario
+
+# limites superiores (s) dos buckets de duração: do parsing de uma página (ms) ao OCR de um MDR longo
+BUCKETS_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# blocos de instituição e linhas extraídas por página
+BUCKETS_CONTAGEM = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+ETAPA_SEGUNDOS = "senna_etapa_duracao_segundos"
+ETAPA_ERROS = "senna_etapa_erros_total"
+PAGINAS = "senna_paginas_total"
+DOCUMENTOS = "senna_documentos_total"
+OCR_PAGINA_SEGUNDOS = "senna_ocr_pagina_segundos"
+OCR_REFINADAS = "senna_ocr_paginas_refinadas_total"
+BLOCOS_POR_PAGINA = "senna_parsing_blocos_por_pagina"
+LINHAS_POR_PAGINA = "senna_parsing_linhas_por_pagina"
+HTTP_SEGUNDOS = "senna_http_requisicao_segundos"
+
+# nome -> (tipo, ajuda, buckets)
+DEFINICOES = {
+    ETAPA_SEGUNDOS: ("histogram", "Duração de cada chamada a uma etapa do pipeline.", BUCKETS_DURACAO),
+    ETAPA_ERROS: ("counter", "Chamadas a uma etapa do pipeline que falharam.", None),
+    PAGINAS: ("counter", "Páginas extraídas, por origem do texto (camada de texto ou OCR).", None),
+    DOCUMENTOS: ("counter", "PDFs classificados antes da extração: texto, digitalizado ou misto.", None),
+    OCR_PAGINA_SEGUNDOS: ("histogram", "Tempo do Tesseract por página.", BUCKETS_DURACAO),
+    OCR_REFINADAS: ("counter", "Páginas relidas em DPI alto pelo OCR adaptativo, por motivo.", None),
+    BLOCOS_POR_PAGINA: ("histogram", "Blocos de instituição detectados por página.", BUCKETS_CONTAGEM),
+    LINHAS_POR_PAGINA: ("histogram", "Linhas (responsabilidades) extraídas por página.", BUCKETS_CONTAGEM),
+    HTTP_SEGUNDOS: ("histogram", "Duração dos pedidos HTTP da API.", BUCKETS_DURACAO),
+}
+
+class Metrics:
+    """
+    Registro de métricas do processo: contadores e histogramas com labels, expostos no
+    formato texto do Prometheus (/metrics da API) e resumidos por etapa no fim de cada
+    execução do main.py.
+
+    Processos diferentes não partilham memória: os workers do lote devolvem snapshot(zerar=True)
+    ao processo principal, que faz mesclar(); os workers do gunicorn gravam o seu snapshot numa
+    pasta comum (persistir, a cada poucos segundos e na saída do worker) e o /metrics soma
+    todos (agregado).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}   # nome -> {labels: valor}
+        self._histogramas = {}  # nome -> {labels: [contagens por bucket (+Inf no fim), soma]}
+        self._arquivo = None  # snapshot deste processo em persistir()
+        self._pid = None
+        self._versao = 0  # muda a cada alteração: persistir_periodicamente só grava se mudou
+        self._versao_persistida = 0
+        self._persistencia_pid = None
+
+    @staticmethod
+    def _labels(labels):
+        return tuple(sorted((chave, str(valor)) for chave, valor in labels.items()))
+
+    def incrementar(self, nome, valor=1, **labels):
+        chave = self._labels(labels)
+        with self._lock:
+            series = self._contadores.setdefault(nome, {})
+            series[chave] = series.get(chave, 0) + valor
+            self._versao += 1
+
+    def observar(self, nome, valor, **labels):
+        buckets = DEFINICOES[nome][2]
+        chave = self._labels(labels)
+        posicao = bisect.bisect_left(buckets, valor)
+        with self._lock:
+            serie = self._histogramas.setdefault(nome, {}).get(chave)
+            if serie is None:
+                serie = self._histogramas[nome][chave] = [0] * (len(buckets) + 1) + [0.0]
+            serie[posicao] += 1
+            serie[-1] += valor
+            self._versao += 1
+
+    @contextmanager
+    def cronometrar(self, etapa, **labels):
+        """Mede o bloco como uma chamada à etapa; uma exceção conta como erro e é relançada."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.incrementar(ETAPA_ERROS, etapa=etapa, **labels)
+            raise
+        finally:
+            self.observar(ETAPA_SEGUNDOS, time.perf_counter() - inicio, etapa=etapa, **labels)
+
+    def cronometrado(self, etapa):
+        """Decorador: cada chamada da função é medida com cronometrar(etapa)."""
+        def decorador(funcao):
+            @functools.wraps(funcao)
+            def medida(*args, **kwargs):
+                with self.cronometrar(etapa):
+                    return funcao(*args, **kwargs)
+            return medida
+        return decorador
+
+    def erro(self, etapa):
+        """Conta uma falha tratada dentro da etapa (sem exceção a propagar)."""
+        self.incrementar(ETAPA_ERROS, etapa=etapa)
+
+    # ----------------------------------------------------------------- entre processos
+
+    def snapshot(self, zerar=False):
+        """Estado serializável em JSON (com zerar=True o registro recomeça do zero)."""
+        with self._lock:
+            estado = {
+                "contadores": {nome: [[list(map(list, chave)), valor] for chave, valor in series.items()]
+                               for nome, series in self._contadores.items()},
+                "histogramas": {nome: [[list(map(list, chave)), list(serie)] for chave, serie in series.items()]
+                                for nome, series in self._histogramas.items()},
+            }
+            if zerar:
+                self._contadores, self._histogramas = {}, {}
+                self._versao += 1
+        return estado
+
+    def mesclar(self, estado):
+        """Soma ao registro um snapshot() de outro processo."""
+        with self._lock:
+            for nome, series in estado.get("contadores", {}).items():
+                destino = self._contadores.setdefault(nome, {})
+                for chave, valor in series:
+                    chave = tuple(map(tuple, chave))
+                    destino[chave] = destino.get(chave, 0) + valor
+            for nome, series in estado.get("histogramas", {}).items():
+                destino = self._histogramas.setdefault(nome, {})
+                for chave, serie in series:
+                    chave = tuple(map(tuple, chave))
+                    atual = destino.get(chave)
+                    destino[chave] = list(serie) if atual is None else [a + b for a, b in zip(atual, serie)]
+            self._versao += 1
+
+    def zerar(self):
+        with self._lock:
+            self._contadores, self._histogramas = {}, {}
+            self._versao += 1
+
+    def persistir(self, pasta, arquivo=None):
+        """Grava o snapshot deste processo em pasta (escrita atômica), para o agregado()."""
+        if arquivo is None:
+            if self._pid != os.getpid():
+                # o instante de início distingue um pid reaproveitado por um worker novo
+                self._pid = os.getpid()
+                self._arquivo = os.path.join(pasta, f"metricas_{self._pid}_{time.time_ns()}.json")
+            arquivo = self._arquivo
+        os.makedirs(pasta, exist_ok=True)
+        versao = self._versao
+        fd, temporario = criar_temporario(pasta, prefix=".metricas_", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporario, arquivo)
+        self._versao_persistida = versao
+
+    def persistir_periodicamente(self, pasta, intervalo):
+        """
+        Thread que chama persistir(pasta) a cada intervalo segundos, só quando o registro mudou
+        (uma vez por processo; seguro depois de um fork). A saída do worker grava o último estado.
+        """
+        if self._persistencia_pid == os.getpid():
+            return
+        with self._lock:
+            if self._persistencia_pid == os.getpid():
+                return
+            self._persistencia_pid = os.getpid()
+
+        def ciclo():
+            while True:
+                time.sleep(intervalo)
+                if self._versao == self._versao_persistida:
+                    continue
+                try:
+                    self.persistir(pasta)
+                except OSError as e:
+                    # logging só aqui: o import deste módulo fica dentro do orçamento de 50 ms
+                    import logging
+                    logging.getLogger(__name__).warning(f"⚠️ Falha ao gravar as métricas em {pasta}: {e}")
+
+        threading.Thread(target=ciclo, name="senna-metricas", daemon=True).start()
+
+    def agregado(self, pasta):
+        """Novo registro com este processo mais os snapshots gravados pelos outros em pasta."""
+        total = Metrics()
+        total.mesclar(self.snapshot())
+        for caminho in glob.glob(os.path.join(pasta, "metricas_*.json")):
+            if caminho == self._arquivo:
+                continue
+            try:
+                with open(caminho, encoding="utf-8") as f:
+                    total.mesclar(json.load(f))
+            except (OSError, ValueError):
+                continue  # worker a meio da gravação ou arquivo removido
+        return total
+
+    @staticmethod
+    def consolidar(pasta, pid):
+        """
+        Junta os snapshots de um processo que terminou num único arquivo de encerrados, para a
+        pasta não crescer com a reciclagem de workers (os contadores continuam cumulativos).
+        """
+        arquivos = glob.glob(os.path.join(pasta, f"metricas_{pid}_*.json"))
+        if not arquivos:
+            return
+        encerrados = Metrics()
+        destino = os.path.join(pasta, "metricas_encerrados.json")
+        for caminho in [destino] + arquivos:
+            try:
+                with open(caminho, encoding="utf-8") as f:
+                    encerrados.mesclar(json.load(f))
+            except (OSError, ValueError):
+                pass
+        encerrados.persistir(pasta, destino)
+        for caminho in arquivos:
+            os.remove(caminho)
+
+    # ----------------------------------------------------------------- exposição
+
+    def prometheus(self):
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+        linhas = []
+        with self._lock:
+            for nome, (tipo, ajuda, buckets) in DEFINICOES.items():
+                series = (self._contadores if tipo == "counter" else self._histogramas).get(nome)
+                if not series:
+                    continue
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+                for chave, valor in sorted(series.items()):
+                    if tipo == "counter":
+                        linhas.append(f"{nome}{_formatar_labels(chave)} {_numero(valor)}")
+                        continue
+                    acumulado = 0
+                    for limite, contagem in zip(buckets + (float("inf"),), valor[:-1]):
+                        acumulado += contagem
+                        le = "+Inf" if limite == float("inf") else _numero(limite)
+                        linhas.append(f"{nome}_bucket{_formatar_labels(chave + (('le', le),))} {acumulado}")
+                    linhas.append(f"{nome}_sum{_formatar_labels(chave)} {_numero(valor[-1])}")
+                    linhas.append(f"{nome}_count{_formatar_labels(chave)} {acumulado}")
+        return "\n".join(linhas) + "\n"
+
+    def resumo(self):
+        """Por etapa: chamadas, erros, tempo total e latências médias/p50/p95 (ms, pelos buckets)."""
+        with self._lock:
+            series = dict(self._histogramas.get(ETAPA_SEGUNDOS, {}))
+            erros = dict(self._contadores.get(ETAPA_ERROS, {}))
+        resumo = {}
+        for chave, serie in sorted(series.items()):
+            etapa = dict(chave).get("etapa")
+            chamadas = sum(serie[:-1])
+            resumo[etapa] = {
+                "chamadas": chamadas,
+                "erros": erros.get(chave, 0),
+                "total_s": round(serie[-1], 3),
+                "media_ms": round(serie[-1] / chamadas * 1000, 2) if chamadas else None,
+                "p50_ms": _quantil(BUCKETS_DURACAO, serie[:-1], 0.50),
+                "p95_ms": _quantil(BUCKETS_DURACAO, serie[:-1], 0.95),
+            }
+        return resumo
+
+    def contador(self, nome, **labels):
+        with self._lock:
+            return self._contadores.get(nome, {}).get(self._labels(labels), 0)
+
+    def gravar_resumo(self, pasta, **contexto):
+        """Grava resumo() e o contexto da execução em pasta/execucao_<data>_<pid>.json."""
+        resumo = dict(
+            contexto,
+            paginas={origem: self.contador(PAGINAS, origem=origem) for origem in ("texto", "ocr")},
+            etapas=self.resumo(),
+        )
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, time.strftime("execucao_%Y%m%d_%H%M%S") + f"_{os.getpid()}.json")
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(resumo, f, ensure_ascii=False, indent=2)
+        return caminho, resumo
+
+def _quantil(buckets, contagens, q):
+    """Estimativa do quantil por interpolação linear dentro do bucket (como histogram_quantile)."""
+    total = sum(contagens)
+    if not total:
+        return None
+    alvo = q * total
+    acumulado, inferior = 0, 0.0
+    for limite, contagem in zip(buckets, contagens):
+        if contagem and acumulado + contagem >= alvo:
+            return round((inferior + (limite - inferior) * (alvo - acumulado) / contagem) * 1000, 2)
+        acumulado += contagem
+        inferior = limite
+    return round(buckets[-1] * 1000, 2)  # no bucket +Inf: o maior limite conhecido
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+def _escapar_label(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _formatar_labels(chave):
+    if not chave:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar_label(valor)}"' for nome, valor in chave) + "}"
+
+# registro global do processo
+metrics = Metrics()
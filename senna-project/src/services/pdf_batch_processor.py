@@ -0,0 +1,261 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from config import Config
+from services.pdf_decryptor import PDFDecryptor, ERRO
+from services.pdf_text_extractor import PDFTextExtractor
+from services.pdf_data_extractor import PDFDataExtractor
+from services.text_cache import TextCache
+from services.processing_ledger import ProcessingLedger
+from services.metrics import metrics
+from utils.log_config import configurar_logging
+
+logger = logging.getLogger(__name__)
+
+class PDFBatchProcessor:
+    """
+    Executa descriptografia → extração de texto → extração de dados por PDF.
+    Com workers > 1 cada PDF é processado num processo separado (ProcessPoolExecutor);
+    as linhas de todos os PDFs são juntadas num único DataFrame no processo principal.
+    O progresso de cada PDF fica no ProcessingLedger: conteúdos já exportados são ignorados
+    e os interrompidos numa execução anterior são retomados.
+    """
+
+    def __init__(self, workers=1,
+                 source_folder=Config.ENCRYPTED_FOLDER,
+                 processed_encrypted_folder=Config.PROCESSED_ENCRYPTED_FOLDER,
+                 decrypted_folder=Config.DECRYPTED_FOLDER,
+                 processed_decrypted_folder=Config.PROCESSED_DECRYPTED_FOLDER,
+                 ledger=None):
+        if not workers or workers < 1:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.source_folder = source_folder
+        self.processed_encrypted_folder = processed_encrypted_folder
+        self.decrypted_folder = decrypted_folder
+        self.processed_decrypted_folder = processed_decrypted_folder
+        self.text_cache = TextCache()
+        self.ledger = ledger if ledger is not None else ProcessingLedger()
+        # arquivopdf -> chave (SHA-256) dos PDFs do último process(), para marcar a exportação
+        self.chaves_lote = {}
+        Config.criar_pastas()
+
+    def _decryptor(self, source_folder=None):
+        return PDFDecryptor(source_folder=source_folder or self.source_folder,
+                            processed_folder=self.processed_encrypted_folder,
+                            target_folder=self.decrypted_folder)
+
+    def _text_extractor(self):
+        # com vários processos, os cores do OCR são repartidos entre eles
+        return PDFTextExtractor(input_folder=self.decrypted_folder,
+                                processed_folder=self.processed_decrypted_folder,
+                                ocr_workers=max(1, Config.OCR_WORKERS // self.workers))
+
+    @property
+    def _usa_hash(self):
+        return self.text_cache.enabled or self.ledger.enabled
+
+    @staticmethod
+    def arquivopdf(tarefa):
+        """Nome do PDF como aparece na coluna arquivopdf das linhas extraídas."""
+        pdf_path, ja_descriptografado, _ = tarefa
+        pdf_file = os.path.basename(pdf_path)
+        nome_pdf = pdf_file if ja_descriptografado else PDFDecryptor.decrypted_name(pdf_file)
+        return nome_pdf.replace("decrypted_", "")
+
+    def list_tasks(self, incluir_criptografados=True):
+        """
+        Lista as tarefas do lote: PDFs criptografados na pasta de origem, PDFs que ficaram
+        na pasta de descriptografados e PDFs interrompidos em execuções anteriores (ledger).
+        Cada tarefa é uma tupla (caminho, ja_descriptografado, chave).
+        """
+        candidatos = []
+        if incluir_criptografados:
+            candidatos += [(os.path.join(self.source_folder, f), False) for f in self._decryptor().list_pdfs()]
+        candidatos += [(path, True) for path in self._text_extractor().list_pdfs()]
+        tarefas = self.prepare_tasks(candidatos)
+        return tarefas + self._tarefas_retomadas({chave for _, _, chave in tarefas})
+
+    def prepare_tasks(self, candidatos):
+        """
+        Transforma (caminho, ja_descriptografado) em tarefas com a chave de conteúdo.
+        Conteúdos já exportados e repetidos no mesmo lote vão direto para processed.
+        """
+        tarefas, vistas = [], set()
+        for pdf_path, ja_descriptografado in candidatos:
+            chave, campos = None, {}
+            if self._usa_hash:
+                chave = self.text_cache.hash_file(pdf_path)
+                if ja_descriptografado:
+                    # descriptografado por uma execução anterior: o registro é o do original
+                    campos["chave_descriptografado"] = chave
+                    chave = self.ledger.chave_de_descriptografado(chave) or chave
+
+            if self.ledger.enabled:
+                motivo = None
+                if chave in vistas:
+                    motivo = "repetido neste lote"
+                elif self.ledger.etapa(chave) == ProcessingLedger.EXPORTADO:
+                    motivo = "já exportado numa execução anterior"
+                if motivo:
+                    logger.info(f"⏭️ '{os.path.basename(pdf_path)}' ignorado: conteúdo {motivo}.")
+                    self._mover_para_processed(pdf_path, ja_descriptografado)
+                    continue
+                vistas.add(chave)
+                self.ledger.registrar(chave, os.path.basename(pdf_path), **campos)
+            tarefas.append((pdf_path, ja_descriptografado, chave))
+        return tarefas
+
+    def _tarefas_retomadas(self, chaves_em_lote):
+        """Tarefas dos PDFs que pararam no meio; usa o que ficou guardado, na ordem mais barata."""
+        tarefas = []
+        for registro in self.ledger.pendentes():
+            chave = registro["chave"]
+            if chave in chaves_em_lote:
+                continue
+            descriptografado = registro["caminho_descriptografado"]
+            original = registro["caminho_original"]
+            if self.text_cache.get(chave) is not None:
+                # o texto está no cache: o caminho só serve para o nome do PDF
+                if original:
+                    tarefa = (original, False, chave)
+                else:
+                    tarefa = (descriptografado or registro["arquivo"], bool(descriptografado), chave)
+            elif descriptografado and os.path.exists(descriptografado) \
+                    and self.text_cache.hash_file(descriptografado) == registro["chave_descriptografado"]:
+                tarefa = (descriptografado, True, chave)
+            elif original and os.path.exists(original) and self.text_cache.hash_file(original) == chave:
+                tarefa = (original, False, chave)
+            else:
+                logger.warning(f"⚠️ '{registro['arquivo']}' interrompido numa execução anterior, mas os arquivos não existem mais.")
+                self.ledger.falhar(chave, "arquivos não encontrados para retomar")
+                continue
+            logger.info(f"🔁 Retomando '{registro['arquivo']}' (parou em: {registro['etapa']}).")
+            self.ledger.registrar(chave, registro["arquivo"])
+            tarefas.append(tarefa)
+        return tarefas
+
+    def _mover_para_processed(self, pdf_path, ja_descriptografado):
+        """Move para a pasta processed correspondente (não faz nada se já estiver lá ou não existir)."""
+        pasta = self.processed_decrypted_folder if ja_descriptografado else self.processed_encrypted_folder
+        if not os.path.exists(pdf_path) or os.path.dirname(os.path.abspath(pdf_path)) == os.path.abspath(pasta):
+            return
+        if ja_descriptografado:
+            self._text_extractor().move_to_processed(pdf_path)
+        else:
+            self._decryptor(os.path.dirname(pdf_path)).move_to_processed(os.path.basename(pdf_path))
+
+    def pending_export(self, df):
+        """
+        Descarta as linhas de PDFs cujo conteúdo já foi exportado (ex.: por outra execução
+        em paralelo), para nunca acrescentar duplicados aos resultados.
+        """
+        exportados = self.ledger.exportados(self.chaves_lote.values())
+        if not exportados or df.empty:
+            return df
+        arquivos = [nome for nome, chave in self.chaves_lote.items() if chave in exportados]
+        logger.info(f"⏭️ Já exportados, não serão gravados de novo: {arquivos}")
+        return df[~df["arquivopdf"].isin(arquivos)].reset_index(drop=True)
+
+    def mark_stage(self, etapa):
+        """Avança no ledger os PDFs do último lote que já estavam parseados/perfilados."""
+        self.ledger.avancar_lote(self.chaves_lote.values(), etapa)
+
+    def process_task(self, tarefa):
+        """Processa um único PDF e devolve a lista de linhas extraídas (roda no worker)."""
+        pdf_path, ja_descriptografado, chave = tarefa
+        try:
+            pdfs_text = self._extract_text(pdf_path, ja_descriptografado, chave)
+            if pdfs_text is None:
+                return []  # a descriptografia falhou e o motivo já está no ledger
+            if not pdfs_text:
+                self.ledger.falhar(chave, "nenhum texto extraído")
+                return []
+
+            rows = PDFDataExtractor().extract_rows(pdfs_text)
+            # sem linhas não há o que exportar: o PDF já está concluído
+            etapa = ProcessingLedger.PARSEADO if rows else ProcessingLedger.EXPORTADO
+            self.ledger.avancar(chave, etapa, linhas=len(rows))
+            return rows
+        except Exception as e:
+            logger.error(f"⚠️ Erro ao processar '{os.path.basename(pdf_path)}': {e}",
+                         extra={"arquivo": os.path.basename(pdf_path), "chave": chave})
+            self.ledger.falhar(chave, e)
+            return []
+
+    def _process_task_medido(self, tarefa):
+        """process_task num processo do pool: devolve também as métricas do worker (e zera-as)."""
+        return self.process_task(tarefa), metrics.snapshot(zerar=True)
+
+    def _extract_text(self, pdf_path, ja_descriptografado, chave=None):
+        """
+        Devolve {nome_pdf: {texto_paginaN: texto}} consultando antes o cache de texto
+        (SHA-256 do arquivo recebido); num acerto não há descriptografia nem extração.
+        Devolve None se a descriptografia falhar (o motivo fica no ledger).
+        """
+        text_extractor = self._text_extractor()
+        pdf_file = os.path.basename(pdf_path)
+        nome_pdf = pdf_file if ja_descriptografado else PDFDecryptor.decrypted_name(pdf_file)
+
+        paginas = self.text_cache.get(chave)
+        if paginas is not None:
+            logger.info(f"♻️ Texto de '{pdf_file}' recuperado do cache.")
+            self._mover_para_processed(pdf_path, ja_descriptografado)
+            self.ledger.avancar(chave, ProcessingLedger.TEXTO_EXTRAIDO)
+            return {nome_pdf: paginas}
+
+        if ja_descriptografado:
+            decrypted_path = pdf_path
+        else:
+            resultado = self._decryptor(os.path.dirname(pdf_path)).decrypt_file_result(pdf_file)
+            logger.info(f"🔓 '{pdf_file}': {resultado['status']} em {resultado['segundos']}s.",
+                        extra={"arquivo": pdf_file, "chave": chave, "etapa": "descriptografia",
+                               "status": resultado["status"], "segundos": resultado["segundos"]})
+            if resultado["status"] == ERRO:
+                self.ledger.falhar(chave, f"descriptografia: {resultado['erro']}", descriptografia=ERRO)
+                return None
+            decrypted_path = resultado["caminho"]
+            self.ledger.avancar(
+                chave, ProcessingLedger.DESCRIPTOGRAFADO, descriptografia=resultado["status"],
+                caminho_original=os.path.join(self.processed_encrypted_folder, pdf_file),
+                caminho_descriptografado=os.path.join(self.processed_decrypted_folder, nome_pdf),
+                chave_descriptografado=self.text_cache.hash_file(decrypted_path) if self.ledger.enabled else None,
+            )
+
+        pdfs_text = text_extractor.extract_text_from_pdfs([decrypted_path])
+        if pdfs_text.get(nome_pdf):
+            self.text_cache.put(chave, pdfs_text.get(nome_pdf))
+            self.ledger.avancar(chave, ProcessingLedger.TEXTO_EXTRAIDO,
+                                caminho_descriptografado=os.path.join(self.processed_decrypted_folder, nome_pdf))
+        return pdfs_text
+
+    def process(self, tarefas=None, executor=None):
+        """
+        Processa as tarefas e devolve o DataFrame com as linhas de todos os PDFs.
+        executor: pool de processos já aberto (modo daemon), reutilizado entre lotes.
+        """
+        if tarefas is None:
+            tarefas = self.list_tasks()
+        self.chaves_lote = {self.arquivopdf(tarefa): tarefa[2] for tarefa in tarefas}
+
+        total = len(tarefas)
+        rows = []
+        if self.workers == 1 or total <= 1:
+            for index, tarefa in enumerate(tarefas, start=1):
+                logger.info(f"Processando {index} de {total} PDFs...")
+                rows.extend(self.process_task(tarefa))
+        elif executor is not None:
+            logger.info(f"⚙️ Processando {total} PDFs com {self.workers} workers...")
+            for rows_pdf, estado in executor.map(self._process_task_medido, tarefas):
+                rows.extend(rows_pdf)
+                metrics.mesclar(estado)
+        else:
+            workers = min(self.workers, total)
+            logger.info(f"⚙️ Processando {total} PDFs com {workers} workers...")
+            with ProcessPoolExecutor(max_workers=workers, initializer=configurar_logging,
+                                     initargs=(logging.getLogger().level,)) as executor:
+                for rows_pdf, estado in executor.map(self._process_task_medido, tarefas):
+                    rows.extend(rows_pdf)
+                    metrics.mesclar(estado)
+
+        return PDFDataExtractor().build_dataframe(rows)
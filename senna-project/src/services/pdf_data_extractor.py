@@ -1,12 +1,14 @@
 import re
 import os
+import logging
+from bisect import bisect_left
 import unicodedata
-from datetime import datetime
+from functools import lru_cache
 import pandas as pd
+from services.bank_name_resolver import BankNameResolver
+from services.metrics import metrics, BLOCOS_POR_PAGINA, LINHAS_POR_PAGINA
 
-LOG_FOLDER = "./logs"
-os.makedirs(LOG_FOLDER, exist_ok=True)
-LOG_FILE = os.path.join(LOG_FOLDER, "erros_processamento.txt")
+logger = logging.getLogger(__name__)
 
 def limpar_nome(texto):
     if pd.isna(texto):
@@ -17,38 +19,76 @@ def limpar_nome(texto):
     return texto
 
 caminho_csv = os.path.join(os.path.dirname(__file__), "bancos_padrao.csv")
-df_map = pd.read_csv(caminho_csv)
+_bancos_resolver = None
+
+@lru_cache(maxsize=None)
+def carregar_bancos_padrao():
+    """Tabela bancos_padrao.csv (chave, name), lida no primeiro uso."""
+    return pd.read_csv(caminho_csv)
+
+def bancos_resolver():
+    """Resolvedor das chaves de bancos_padrao.csv (limpas e compiladas uma única vez)."""
+    global _bancos_resolver
+    if _bancos_resolver is None:
+        df_map = carregar_bancos_padrao()
+        regras = [(row['name'], [re.escape(limpar_nome(row['chave']))]) for _, row in df_map.iterrows()]
+        _bancos_resolver = BankNameResolver(regras, normalizar=limpar_nome, fallback=lambda nome: nome)
+    return _bancos_resolver
 
 def normalizar_nome_banco(nome_extraido):
-    nome_limpo = limpar_nome(nome_extraido)
-    for _, row in df_map.iterrows():
-        chave = limpar_nome(row['chave'])
-        if chave in nome_limpo:
-            return row['name']
-    return nome_extraido
+    return bancos_resolver().resolve_one(nome_extraido)
+
+GARANTIA_REGEX = re.compile(r"Número\s*\n?(.*?)\n?Garantias", re.DOTALL | re.IGNORECASE)
+SO_TRACOS_REGEX = re.compile(r"[-\s]*")
 
 def tem_garantia(sub_bloco):
     """
     Se houver QUALQUER valor diferente de '-' entre 'Número' e 'Garantias', considera-se garantia presente.
     """
+    return _garantia_do_match(GARANTIA_REGEX.search(sub_bloco))
+
+def _garantia_do_match(match):
     try:
-        padrao = r"Número\s*\n?(.*?)\n?Garantias"
-        match = re.search(padrao, sub_bloco, re.DOTALL | re.IGNORECASE)
         if match:
             entre = match.group(1).strip()
-            if entre and entre != "-" and not re.fullmatch(r"[-\s]*", entre):
+            if entre and entre != "-" and not SO_TRACOS_REGEX.fullmatch(entre):
                 return 1.0
         return 0.0
     except:
         return 0.0
 
+MARCADOR_INSTITUICAO = "Informação comunicada pela instituição:"
+MARCADOR_MONTANTES = "Montantes"
+MARCADOR_PRODUTO = "Produto financeiro"
+
+# Quebras de linha (além de \n) reconhecidas por str.splitlines: blocos que as contêm são
+# normalizados como antes ("\n".join das linhas) antes de serem parseados.
+QUEBRAS_EXTRAS_REGEX = re.compile('[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+# "Total em dívida" cujo primeiro número é um valor em € (legível para os regex de dívida)
+DIVIDA_LEGIVEL_REGEX = re.compile(r"Total em dívida\D*?\d[\d\s,.]*€")
+# rótulos que só existem dentro de blocos de instituição
+ROTULOS_BLOCO = ("Montantes", "Total em", "Produto financeiro", "Tipo de responsabilidade")
+
+def _ocorrencias(texto, marcador, inicio, fim):
+    """Posições de todas as ocorrências de marcador em texto[inicio:fim]."""
+    posicoes = []
+    pos = texto.find(marcador, inicio, fim)
+    while pos != -1:
+        posicoes.append(pos)
+        pos = texto.find(marcador, pos + len(marcador), fim)
+    return posicoes
+
+def _sem_espacos(valor):
+    return valor.replace("\xa0", "").replace(" ", "") if valor else valor
+
 class PDFDataExtractor:
     def __init__(self):
         self.regexes = {
             'nome': re.compile(r'Nome:\s+(.+)', re.MULTILINE),
             'nif': re.compile(r'Nº de Identificação:\s+(\d+)'),
             'mesmapa': re.compile(r'Responsabilidades de crédito referentes a\s+(.+)', re.MULTILINE),
-            'anomapa': re.compile(r'\b(19|20|21)\d{2}\b'),
+            'anomapa': re.compile(r'\b(?:19|20|21)\d{2}\b'),
             'bloco_instituicao': re.compile(
                 r'(Informação comunicada pela instituição:.*?)(?=Informação comunicada pela instituição:|$)',
                 re.DOTALL
@@ -68,9 +108,49 @@ class PDFDataExtractor:
             'entradaincumpr': re.compile(r"Entrada incumpr\.\s+(\d{4}-\d{2}-\d{2})"),
         }
 
+        self.instituicao_linha_regex = re.compile(r"Informação comunicada pela instituição:\s+(.+)")
+        # campos lidos por sub-bloco (mesma ordem das colunas de cada linha)
+        self.campos_regexes = [
+            (key, regex) for key, regex in self.item_regexes.items()
+            if key not in ('instituicao', 'divida_fallback')
+        ]
+
     def get_header_info(self, text, key):
         match = self.regexes[key].search(text)
-        return match.group(1).strip() if match else None
+        if not match:
+            return None
+        # regex sem grupo (anomapa): o valor é o match inteiro
+        return (match.group(1) if match.re.groups else match.group(0)).strip()
+
+    def cabecalho(self, page_text, referencia=None):
+        """
+        nome, nif, mesmapa e anomapa da página. anomapa é o ano de 4 dígitos do cabeçalho
+        "referentes a <mês> de <ano>" ou, sem ele, o primeiro ano da página.
+        referencia é o cabeçalho da primeira página do PDF: se a página começa pelo mesmo trecho
+        em que os campos dela foram lidos (até um caractere depois do último match), o primeiro
+        match de cada regex é o mesmo e o valor é reaproveitado; os campos que faltam na
+        referência são procurados na própria página.
+        """
+        reaproveitar = referencia is not None and referencia['prefixo'] is not None \
+            and page_text.startswith(referencia['prefixo'])
+        fim = 0
+
+        def ler(key):
+            nonlocal fim
+            if reaproveitar and referencia[key] is not None:
+                return referencia[key]
+            match = self.regexes[key].search(page_text)
+            if not match:
+                return None
+            fim = max(fim, match.end() + 1)
+            return (match.group(1) if match.re.groups else match.group(0)).strip()
+
+        campos = {key: ler(key) for key in ('nome', 'nif', 'mesmapa')}
+        mesmapa = campos['mesmapa']
+        campos['anomapa'] = (mesmapa and self.get_header_info(mesmapa, 'anomapa')) or ler('anomapa')
+        # um match que chega ao fim do texto poderia continuar numa página mais longa
+        campos['prefixo'] = page_text[:fim] if fim <= len(page_text) else None
+        return campos
 
     def _sanitize_numeric(self, valor):
         if not valor or valor in ('-', ''):
@@ -81,79 +161,179 @@ class PDFDataExtractor:
             return 0.0
 
     def extract_data(self, pdf_pages_dict):
+        return self.build_dataframe(self.extract_rows(pdf_pages_dict))
+
+    @metrics.cronometrado("parsing")
+    def extract_rows(self, pdf_pages_dict):
+        """Extrai as linhas (dicts) de todos os blocos, sem montar o DataFrame."""
         data = []
 
         for pdf_name, pages in pdf_pages_dict.items():
+            arquivopdf = os.path.basename(pdf_name).replace("decrypted_", "")
+            referencia = None
             for page_number, page_text in sorted(pages.items()):
                 try:
-                    nome = self.get_header_info(page_text, 'nome')
-                    nif = self.get_header_info(page_text, 'nif')
-                    mesmapa = self.get_header_info(page_text, 'mesmapa')
-                    anomapa = self.get_header_info(page_text, 'anomapa')
-
-                    blocos_instituicao = self.regexes['bloco_instituicao'].findall(page_text)
-                    print(f"📄 Página texto_pagina{page_number} de '{pdf_name}' contém {len(blocos_instituicao)} blocos de instituição detectados.")
-
-                    for bloco in blocos_instituicao:
-                        bloco = bloco.replace('\xa0', ' ')
-                        linhas = bloco.strip().splitlines()
-                        nome_inst = "nao_identificada"
-
-                        if linhas and linhas[0].startswith("Informação comunicada pela instituição:"):
-                            match_inst = re.match(r"Informação comunicada pela instituição:\s+(.+)", linhas[0])
-                            if match_inst:
-                                nome_inst = match_inst.group(1).strip()
-                                bloco = "\n".join(linhas[1:])
-
-                        sub_blocos = re.findall(r"(Montantes.*?Produto financeiro.+?)(?=Montantes|$)", bloco, re.DOTALL)
-                        if not sub_blocos:
-                            sub_blocos = [bloco]
-
-                        for sub_bloco in sub_blocos:
-                            sub_bloco = sub_bloco.replace('\xa0', ' ')
-                            row = {
-                                'arquivopdf': os.path.basename(pdf_name).replace("decrypted_", ""),
-                                'paginapdf': f"texto_pagina{page_number}",
-                                'nome': nome.lower() if nome else None,
-                                'nif': nif,
-                                'mesmapa': mesmapa.lower() if mesmapa else None,
-                                'anomapa': anomapa,
-                                'instituicao': nome_inst.lower()
-                            }
-
-                            for key, regex in self.item_regexes.items():
-                                if key == 'instituicao' or key == 'divida_fallback':
-                                    continue
-
-                                match = regex.search(sub_bloco)
-                                valor = match.group(1).strip() if match else None
-
-                                if key == 'divida' and not valor:
-                                    fallback_match = self.item_regexes['divida_fallback'].search(sub_bloco)
-                                    valor = fallback_match.group(1).strip() if fallback_match else None
-
-                                if valor:
-                                    valor = valor.replace("\xa0", "").replace(" ", "")
-
-                                if key in ['divida', 'parcela']:
-                                    row[key] = self._sanitize_numeric(valor)
-                                elif key == 'numdevedores':
-                                    try:
-                                        row[key] = int(valor) if valor else None
-                                    except Exception:
-                                        row[key] = None
-                                else:
-                                    row[key] = valor
-
-                            row['garantias'] = tem_garantia(sub_bloco)
-                            data.append(row)
-
+                    linhas_antes = len(data)
+                    cabecalho = self.cabecalho(page_text, referencia)
+                    if referencia is None:
+                        referencia = cabecalho
+                    blocos = self._parse_page(data, page_text, page_number, pdf_name, arquivopdf, cabecalho)
+                    metrics.observar(BLOCOS_POR_PAGINA, blocos)
+                    metrics.observar(LINHAS_POR_PAGINA, len(data) - linhas_antes)
                 except Exception as e:
-                    log_msg = f"[{datetime.now().isoformat()}] Erro na página {page_number} do '{pdf_name}': {str(e)}\n"
-                    print(log_msg.strip())
-                    with open(LOG_FILE, "a", encoding="utf-8") as f:
-                        f.write(log_msg)
+                    metrics.erro("parsing")
+                    # nível ERROR: vai também para logs/erros_processamento.txt
+                    logger.error(f"Erro na página {page_number} do '{pdf_name}': {str(e)}",
+                                 extra={"arquivo": arquivopdf, "pagina": page_number, "etapa": "parsing"})
+
+        return data
+
+    def _parse_page(self, data, page_text, page_number, pdf_name, arquivopdf, cabecalho=None):
+        """
+        Parser de uma passagem por página: os blocos de instituição e os sub-blocos
+        "Montantes ... Produto financeiro" são delimitados por posição (str.find) e cada campo
+        é lido com o seu regex pré-compilado limitado ao intervalo do sub-bloco (pos/endpos),
+        sem findall com lookahead nem cópias de substrings. Gera as mesmas linhas que o
+        encadeamento anterior de regex por campo. cabecalho vem de self.cabecalho (lido
+        aqui quando não é passado). Devolve o número de blocos de instituição.
+        """
+        if cabecalho is None:
+            cabecalho = self.cabecalho(page_text)
+        nome, mesmapa = cabecalho['nome'], cabecalho['mesmapa']
+        base = {
+            'arquivopdf': arquivopdf,
+            'paginapdf': f"texto_pagina{page_number}",
+            'nome': nome.lower() if nome else None,
+            'nif': cabecalho['nif'],
+            'mesmapa': mesmapa.lower() if mesmapa else None,
+            'anomapa': cabecalho['anomapa'],
+        }
+
+        # os blocos são delimitados no texto original (um '\xa0' dentro do marcador o invalida)
+        marcadores = _ocorrencias(page_text, MARCADOR_INSTITUICAO, 0, len(page_text))
+        logger.debug("📄 Página texto_pagina%s de '%s' contém %d blocos de instituição detectados.",
+                     page_number, pdf_name, len(marcadores),
+                     extra={"arquivo": arquivopdf, "pagina": page_number, "etapa": "parsing"})
+        if not marcadores:
+            return 0
+
+        texto = page_text.replace('\xa0', ' ')
+        for i, inicio in enumerate(marcadores):
+            if i + 1 < len(marcadores):
+                fim_bloco = marcadores[i + 1]
+            else:
+                # "$" do regex de blocos casa antes de um "\n" final
+                fim_bloco = len(texto) - 1 if texto.endswith("\n") else len(texto)
+            fim = fim_bloco
+            while fim > inicio and texto[fim - 1].isspace():  # bloco.strip()
+                fim -= 1
+
+            # sem nome de instituição na primeira linha, o bloco segue sem strip
+            nome_inst = "nao_identificada"
+            alvo, a, b = texto, inicio, fim_bloco
+
+            if QUEBRAS_EXTRAS_REGEX.search(texto, inicio, fim):
+                linhas = texto[inicio:fim].splitlines()
+                match_inst = self.instituicao_linha_regex.match(linhas[0])
+                if match_inst:
+                    nome_inst = match_inst.group(1).strip()
+                    alvo = "\n".join(linhas[1:])
+                    a, b = 0, len(alvo)
+            else:
+                quebra = texto.find('\n', inicio, fim)
+                match_inst = self.instituicao_linha_regex.match(texto, inicio, quebra if quebra != -1 else fim)
+                if match_inst:
+                    nome_inst = match_inst.group(1).strip()
+                    a = quebra + 1 if quebra != -1 else fim
+                    b = fim
+
+            instituicao = nome_inst.lower()
+            for sub_a, sub_b in self._sub_blocos(alvo, a, b):
+                row = dict(base)
+                row['instituicao'] = instituicao
+                self._parse_sub_bloco(row, alvo, sub_a, sub_b)
+                data.append(row)
+        return len(marcadores)
+
+    def campos_em_falta(self, page_text):
+        """
+        Campos essenciais que o parser não consegue ler na página: 'divida' (Total em dívida) e
+        'prodfinanceiro' de cada sub-bloco, ou 'instituicao' quando há rótulos de bloco sem o
+        marcador da instituição. Usado pelo OCR adaptativo para decidir se a página volta a ser
+        lida em DPI alto. Página sem blocos (ex.: legenda) não tem campos em falta.
+        """
+        rows = []
+        self._parse_page(rows, page_text, 0, "", "")
+        if not rows:
+            return {"instituicao"} if any(rotulo in page_text for rotulo in ROTULOS_BLOCO) else set()
+
+        em_falta = set()
+        if any(not row['prodfinanceiro'] for row in rows):
+            em_falta.add("prodfinanceiro")
+        if len(DIVIDA_LEGIVEL_REGEX.findall(page_text.replace('\xa0', ' '))) < len(rows):
+            em_falta.add("divida")
+        return em_falta
+
+    @staticmethod
+    def _sub_blocos(texto, a, b):
+        """
+        Intervalos equivalentes ao findall de "(Montantes.*?Produto financeiro.+?)(?=Montantes|$)"
+        sobre o bloco texto[a:b]; sem nenhum, o bloco inteiro é um único sub-bloco.
+        """
+        montantes = _ocorrencias(texto, MARCADOR_MONTANTES, a, b)
+        if not montantes:
+            return [(a, b)]
+        produtos = _ocorrencias(texto, MARCADOR_PRODUTO, a, b)
+
+        intervalos = []
+        pos = a
+        while True:
+            k = bisect_left(montantes, pos)
+            if k == len(montantes):
+                break
+            i = montantes[k]
+            k = bisect_left(produtos, i + len(MARCADOR_MONTANTES))
+            if k == len(produtos) or produtos[k] + len(MARCADOR_PRODUTO) >= b:
+                break
+            inicio_resto = produtos[k] + len(MARCADOR_PRODUTO) + 1
+            k = bisect_left(montantes, inicio_resto)
+            if k < len(montantes):
+                pos = montantes[k]
+            elif b - 1 >= inicio_resto and texto[b - 1] == "\n":
+                pos = b - 1  # "$" casa antes de um "\n" final
+            else:
+                pos = b
+            intervalos.append((i, pos))
+
+        return intervalos or [(a, b)]
+
+    def _parse_sub_bloco(self, row, texto, a, b):
+        valores = {}
+        for key, regex in self.campos_regexes:
+            match = regex.search(texto, a, b)
+            valores[key] = match.group(1).strip() if match else None
+
+        divida = valores['divida']
+        if not divida:
+            match = self.item_regexes['divida_fallback'].search(texto, a, b)
+            divida = match.group(1).strip() if match else None
+
+        row['divida'] = self._sanitize_numeric(_sem_espacos(divida))
+        row['litigio'] = _sem_espacos(valores['litigio'])
+        row['parcela'] = self._sanitize_numeric(_sem_espacos(valores['parcela']))
+        numdevedores = _sem_espacos(valores['numdevedores'])
+        try:
+            row['numdevedores'] = int(numdevedores) if numdevedores else None
+        except Exception:
+            row['numdevedores'] = None
+        row['prodfinanceiro'] = _sem_espacos(valores['prodfinanceiro'])
+        row['datinicio'] = _sem_espacos(valores['datinicio'])
+        row['datfim'] = _sem_espacos(valores['datfim'])
+        row['entradaincumpr'] = _sem_espacos(valores['entradaincumpr'])
+        row['garantias'] = _garantia_do_match(GARANTIA_REGEX.search(texto, a, b))
 
+    def build_dataframe(self, data):
+        """Monta o DataFrame final a partir das linhas extraídas (de um ou vários PDFs)."""
         df_final = pd.DataFrame(data)
 
         colunas_esperadas = {
@@ -167,5 +347,5 @@ class PDFDataExtractor:
             if coluna not in df_final.columns:
                 df_final[coluna] = valor_padrao
 
-        print(f"\n📊 Total de linhas extraídas: {len(df_final)}")
+        logger.info(f"📊 Total de linhas extraídas: {len(df_final)}")
         return df_final
\ No newline at end of file
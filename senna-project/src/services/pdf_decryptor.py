@@ -1,8 +1,19 @@
 import os
+import time
 import shutil
-import tempfile
+import logging
+from io import BytesIO
+from collections import Counter
 import pikepdf
 from config import Config  # Certifique-se de que está corretamente apontando para seu arquivo de config
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# status de cada arquivo em decrypt_file_result
+DESCRIPTOGRAFADO = "descriptografado"
+SEM_CRIPTOGRAFIA = "sem_criptografia"
+ERRO = "erro"
 
 class PDFDecryptor:
     def __init__(self, source_folder=Config.ENCRYPTED_FOLDER, 
@@ -12,69 +23,125 @@ class PDFDecryptor:
         self.processed_folder = processed_folder
         self.target_folder = target_folder
 
+    def list_pdfs(self):
+        return [f for f in os.listdir(self.source_folder) if f.lower().endswith('.pdf')]
+
     def decrypt_pdfs_with_progress(self):
-        pdf_files = [f for f in os.listdir(self.source_folder) if f.lower().endswith('.pdf')]
+        """
+        Descriptografa todos os PDFs da pasta de origem e retorna os caminhos dos PDFs
+        descriptografados (os arquivos com erro ficam de fora).
+        """
+        pdf_files = self.list_pdfs()
         total_files = len(pdf_files)
 
         if total_files == 0:
-            print("Nenhum arquivo PDF encontrado na pasta maps.")
+            logger.info("Nenhum arquivo PDF encontrado na pasta maps.")
             return []
 
-        decrypted_files = []
-
+        resultados = []
         for index, pdf_file in enumerate(pdf_files, start=1):
-            encrypted_pdf_path = os.path.join(self.source_folder, pdf_file)
+            logger.info(f"Processando {index} de {total_files} PDFs...")
+            resultados.append(self.decrypt_file_result(pdf_file))
 
-            # Remove prefixos "decrypted_" se existirem
-            file_name_clean = pdf_file
-            while file_name_clean.startswith("decrypted_"):
-                file_name_clean = file_name_clean[len("decrypted_"):]
+        contagem = Counter(resultado["status"] for resultado in resultados)
+        logger.info(f"🔓 Descriptografia concluída: {contagem[DESCRIPTOGRAFADO]} descriptografados, "
+                    f"{contagem[SEM_CRIPTOGRAFIA]} sem criptografia, {contagem[ERRO]} com erro.",
+                    extra={"etapa": "descriptografia", **contagem})
+        return [resultado["caminho"] for resultado in resultados if resultado["status"] != ERRO]
 
-            decrypted_pdf_path = os.path.join(self.target_folder, f"decrypted_{file_name_clean}")
+    @staticmethod
+    def decrypted_name(pdf_file):
+        # Remove prefixos "decrypted_" se existirem
+        file_name_clean = pdf_file
+        while file_name_clean.startswith("decrypted_"):
+            file_name_clean = file_name_clean[len("decrypted_"):]
+        return f"decrypted_{file_name_clean}"
 
-            try:
-                print(f"Processando {index} de {total_files} PDFs...")
-                with pikepdf.open(encrypted_pdf_path) as pdf:
+    def move_to_processed(self, pdf_file):
+        # Move o original para a pasta processed
+        shutil.move(os.path.join(self.source_folder, pdf_file), os.path.join(self.processed_folder, pdf_file))
+        logger.debug("📁 PDF original criptografado movido para: %s", self.processed_folder,
+                     extra={"arquivo": pdf_file, "etapa": "descriptografia"})
+
+    @metrics.cronometrado("descriptografia")
+    def decrypt_file_result(self, pdf_file):
+        """
+        Descriptografa um PDF da pasta de origem e move o original para a pasta processed.
+        Retorna {arquivo, status, caminho, segundos, erro}, com status 'descriptografado',
+        'sem_criptografia' (o PDF não é reescrito: vira um hard link, ou cópia se o sistema
+        de arquivos não permitir) ou 'erro' (caminho None e a mensagem em erro).
+        """
+        encrypted_pdf_path = os.path.join(self.source_folder, pdf_file)
+        decrypted_pdf_path = os.path.join(self.target_folder, self.decrypted_name(pdf_file))
+        resultado = {"arquivo": pdf_file, "status": ERRO, "caminho": None, "segundos": None, "erro": None}
+        inicio = time.perf_counter()
+
+        try:
+            with pikepdf.open(encrypted_pdf_path) as pdf:
+                if pdf.is_encrypted:
                     pdf.save(decrypted_pdf_path)
-                print(f"✅ PDF desbloqueado com sucesso! Salvo em: {decrypted_pdf_path}")
+                    resultado["status"] = DESCRIPTOGRAFADO
+            if resultado["status"] != DESCRIPTOGRAFADO:
+                self._ligar(encrypted_pdf_path, decrypted_pdf_path)
+                resultado["status"] = SEM_CRIPTOGRAFIA
+            logger.debug("✅ PDF desbloqueado com sucesso (%s)! Salvo em: %s", resultado["status"], decrypted_pdf_path,
+                         extra={"arquivo": pdf_file, "etapa": "descriptografia"})
 
-                # Move o original para a pasta processed
-                shutil.move(encrypted_pdf_path, os.path.join(self.processed_folder, pdf_file))
-                print(f"📁 PDF original criptografado movido para: {self.processed_folder}")
+            self.move_to_processed(pdf_file)
 
-                decrypted_files.append(decrypted_pdf_path)
-            except pikepdf.PasswordError:
-                print(f"🔒 O PDF '{pdf_file}' está protegido por senha e não pode ser desbloqueado.")
-            except FileNotFoundError as e:
-                print(f"❌ Erro: Arquivo não encontrado. {e}")
-            except Exception as e:
-                print(f"⚠️ Ocorreu um erro ao descriptografar: {e}")
+            resultado["caminho"] = decrypted_pdf_path
+        except pikepdf.PasswordError as e:
+            resultado["erro"] = f"protegido por senha: {e}"
+            logger.error(f"🔒 O PDF '{pdf_file}' está protegido por senha e não pode ser desbloqueado.",
+                         extra={"arquivo": pdf_file, "etapa": "descriptografia"})
+        except FileNotFoundError as e:
+            resultado["erro"] = str(e)
+            logger.error(f"❌ Erro: Arquivo não encontrado. {e}", extra={"arquivo": pdf_file, "etapa": "descriptografia"})
+        except Exception as e:
+            resultado["erro"] = str(e)
+            logger.error(f"⚠️ Ocorreu um erro ao descriptografar: {e}", extra={"arquivo": pdf_file, "etapa": "descriptografia"})
 
-        return decrypted_files
+        if resultado["status"] == ERRO:
+            metrics.erro("descriptografia")
+        resultado["segundos"] = round(time.perf_counter() - inicio, 4)
+        return resultado
 
-    def decrypt_single_pdf(self, input_path):
+    @staticmethod
+    def _ligar(origem, destino):
+        """PDF sem criptografia: hard link para o destino em vez de reescrevê-lo (cópia se o link falhar)."""
+        if os.path.lexists(destino):
+            os.remove(destino)
+        try:
+            os.link(origem, destino)
+        except OSError:
+            shutil.copy2(origem, destino)
+
+    @metrics.cronometrado("descriptografia")
+    def decrypt_bytes(self, conteudo):
         """
-        Descriptografa um único PDF — usado para a API REST.
-        Se estiver criptografado, remove proteção.
-        Caso contrário, apenas copia para um temporário.
+        Descriptografa um PDF inteiramente em memória — usado pela API REST.
+        Recebe os bytes do upload e devolve um BytesIO pronto para o PdfReader
+        (ou None em caso de erro). Nenhum arquivo é gravado em disco.
         """
         try:
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-            temp_path = temp_file.name
-            temp_file.close()
-
+            output = BytesIO()
             try:
-                # Tenta descriptografar com pikepdf
-                with pikepdf.open(input_path) as pdf:
-                    pdf.save(temp_path)
-                print(f"🔓 PDF descriptografado com pikepdf: {temp_path}")
-            except pikepdf._qpdf.PasswordError:
-                # Se não estiver criptografado, apenas copia
-                shutil.copy(input_path, temp_path)
-                print(f"📎 PDF não criptografado, apenas copiado: {temp_path}")
+                with pikepdf.open(BytesIO(conteudo)) as pdf:
+                    if pdf.is_encrypted:
+                        pdf.save(output)
+                    else:
+                        # sem criptografia não há o que reescrever
+                        output = BytesIO(conteudo)
+                logger.debug("🔓 PDF descriptografado em memória com pikepdf.")
+            except pikepdf.PasswordError:
+                # Se não for possível descriptografar, segue com os bytes originais
+                output = BytesIO(conteudo)
+                logger.debug("📎 PDF não descriptografado, usando os bytes originais.")
 
-            return temp_path
+            output.seek(0)
+            return output
 
         except Exception as e:
-            print(f"❌ Erro ao processar PDF único: {e}")
-            return None
\ No newline at end of file
+            logger.error(f"❌ Erro ao processar PDF em memória: {e}", extra={"etapa": "descriptografia"})
+            metrics.erro("descriptografia")
+            return None
@@ -1,71 +1,361 @@
 import os
 import shutil
 import re
+import logging
+import pikepdf
 from PyPDF2 import PdfReader
 from config import Config
-import pytesseract
-from pdf2image import convert_from_path
-from PIL import Image
-import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.metrics import metrics, PAGINAS, DOCUMENTOS, OCR_PAGINA_SEGUNDOS, OCR_REFINADAS
+
+logger = logging.getLogger(__name__)
+
+# caracteres de um MDR: letras com os acentos do português, dígitos e a pontuação de valores,
+# datas e rótulos ("Nº", "€"); sem aspas nem barra invertida (o config passa por shlex.split)
+OCR_CARACTERES = (
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+    "ÁÀÂÃÇÉÊÍÓÔÕÚáàâãçéêíóôõú"
+    "0123456789.,:;-/()€%ºª&+*"
+)
+OCR_CONFIG_MDR = f"--psm {Config.OCR_PSM} -c tessedit_char_whitelist={OCR_CARACTERES}"
+
+# operadores que desenham texto num content stream: Tj, TJ, ' e " (estes dois após a string)
+OPERADOR_TEXTO_REGEX = re.compile(rb"T[jJ]|[)\]>]\s*['\"]")
 
 class PDFTextExtractor:
-    def __init__(self, input_folder=Config.DECRYPTED_FOLDER, processed_folder=Config.PROCESSED_DECRYPTED_FOLDER):
+    def __init__(self, input_folder=Config.DECRYPTED_FOLDER, processed_folder=Config.PROCESSED_DECRYPTED_FOLDER,
+                 ocr_workers=Config.OCR_WORKERS):
         self.input_folder = input_folder
         self.processed_folder = processed_folder
+        self.ocr_workers = max(1, ocr_workers or 1)
+        self._parser = None
+
+    def list_pdfs(self):
+        return [os.path.join(self.input_folder, f) for f in os.listdir(self.input_folder) if f.lower().endswith(".pdf")]
 
     def extract_text_from_pdfs(self, pdf_paths=None):
         if pdf_paths is None:
-            pdf_paths = [os.path.join(self.input_folder, f) for f in os.listdir(self.input_folder) if f.lower().endswith(".pdf")]
+            pdf_paths = self.list_pdfs()
 
         if not pdf_paths:
-            print("Nenhum PDF encontrado para extração.")
+            logger.info("Nenhum PDF encontrado para extração.")
             return {}
 
         pdfs_text = {}
         for input_pdf_path in pdf_paths:
             file_name = os.path.basename(input_pdf_path)
-            processed_pdf_path = os.path.join(self.processed_folder, file_name)
 
             try:
-                reader = PdfReader(input_pdf_path)
-                pagina_dict = {}
-                paginas_validas = 0
+                pagina_dict = self.extract_pages(input_pdf_path)
+                logger.info(f"📄 '{file_name}' tem {len(pagina_dict)} páginas extraídas.",
+                            extra={"arquivo": file_name, "etapa": "extracao_texto"})
+                pdfs_text[file_name] = pagina_dict
+
+            except Exception as e:
+                logger.error(f"⚠️ Erro ao extrair '{file_name}': {e}", extra={"arquivo": file_name, "etapa": "extracao_texto"})
+            finally:
+                self.move_to_processed(input_pdf_path)
+
+        return pdfs_text
+
+    def move_to_processed(self, pdf_path):
+        shutil.move(pdf_path, os.path.join(self.processed_folder, os.path.basename(pdf_path)))
+
+    def extract_text_from_stream(self, stream, file_name):
+        """
+        Extrai o texto de um PDF em memória (ex.: BytesIO vindo da API), sem gravar nada em disco.
+        Retorna {file_name: {texto_paginaN: texto}} como extract_text_from_pdfs.
+        """
+        try:
+            pagina_dict = self.extract_pages(stream)
+            logger.info(f"📄 '{file_name}' tem {len(pagina_dict)} páginas extraídas.",
+                        extra={"arquivo": file_name, "etapa": "extracao_texto"})
+            return {file_name: pagina_dict}
+        except Exception as e:
+            logger.error(f"⚠️ Erro ao extrair '{file_name}': {e}", extra={"arquivo": file_name, "etapa": "extracao_texto"})
+            return {}
 
+    def extract_pages(self, pdf_source):
+        """
+        Extrai o texto de cada página de um PDF (caminho ou stream binário).
+        Páginas sem texto passam pelo fallback OCR. Retorna {texto_paginaN: texto}.
+        """
+        textos = {}
+        paginas_ocr = []
+
+        with metrics.cronometrar("extracao_texto"):
+            tipo, sem_texto, total = self.classificar(pdf_source)
+            if tipo == "digitalizado":
+                # só imagem: nenhuma tentativa de extract_text, todas as páginas vão para o OCR
+                paginas_ocr = list(range(total))
+            else:
+                reader = PdfReader(pdf_source)
                 for idx, page in enumerate(reader.pages):
-                    text = page.extract_text()
+                    text = page.extract_text() if idx not in sem_texto else None
                     if text and text.strip():
-                        pagina_dict[f"texto_pagina{idx+1}"] = text.strip()
-                        paginas_validas += 1
+                        textos[idx] = text.strip()
                     else:
-                        # ⚠️ OCR fallback
-                        ocr_text = self.extract_text_with_ocr(input_pdf_path, idx)
-                        if ocr_text:
-                            pagina_dict[f"texto_pagina{idx+1}"] = ocr_text
-                            paginas_validas += 1
+                        paginas_ocr.append(idx)
+        metrics.incrementar(DOCUMENTOS, tipo=tipo)
+        metrics.incrementar(PAGINAS, len(textos), origem="texto")
 
-                print(f"📄 '{file_name}' tem {paginas_validas} páginas extraídas.")
-                pdfs_text[file_name] = pagina_dict
+        # ⚠️ OCR fallback: todas as páginas sem texto de uma vez
+        if paginas_ocr:
+            textos.update(self.extract_text_with_ocr_batch(pdf_source, paginas_ocr))
 
-            except Exception as e:
-                print(f"⚠️ Erro ao extrair '{file_name}': {e}")
-            finally:
-                shutil.move(input_pdf_path, processed_pdf_path)
+        return {
+            f"texto_pagina{idx+1}": textos[idx]
+            for idx in sorted(textos)
+            if textos[idx]
+        }
 
-        return pdfs_text
+    @staticmethod
+    def classificar(pdf_source):
+        """
+        Classifica o PDF pelas fontes e content streams de cada página (pikepdf), sem extrair texto.
+        Uma página tem texto quando há fontes nos seus recursos e o content stream desenha texto
+        (ou delega a um Form XObject); as demais só têm imagens ou desenhos e precisam de OCR.
+        Retorna (tipo, índices base 0 das páginas sem texto, total de páginas), com tipo
+        'texto', 'digitalizado' ou 'misto'. Se o PDF não puder ser inspecionado, devolve 'texto'
+        e a extração segue página a página como antes.
+        """
+        try:
+            with pikepdf.open(pdf_source) as pdf:
+                sem_texto = {idx for idx, pagina in enumerate(pdf.pages) if not _pagina_tem_texto(pagina)}
+                total = len(pdf.pages)
+        except Exception as e:
+            logger.debug("Classificação do PDF indisponível (%s): extração página a página.", e,
+                         extra={"arquivo": str(pdf_source), "etapa": "extracao_texto"})
+            return "texto", set(), None
+        finally:
+            if hasattr(pdf_source, "seek"):
+                pdf_source.seek(0)
+
+        if not sem_texto:
+            tipo = "texto"
+        elif len(sem_texto) == total:
+            tipo = "digitalizado"
+        else:
+            tipo = "misto"
+        return tipo, sem_texto, total
 
     def extract_text_with_ocr(self, pdf_path, page_index):
+        return self.extract_text_with_ocr_batch(pdf_path, [page_index]).get(page_index, "")
+
+    @metrics.cronometrado("ocr")
+    def extract_text_with_ocr_batch(self, pdf_path, page_indexes):
+        """
+        Aplica OCR às páginas indicadas (índices base 0) de um PDF (caminho ou stream binário).
+        Retorna {indice_pagina: texto}.
+
+        No modo adaptativo (Config.OCR_ADAPTATIVO) as páginas são rasterizadas em Config.OCR_DPI,
+        em tons de cinza binarizados, e lidas com o Tesseract ajustado ao MDR (--psm e caracteres
+        limitados). Só as páginas com confiança abaixo de Config.OCR_CONFIANCA_MINIMA ou em que o
+        parser não encontra "Total em dívida"/"Produto financeiro" voltam a ser lidas em
+        Config.OCR_DPI_ALTO. Sem o modo adaptativo, é a leitura a 300 DPI com as opções padrão.
+        """
+        page_indexes = sorted(set(page_indexes))
+        if not page_indexes:
+            return {}
+
+        if not Config.OCR_ADAPTATIVO:
+            lidas = self._ocr_paginas(pdf_path, page_indexes, dpi=300, passagem="padrao")
+        else:
+            lidas = self._ocr_paginas(pdf_path, page_indexes, dpi=Config.OCR_DPI, passagem="rapida")
+            refinar = {}
+            for idx, (texto, confianca) in lidas.items():
+                if confianca < Config.OCR_CONFIANCA_MINIMA:
+                    refinar[idx] = "confianca"
+                elif self._campos_em_falta(texto):
+                    refinar[idx] = "campos"
+
+            if refinar:
+                for idx, motivo in refinar.items():
+                    metrics.incrementar(OCR_REFINADAS, motivo=motivo)
+                    logger.debug("🔍 Página %d de '%s' relida a %d DPI (motivo: %s, confiança %.0f).",
+                                 idx + 1, pdf_path, Config.OCR_DPI_ALTO, motivo, lidas[idx][1],
+                                 extra={"arquivo": str(pdf_path), "pagina": idx + 1, "etapa": "ocr"})
+                relidas = self._ocr_paginas(pdf_path, sorted(refinar), dpi=Config.OCR_DPI_ALTO, passagem="alta")
+                lidas.update((idx, lida) for idx, lida in relidas.items() if lida[0])
+
+        metrics.incrementar(PAGINAS, len(lidas), origem="ocr")
+        return {idx: texto for idx, (texto, _) in lidas.items()}
+
+    def _ocr_paginas(self, pdf_path, page_indexes, dpi, passagem):
+        """
+        Cada sequência contínua de páginas é rasterizada numa única chamada ao poppler
+        (com thread_count) e o Tesseract roda em paralelo sobre as imagens.
+        Retorna {indice_pagina: (texto, confiança)} das páginas lidas sem erro.
+        """
+        ajustado = passagem != "padrao"
+        imagens = {}
+        for first, last in self._paginas_continuas(page_indexes):
+            try:
+                images = self._rasterizar(pdf_path, first, last, dpi=dpi, grayscale=ajustado)
+                imagens.update(zip(range(first, last + 1), images))
+            except Exception as e:
+                logger.error(f"❌ Erro ao rasterizar páginas {first+1}-{last+1} de '{pdf_path}': {e}",
+                             extra={"arquivo": str(pdf_path), "pagina": first + 1, "etapa": "ocr"})
+
+        if not imagens:
+            return {}
+
+        workers = min(self.ocr_workers, len(imagens))
+        if workers > 1:
+            # cada Tesseract usa uma thread; o paralelismo vem do pool
+            os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+        indices = sorted(imagens)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            resultados = executor.map(
+                lambda idx: self._ocr_imagem(imagens.pop(idx), pdf_path, idx, passagem), indices
+            )
+            return {idx: lida for idx, lida in zip(indices, resultados) if lida is not None}
+
+    def _campos_em_falta(self, texto):
+        # o parser só é criado quando alguma página passa pelo OCR adaptativo
+        if self._parser is None:
+            from services.pdf_data_extractor import PDFDataExtractor
+            self._parser = PDFDataExtractor()
+        return self._parser.campos_em_falta(texto)
+
+    def _rasterizar(self, pdf_source, first, last, dpi=300, grayscale=False):
+        # pdf2image/PIL só são carregados quando alguma página precisa de OCR
+        from pdf2image import convert_from_path, convert_from_bytes
+
+        # sem output_folder: o pdftoppm devolve as imagens pelo pipe, em memória (um MDR tem
+        # poucas páginas); uma sequência contínua, ou o documento digitalizado inteiro, é uma chamada
+        kwargs = dict(
+            dpi=dpi,
+            grayscale=grayscale,
+            first_page=first + 1,
+            last_page=last + 1,
+            thread_count=min(self.ocr_workers, last - first + 1)
+        )
+        if isinstance(pdf_source, (str, os.PathLike)):
+            return convert_from_path(pdf_source, **kwargs)
+        return convert_from_bytes(pdf_source.getvalue(), **kwargs)
+
+    @staticmethod
+    def _paginas_continuas(page_indexes):
+        """Agrupa índices ordenados em intervalos contínuos [(primeira, última), ...]."""
+        intervalos = []
+        for idx in page_indexes:
+            if intervalos and idx == intervalos[-1][1] + 1:
+                intervalos[-1] = (intervalos[-1][0], idx)
+            else:
+                intervalos.append((idx, idx))
+        return intervalos
+
+    @staticmethod
+    def _ocr_imagem(image, pdf_path, page_index, passagem):
         try:
-            with tempfile.TemporaryDirectory() as path:
-                images = convert_from_path(
-                    pdf_path,
-                    dpi=300,
-                    first_page=page_index + 1,
-                    last_page=page_index + 1,
-                    output_folder=path
-                )
-                if images:
-                    ocr_text = pytesseract.image_to_string(images[0], lang='por')
-                    return ocr_text.strip()
+            import pytesseract
+            inicio = time.perf_counter()
+            if passagem == "padrao":
+                lida = (pytesseract.image_to_string(image, lang='por').strip(), 100.0)
+            else:
+                if passagem == "rapida":
+                    image = _binarizar(image)
+                dados = pytesseract.image_to_data(image, lang='por', config=OCR_CONFIG_MDR,
+                                                  output_type=pytesseract.Output.DICT)
+                lida = _texto_e_confianca(dados)
+            metrics.observar(OCR_PAGINA_SEGUNDOS, time.perf_counter() - inicio, passagem=passagem)
+            return lida
         except Exception as e:
-            print(f"❌ Erro ao aplicar OCR na página {page_index+1} de '{pdf_path}': {e}")
-        return ""
\ No newline at end of file
+            logger.error(f"❌ Erro ao aplicar OCR na página {page_index+1} de '{pdf_path}': {e}",
+                         extra={"arquivo": str(pdf_path), "pagina": page_index + 1, "etapa": "ocr"})
+            metrics.erro("ocr")
+        return None
+
+def _pagina_tem_texto(pagina):
+    recursos = _herdado(pagina.obj, "/Resources")
+    if not _tem_fontes(recursos, set()):
+        return False
+    conteudo = pagina.obj.get("/Contents")
+    if conteudo is None:
+        return False
+    streams = conteudo if isinstance(conteudo, pikepdf.Array) else [conteudo]
+    bruto = b"".join(stream.read_bytes() for stream in streams)
+    if OPERADOR_TEXTO_REGEX.search(bruto):
+        return True
+    # o texto pode estar desenhado dentro de um Form XObject chamado pela página
+    xobjects = recursos.get("/XObject")
+    return b"Do" in bruto and xobjects is not None and any(
+        xobjects[nome].get("/Subtype") == "/Form" for nome in xobjects.keys())
+
+def _herdado(objeto, chave):
+    """Atributo da página ou, se ausente, herdado dos nós /Pages acima dela."""
+    vistos = 0
+    while objeto is not None and vistos < 64:
+        valor = objeto.get(chave)
+        if valor is not None:
+            return valor
+        objeto = objeto.get("/Parent")
+        vistos += 1
+    return None
+
+def _tem_fontes(recursos, vistos):
+    """Há alguma fonte nos recursos (ou nos de um Form XObject usado por eles)?"""
+    if not isinstance(recursos, pikepdf.Dictionary):
+        return False
+    fontes = recursos.get("/Font")
+    if isinstance(fontes, pikepdf.Dictionary) and len(fontes.keys()):
+        return True
+    xobjects = recursos.get("/XObject")
+    if not isinstance(xobjects, pikepdf.Dictionary):
+        return False
+    for nome in xobjects.keys():
+        xobject = xobjects[nome]
+        if xobject.get("/Subtype") != "/Form" or xobject.objgen in vistos:
+            continue
+        vistos.add(xobject.objgen)
+        if _tem_fontes(xobject.get("/Resources"), vistos):
+            return True
+    return False
+
+def _binarizar(imagem):
+    """Tons de cinza -> preto e branco, com o limiar de Otsu calculado pelo histograma da página."""
+    cinza = imagem.convert("L")
+    histograma = cinza.histogram()
+    total = sum(histograma)
+    soma_total = sum(nivel * quantidade for nivel, quantidade in enumerate(histograma))
+    peso_fundo = soma_fundo = 0
+    melhor, limiar = -1.0, 127
+    for nivel, quantidade in enumerate(histograma):
+        peso_fundo += quantidade
+        peso_frente = total - peso_fundo
+        if not peso_fundo:
+            continue
+        if not peso_frente:
+            break
+        soma_fundo += nivel * quantidade
+        media_fundo = soma_fundo / peso_fundo
+        media_frente = (soma_total - soma_fundo) / peso_frente
+        variancia = peso_fundo * peso_frente * (media_fundo - media_frente) ** 2
+        if variancia > melhor:
+            melhor, limiar = variancia, nivel
+    return cinza.point([255 if nivel > limiar else 0 for nivel in range(256)], "1")
+
+def _texto_e_confianca(dados):
+    """
+    Texto de um image_to_data (uma linha por linha do Tesseract, linha em branco entre
+    blocos, como o image_to_string) e a confiança média (0-100) das palavras.
+    """
+    linhas, confiancas = {}, []
+    for bloco, paragrafo, linha, palavra, confianca in zip(
+            dados["block_num"], dados["par_num"], dados["line_num"], dados["text"], dados["conf"]):
+        if not palavra or not palavra.strip():
+            continue
+        linhas.setdefault((bloco, paragrafo, linha), []).append(palavra.strip())
+        if float(confianca) >= 0:
+            confiancas.append(float(confianca))
+
+    texto, anterior = [], None
+    for (bloco, paragrafo, _), palavras in linhas.items():
+        if anterior is not None and (bloco, paragrafo) != anterior:
+            texto.append("")
+        texto.append(" ".join(palavras))
+        anterior = (bloco, paragrafo)
+    return "\n".join(texto), (sum(confiancas) / len(confiancas) if confiancas else 0.0)
@@ -0,0 +1,177 @@
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+from config import Config
+
+class ProcessingLedger:
+    """
+    Registro em SQLite do progresso de cada PDF do lote, endereçado pelo SHA-256 do arquivo
+    recebido (o mesmo conteúdo com outro nome é o mesmo registro).
+
+    Etapas, em ordem: recebido → descriptografado → texto_extraido → parseado → perfilado →
+    exportado. Um arquivo já exportado não volta a ser processado nem exportado; um arquivo que
+    parou no meio (queda do processo) é retomado na execução seguinte a partir do que ficou
+    guardado (cache de texto, PDF descriptografado ou o original em processed).
+    Falhas definitivas (ex.: PDF protegido por senha) ficam com erro e só são tentadas de novo
+    se o arquivo for enviado outra vez. A coluna descriptografia guarda o status de
+    PDFDecryptor.decrypt_file_result (descriptografado, sem_criptografia ou erro). Com enabled=False nada é registrado.
+    """
+
+    RECEBIDO = "recebido"
+    DESCRIPTOGRAFADO = "descriptografado"
+    TEXTO_EXTRAIDO = "texto_extraido"
+    PARSEADO = "parseado"
+    PERFILADO = "perfilado"
+    EXPORTADO = "exportado"
+
+    def __init__(self, db_path=Config.LEDGER_DB, enabled=Config.LEDGER_ENABLED,
+                 stale_seconds=Config.LEDGER_STALE_SECONDS):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.stale_seconds = stale_seconds
+        if not self.enabled:
+            return
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS arquivos (
+                    chave TEXT PRIMARY KEY,
+                    chave_descriptografado TEXT,
+                    arquivo TEXT NOT NULL,
+                    etapa TEXT NOT NULL,
+                    linhas INTEGER,
+                    caminho_original TEXT,
+                    caminho_descriptografado TEXT,
+                    descriptografia TEXT,
+                    erro TEXT,
+                    pid INTEGER,
+                    criado_em REAL NOT NULL,
+                    atualizado_em REAL NOT NULL
+                )
+            """)
+            colunas = {row["name"] for row in conn.execute("PRAGMA table_info(arquivos)")}
+            if "descriptografia" not in colunas:
+                conn.execute("ALTER TABLE arquivos ADD COLUMN descriptografia TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS arquivos_descriptografado ON arquivos (chave_descriptografado)")
+            conn.execute("CREATE INDEX IF NOT EXISTS arquivos_etapa ON arquivos (etapa)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            yield conn
+        finally:
+            conn.close()
+
+    def etapa(self, chave):
+        """Etapa registrada para o conteúdo, ou None se nunca foi visto."""
+        if not self.enabled or not chave:
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT etapa FROM arquivos WHERE chave = ?", (chave,)).fetchone()
+        return row["etapa"] if row else None
+
+    def chave_de_descriptografado(self, chave_descriptografado):
+        """Chave do original a partir do hash de um PDF já descriptografado por este pipeline."""
+        if not self.enabled or not chave_descriptografado:
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT chave FROM arquivos WHERE chave_descriptografado = ? LIMIT 1", (chave_descriptografado,)
+            ).fetchone()
+        return row["chave"] if row else None
+
+    def registrar(self, chave, arquivo, **campos):
+        """Marca o conteúdo como recebido por este processo (um erro anterior é descartado)."""
+        if not self.enabled or not chave:
+            return
+        agora = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO arquivos (chave, arquivo, etapa, pid, criado_em, atualizado_em) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (chave) DO UPDATE SET arquivo = excluded.arquivo, pid = excluded.pid, "
+                "erro = NULL, atualizado_em = excluded.atualizado_em",
+                (chave, arquivo, self.RECEBIDO, os.getpid(), agora, agora),
+            )
+        if campos:
+            self._atualizar(chave, **campos)
+
+    def _atualizar(self, chave, **campos):
+        colunas = ", ".join(f"{coluna} = ?" for coluna in campos)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE arquivos SET {colunas}, atualizado_em = ? WHERE chave = ?",
+                (*campos.values(), time.time(), chave),
+            )
+
+    def avancar(self, chave, etapa, **campos):
+        """Registra que o conteúdo chegou à etapa (com campos extras: linhas, caminhos...)."""
+        if not self.enabled or not chave:
+            return
+        self._atualizar(chave, etapa=etapa, erro=None, **campos)
+
+    def avancar_lote(self, chaves, etapa, de=(PARSEADO, PERFILADO)):
+        """Avança de uma vez os conteúdos de um lote que estão numa das etapas de origem."""
+        chaves = [chave for chave in chaves if chave]
+        if not self.enabled or not chaves:
+            return
+        marcadores = ", ".join("?" * len(chaves))
+        origens = ", ".join("?" * len(de))
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE arquivos SET etapa = ?, atualizado_em = ? "
+                f"WHERE chave IN ({marcadores}) AND etapa IN ({origens})",
+                (etapa, time.time(), *chaves, *de),
+            )
+
+    def falhar(self, chave, erro, **campos):
+        if not self.enabled or not chave:
+            return
+        self._atualizar(chave, erro=str(erro), **campos)
+
+    def exportados(self, chaves):
+        """Subconjunto das chaves que já foram exportadas."""
+        chaves = [chave for chave in chaves if chave]
+        if not self.enabled or not chaves:
+            return set()
+        marcadores = ", ".join("?" * len(chaves))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT chave FROM arquivos WHERE etapa = ? AND chave IN ({marcadores})",
+                (self.EXPORTADO, *chaves),
+            ).fetchall()
+        return {row["chave"] for row in rows}
+
+    @staticmethod
+    def _processo_vivo(pid):
+        if not pid:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def pendentes(self):
+        """
+        Registros interrompidos: não exportados, sem erro e cujo processo já terminou
+        (ou parados há mais de stale_seconds).
+        """
+        if not self.enabled:
+            return []
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM arquivos WHERE etapa != ? AND erro IS NULL ORDER BY criado_em",
+                (self.EXPORTADO,),
+            ).fetchall()
+        limite = time.time() - self.stale_seconds
+        return [
+            dict(row) for row in rows
+            if row["pid"] != os.getpid()
+            and (not self._processo_vivo(row["pid"]) or row["atualizado_em"] < limite)
+        ]
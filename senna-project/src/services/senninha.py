@@ -1,10 +1,13 @@
 import pandas as pd
+import numpy as np
 import unicodedata
-import os
 import re
-import json
-from config import Config
-from utils.text_utils import map_financial_product  # ✅ ADICIONADO
+import logging
+from utils.text_utils import map_by_category, map_financial_products, is_habitacao_product  # ✅ ADICIONADO
+from services.bank_name_resolver import BankNameResolver
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 class Senninha:
     BANK_MINIMA = {
@@ -41,16 +44,28 @@ class Senninha:
         text = "".join([c for c in text if not unicodedata.combining(c)])
         return text.lower()
 
+    _BASE_SEPARADORES_REGEX = re.compile(r"[,.;:()\-\n]+")
+    _BASE_ESPACOS_REGEX = re.compile(r"\s+")
+    _bank_resolver = None
+
     @classmethod
-    def normalize_bank_name(cls, instituicao: str) -> str:
+    def _bank_base(cls, instituicao: str) -> str:
         base = cls._strip_accents_lower(instituicao)
-        base = re.sub(r"[,.;:()\-\n]+", " ", base)
-        base = re.sub(r"\s+", " ", base).strip()
-        for bank_key, patterns in cls.BANK_PATTERNS.items():
-            for pat in patterns:
-                if re.search(pat, base):
-                    return bank_key
-        return ""
+        base = cls._BASE_SEPARADORES_REGEX.sub(" ", base)
+        return cls._BASE_ESPACOS_REGEX.sub(" ", base).strip()
+
+    @classmethod
+    def bank_resolver(cls) -> BankNameResolver:
+        """Resolvedor (compilado uma vez, com cache) de instituição → chave de BANK_PATTERNS."""
+        if cls._bank_resolver is None:
+            cls._bank_resolver = BankNameResolver(
+                cls.BANK_PATTERNS.items(), normalizar=cls._bank_base, fallback=lambda _: ""
+            )
+        return cls._bank_resolver
+
+    @classmethod
+    def normalize_bank_name(cls, instituicao: str) -> str:
+        return cls.bank_resolver().resolve_one(instituicao)
 
     @staticmethod
     def parse_float(valor_str):
@@ -64,155 +79,113 @@ class Senninha:
         return valor_str
 
     @staticmethod
+    def _mapear_unicos(serie: pd.Series, func, padrao_nulo=None) -> pd.Series:
+        """
+        Aplica func uma única vez por valor distinto da série (pd.factorize) e espalha o
+        resultado pelas linhas; valores nulos recebem padrao_nulo.
+        """
+        codigos, unicos = pd.factorize(serie)
+        resultados = np.array([func(v) for v in unicos] + [padrao_nulo], dtype=object)
+        return pd.Series(resultados[codigos], index=serie.index)
+
+    @staticmethod
+    def _is_nao(x) -> bool:
+        return isinstance(x, str) and x.replace('\xa0', '').strip().lower() in ('não', 'nao')
+
+    @staticmethod
+    def _verdadeiro(serie: pd.Series) -> pd.Series:
+        """Equivalente vetorizado de bool(valor) por linha (None/''/0 → False, NaN → True)."""
+        return serie.astype(bool)
+
+    @staticmethod
+    def build_map_id(df: pd.DataFrame) -> pd.Series:
+        """
+        Identificador do MAPA: arquivopdf; na falta dele "mesmapa|anomapa" (ou só um dos
+        dois); por último o nif.
+        """
+        def coluna(nome):
+            if nome in df.columns:
+                return df[nome]
+            return pd.Series(None, index=df.index, dtype=object)
+
+        arquivo, mesmapa, anomapa = coluna('arquivopdf'), coluna('mesmapa'), coluna('anomapa')
+        arquivo_str = arquivo.astype(str)
+        mes_ok, ano_ok = Senninha._verdadeiro(mesmapa), Senninha._verdadeiro(anomapa)
+        mes_str, ano_str = mesmapa.astype(str), anomapa.astype(str)
+
+        map_id = coluna('nif').astype(str) if 'nif' in df.columns else pd.Series('', index=df.index)
+        map_id = map_id.mask(ano_ok, ano_str)
+        map_id = map_id.mask(mes_ok, mes_str)
+        map_id = map_id.mask(mes_ok & ano_ok, mes_str + "|" + ano_str)
+        arquivo_ok = Senninha._verdadeiro(arquivo) & (arquivo_str.str.strip() != "")
+        return map_id.mask(arquivo_ok, arquivo_str)
+
+    @staticmethod
+    @metrics.cronometrado("perfilamento")
     def aplicar(df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
+        """
+        Aplica as regras de perfilamento (perfil_individual, perfila e pari_persi) de forma
+        vetorizada: máscaras por coluna, groupby().transform sobre colunas booleanas já
+        calculadas e normalizações de texto feitas uma vez por valor distinto.
+        """
+        # índice sequencial, como resultava do merge usado antes para os totais por banco
+        df = df.reset_index(drop=True)
 
         # -------- Conversões robustas --------
         for col in ['divida', 'parcela', 'garantias']:
             df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
 
         # -------- Mapeamento de produto financeiro padronizado --------
-        df['categoria_produto'] = df['prodfinanceiro'].astype(str).apply(map_financial_product)  # ✅ ADICIONADO
+        # (normalizado uma vez por produto distinto; a mesma coluna categórica serve à regra de habitação)
+        produtos = df['prodfinanceiro'].astype(str).astype('category')
+        df['categoria_produto'] = map_financial_products(produtos)  # ✅ ADICIONADO
         df['categoria_produto'] = df['categoria_produto'].fillna('')  # ✅ ADICIONADO
 
         # -------- Identificador do MAPA (precisa existir antes de perfila por grupo) --------
-        def build_map_id(row):
-            arquivo = row.get('arquivopdf')
-            if arquivo and str(arquivo).strip():
-                return str(arquivo)
-            parts = []
-            if row.get('mesmapa'): parts.append(str(row['mesmapa']))
-            if row.get('anomapa'): parts.append(str(row['anomapa']))
-            if parts:
-                return "|".join(parts)
-            return str(row.get('nif', ''))
-
-        df['map_id'] = df.apply(build_map_id, axis=1)
+        map_id = Senninha.build_map_id(df)
 
         # -------- REGRA INDIVIDUAL (por linha) --------
-        def regra_perfil_individual(row):
-            garantia_ok = row['garantias'] == 0.0
-            litigio_ok = isinstance(row['litigio'], str) and row['litigio'].replace('\xa0', '').strip().lower() in ('não', 'nao')
-            categoria = str(row.get('categoria_produto') or '').strip().lower()  # ✅ ADICIONADO
-            divida = row.get('divida') or 0.0
-
-            # habitação nunca perfila individualmente
-            if 'habitação' in categoria or 'habitacao' in categoria:
-                return False
-
-            # automóvel perfila se >=10k, sem garantia, sem litígio
-            if 'automóvel' in categoria or 'automovel' in categoria:
-                if not garantia_ok:
-                    return False
-                return litigio_ok and divida >= 10000
-
-            # demais produtos: sem garantia, sem litígio e valor > 0
-            return garantia_ok and litigio_ok and divida > 0
+        garantia_ok = df['garantias'] == 0.0
+        litigio_ok = Senninha._mapear_unicos(df['litigio'], Senninha._is_nao, False).astype(bool)
+        categoria = df['categoria_produto'].astype(str).str.strip().str.lower()
+        habitacao = categoria.str.contains('habitação', regex=False) | categoria.str.contains('habitacao', regex=False)
+        automovel = categoria.str.contains('automóvel', regex=False) | categoria.str.contains('automovel', regex=False)
 
-        df['perfil_individual'] = df.apply(regra_perfil_individual, axis=1)
+        # habitação nunca perfila individualmente; automóvel perfila se >=10k, sem garantia,
+        # sem litígio; demais produtos: sem garantia, sem litígio e valor > 0
+        limite_divida = (df['divida'] >= 10000).where(automovel, df['divida'] > 0)
+        df['perfil_individual'] = ~habitacao & garantia_ok & litigio_ok & limite_divida
 
         # -------- PERFILA (por NIF + MAPA + INSTITUIÇÃO), vectorizado --------
-        produto_norm = (
-            df['prodfinanceiro'].astype(str)
-              .str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
-              .str.lower()
-        )
-
-        grp_keys = ['nif', 'map_id', 'instituicao']
-
-        has_garantia_grp = df.groupby(grp_keys, dropna=False)['garantias'] \
-                             .transform(lambda s: (s > 0).any())
+        grp_keys = [df['nif'], map_id, df['instituicao']]
 
-        has_habitacao_grp = df.groupby(grp_keys, dropna=False)['prodfinanceiro'] \
-                              .transform(lambda s: (
-                                  s.astype(str)
-                                   .str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
-                                   .str.lower()
-                                   .str.contains('habitacao', na=False)
-                                   .any()
-                              ))
+        tem_garantia = df['garantias'] > 0
+        tem_habitacao = map_by_category(produtos, is_habitacao_product).astype(bool)
+        has_garantia_grp = tem_garantia.groupby(grp_keys, dropna=False).transform('any')
+        has_habitacao_grp = tem_habitacao.groupby(grp_keys, dropna=False).transform('any')
 
         df['perfila'] = df['perfil_individual'] & (~has_garantia_grp) & (~has_habitacao_grp)
 
         # -------- FAST-TRACK: crédito automóvel >= 10k, sem garantia, sem litígio --------
-        def is_nao(x):
-            return isinstance(x, str) and x.replace('\xa0','').strip().lower() in ('não', 'nao')
-
         mask_auto_ok = (
             df['categoria_produto'].str.contains('automovel', na=False) &  # ✅ MODIFICADO
             (df['divida'] >= 10000) &
-            (df['garantias'] == 0.0) &
-            (df['litigio'].apply(is_nao))
+            garantia_ok &
+            litigio_ok
         )
         df.loc[mask_auto_ok, 'perfila'] = True
 
         # -------- PARI/PERSI UNIFICADO (pari_persi) --------
-        df['bank_canon'] = df['instituicao'].astype(str).apply(lambda s: Senninha.normalize_bank_name(s))
-        df['divida_pos'] = df['divida'].where(df['divida'] > 0.0, 0.0)
-        totals = (
-            df.groupby(['nif', 'map_id', 'bank_canon'], dropna=False)['divida_pos']
-              .sum()
-              .reset_index()
-              .rename(columns={'divida_pos': 'total_nif_mapa_banco'})
+        bank_canon = Senninha.bank_resolver().resolve(df['instituicao'].astype(str))
+        divida_pos = df['divida'].where(df['divida'] > 0.0, 0.0)
+        df['total_nif_mapa_banco'] = (
+            divida_pos.groupby([df['nif'], map_id, bank_canon], dropna=False).transform('sum').fillna(0.0)
         )
-        df = df.merge(totals, on=['nif', 'map_id', 'bank_canon'], how='left')
-        df['total_nif_mapa_banco'] = df['total_nif_mapa_banco'].fillna(0.0)
-
-        def banco_atinge_min(row):
-            bank_key = row['bank_canon']
-            if not bank_key:
-                return False
-            minimo = Senninha.BANK_MINIMA.get(bank_key)
-            if minimo is None:
-                return False
-            return row['total_nif_mapa_banco'] >= minimo
-
-        df['bank_ok'] = df.apply(banco_atinge_min, axis=1)
-        df['pari_persi'] = (df['perfil_individual'] == True) & (df['divida'] > 0) & (df['bank_ok'] == True)
-
-        df = df.drop(columns=[c for c in ['bank_canon', 'map_id', 'divida_pos', 'bank_ok'] if c in df.columns],
-                     errors='ignore')
-
-        df['perfil_individual'] = df['perfil_individual'].fillna(False)
-        df['perfila'] = df['perfila'].fillna(False)
-        df['divida'] = pd.to_numeric(df['divida'], errors='coerce').fillna(0.0)
 
-        return df
+        minimo = bank_canon.map(Senninha.BANK_MINIMA).astype(float)
+        bank_ok = minimo.notna() & (df['total_nif_mapa_banco'] >= minimo)
+        df['pari_persi'] = df['perfil_individual'] & (df['divida'] > 0) & bank_ok
 
-    @staticmethod
-    def exportar_json_com_resumo(df: pd.DataFrame):
-        if df.empty:
-            print("⚠️ Nenhum dado para exportar com resumo.")
-            return
-
-        df = df.copy()
-        df = df.where(pd.notnull(df), None)
-
-        base_path = os.path.join(Config.MAPS_DIR, "customers")
-        os.makedirs(base_path, exist_ok=True)
-
-        for nif, grupo in df.groupby("nif"):
-            if not nif:
-                continue
-
-            dividas_elegiveis = grupo[grupo['perfila'] == True]
-            total_elegivel = float(dividas_elegiveis['divida'].sum())
-            perfila = total_elegivel >= 6000
-            pari_persi_resumo = bool(pd.Series(grupo.get('pari_persi', False)).fillna(False).any())
-
-            estrutura = {
-                "resumo": {
-                    "nif": nif,
-                    "divida_total_elegivel": round(total_elegivel, 2),
-                    "perfila": perfila,
-                    "pari_persi": pari_persi_resumo
-                },
-                "dividas": grupo.to_dict(orient="records")
-            }
+        df['divida'] = pd.to_numeric(df['divida'], errors='coerce').fillna(0.0)
 
-            try:
-                with open(os.path.join(base_path, f"{nif}.json"), "w", encoding="utf-8") as f:
-                    json.dump(estrutura, f, ensure_ascii=False, indent=2)
-                print(f"✅ JSON com resumo exportado para NIF {nif}")
-            except Exception as e:
-                print(f"❌ Erro ao salvar JSON para {nif}: {e}")
\ No newline at end of file
+        return df
@@ -0,0 +1,127 @@
+import os
+import logging
+import json
+import hashlib
+import threading
+from config import Config
+from utils.arquivos import criar_temporario
+
+logger = logging.getLogger(__name__)
+
+class TextCache:
+    """
+    Cache em disco do texto extraído por PDF ({texto_paginaN: texto}), endereçado pelo
+    SHA-256 dos bytes do PDF original. O tamanho total é limitado e, quando ultrapassado,
+    as entradas usadas há mais tempo (mtime, renovado a cada acerto) são removidas.
+    Com max_mb <= 0 o cache fica desativado. Uma instância pode ser partilhada entre threads
+    (API): a contagem de bytes e a remoção das entradas antigas ficam sob um lock.
+    """
+
+    def __init__(self, folder=Config.TEXT_CACHE_FOLDER, max_mb=Config.TEXT_CACHE_MAX_MB):
+        self.folder = folder
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._total_bytes = None
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(self.folder, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def hash_bytes(conteudo):
+        return hashlib.sha256(conteudo).hexdigest()
+
+    @staticmethod
+    def hash_file(path, chunk_size=1024 * 1024):
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def _path(self, chave):
+        return os.path.join(self.folder, chave[:2], f"{chave}.json")
+
+    def get(self, chave):
+        """Retorna o dict de páginas em cache, ou None."""
+        if not self.enabled or not chave:
+            return None
+        path = self._path(chave)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                paginas = json.load(f)
+            os.utime(path)  # LRU: marca como usado agora
+            return paginas
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Entrada de cache inválida '{chave}': {e}")
+            return None
+
+    def put(self, chave, paginas):
+        """Grava (de forma atômica) o dict de páginas e aplica o limite de tamanho."""
+        if not self.enabled or not chave or not paginas:
+            return
+        path = self._path(chave)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = criar_temporario(os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(paginas, f, ensure_ascii=False)
+            tamanho = os.path.getsize(tmp_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível gravar o cache '{chave}': {e}")
+            return
+
+        with self._lock:
+            try:
+                # a mesma chave gravada de novo substitui a entrada: só conta a diferença
+                try:
+                    anterior = os.path.getsize(path)
+                except FileNotFoundError:
+                    anterior = 0
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning(f"⚠️ Não foi possível gravar o cache '{chave}': {e}")
+                return
+
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += tamanho - anterior
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        entradas = []
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entradas.append((st.st_mtime, st.st_size, path))
+        return entradas
+
+    def _scan_total(self):
+        return sum(tamanho for _, tamanho, _ in self._entries())
+
+    def _evict(self):
+        """Remove as entradas menos usadas até ficar em 90% do limite."""
+        entradas = sorted(self._entries())
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        alvo = int(self.max_bytes * 0.9)
+        for _, tamanho, path in entradas:
+            if total <= alvo:
+                break
+            try:
+                os.remove(path)
+                total -= tamanho
+            except FileNotFoundError:
+                total -= tamanho
+        self._total_bytes = total
@@ -0,0 +1,58 @@
+"""
+Gravação dos arquivos de saída: conversão de tipos NumPy para JSON e escrita atômica
+(arquivo temporário na mesma pasta + os.replace) com as permissões de um open() normal.
+"""
+import os
+import tempfile
+import functools
+
+# 🔄 Conversor robusto para JSON (resolve problemas com tipos NumPy)
+def converter_json(obj):
+    # só chamado para tipos que o json não conhece: o numpy não entra no import de quem só grava arquivos
+    import numpy as np
+    if isinstance(obj, (np.bool_, bool)):
+        return bool(obj)
+    if isinstance(obj, (np.integer, int)):
+        return int(obj)
+    if isinstance(obj, (np.floating, float)):
+        return float(obj)
+    if isinstance(obj, (np.ndarray,)):
+        return obj.tolist()
+    return str(obj)
+
+@functools.lru_cache(maxsize=None)
+def _umask():
+    # lida sem alterar a umask do processo (os.umask troca o valor para todas as threads)
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for linha in f:
+                if linha.startswith("Umask:"):
+                    return int(linha.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    atual = os.umask(0o022)
+    os.umask(atual)
+    return atual
+
+def criar_temporario(pasta, **kwargs):
+    """
+    tempfile.mkstemp em pasta, mas com o modo 0666 menos a umask em vez de 0600: o os.replace
+    mantém o modo do temporário, e os outros consumidores do volume (n8n, outros usuários ou
+    containers) precisam de ler as saídas. Retorna (fd, caminho) como o mkstemp.
+    """
+    fd, caminho = tempfile.mkstemp(dir=pasta, **kwargs)
+    if hasattr(os, "fchmod"):
+        os.fchmod(fd, 0o666 & ~_umask())
+    return fd, caminho
+
+def gravar_atomico(path, texto):
+    """Grava texto em path de forma atômica: quem lê vê o arquivo antigo ou o novo, nunca um parcial."""
+    fd, tmp_path = criar_temporario(os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
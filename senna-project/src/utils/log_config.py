@@ -0,0 +1,124 @@
+"""
+Logging do projeto. Os módulos usam logging.getLogger(__name__); configurar_logging() liga o
+logger raiz a um QueueHandler, e quem escreve é um QueueListener numa thread própria:
+o pipeline só enfileira o registro (a formatação e o I/O do stdout saem do caminho crítico).
+
+Saídas:
+  - stdout: a mensagem como antes (SENNA_LOG_FORMAT=texto) ou uma linha JSON por registro
+    (SENNA_LOG_FORMAT=json) com nível, logger e o contexto passado em extra= (arquivo,
+    pagina, etapa, nif, job_id...);
+  - logs/erros_processamento.txt: registros de ERROR para cima, com o arquivo aberto uma vez.
+
+SENNA_LOG_LEVEL=WARNING (ou main.py --quiet) é o modo silencioso de produção.
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from config import Config
+
+# atributos de qualquer LogRecord; os demais vieram de extra={...}
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_estado = {"handler": None, "listener": None, "pid": None}
+
+# bibliotecas que registram em INFO (ex.: "pikepdf C++ to Python logger bridge initialized")
+_BIBLIOTECAS = ("pikepdf", "PIL", "urllib3")
+
+class FormatoJSON(logging.Formatter):
+    """Uma linha JSON por registro: ts, nivel, logger, mensagem e o contexto de extra=."""
+
+    def format(self, record):
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensagem": record.getMessage(),
+        }
+        dados.update((chave, valor) for chave, valor in vars(record).items() if chave not in _ATRIBUTOS_PADRAO)
+        if record.exc_info:
+            dados["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+class _QueueHandlerLocal(QueueHandler):
+    # fila do próprio processo: o registro segue sem ser formatado (o listener formata)
+    def prepare(self, record):
+        return record
+
+class _ArquivoErros(logging.FileHandler):
+    """FileHandler que só cria a pasta e abre o arquivo no primeiro erro."""
+
+    def __init__(self, caminho):
+        super().__init__(caminho, encoding="utf-8", delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+def _nivel(nivel):
+    return logging.getLevelName(nivel.upper()) if isinstance(nivel, str) else nivel
+
+def _iniciar_listener(handlers):
+    fila = queue.SimpleQueue()
+    listener = QueueListener(fila, *handlers, respect_handler_level=True)
+    listener.start()
+    _estado["handler"].queue = fila
+    _estado["listener"] = listener
+    _estado["pid"] = os.getpid()
+
+def configurar_logging(nivel=Config.LOG_LEVEL, formato=Config.LOG_FORMAT, arquivo_erros=Config.LOG_ERROR_FILE):
+    """
+    Liga o logging do processo (idempotente: chamadas seguintes só mudam o nível).
+    Também serve de initializer dos pools de processos.
+    """
+    raiz = logging.getLogger()
+    raiz.setLevel(_nivel(nivel))
+    for nome in _BIBLIOTECAS:
+        logging.getLogger(nome).setLevel(max(logging.WARNING, raiz.level))
+    if _estado["handler"] is not None:
+        return
+
+    json_lines = str(formato).lower() == "json"
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(FormatoJSON() if json_lines else logging.Formatter("%(message)s"))
+    erros = _ArquivoErros(os.path.abspath(arquivo_erros))
+    erros.setLevel(logging.ERROR)
+    erros.setFormatter(FormatoJSON() if json_lines else logging.Formatter("[%(asctime)s] %(message)s"))
+
+    _estado["handler"] = _QueueHandlerLocal(queue.SimpleQueue())
+    raiz.addHandler(_estado["handler"])
+    _iniciar_listener([saida, erros])
+    atexit.register(encerrar_logging)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_reiniciar_no_filho)
+
+def _reiniciar_no_filho():
+    # a thread do listener não existe no processo filho (fork): fila e listener novos
+    if _estado["listener"] is None:
+        return
+    _iniciar_listener(_estado["listener"].handlers)
+    try:
+        # workers de multiprocessing saem com os._exit, sem atexit
+        from multiprocessing import util
+        util.Finalize(None, encerrar_logging, exitpriority=0)
+    except ImportError:
+        pass
+
+def esvaziar_logs():
+    """Espera que tudo o que está na fila seja escrito (antes de uma saída que tem de ser a última)."""
+    listener = _estado["listener"]
+    if listener is not None and _estado["pid"] == os.getpid():
+        listener.stop()
+        listener.start()
+
+def encerrar_logging():
+    listener = _estado["listener"]
+    if listener is not None and _estado["pid"] == os.getpid():
+        _estado["listener"] = None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
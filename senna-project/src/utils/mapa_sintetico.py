@@ -0,0 +1,264 @@
+"""
+Mapas de Responsabilidades (MDR) sintéticos: PDFs com texto no mesmo layout do Banco de
+Portugal, sem dados reais. Usados para aquecer a API antes de receber tráfego e como
+corpus dos benchmarks (tools/bench.py).
+
+Variantes: "cifrado" (só senha de dono, como os MDR reais), "aberto" (sem cifra) e
+"digitalizado" (cada página é uma imagem, sem camada de texto: exercita o fallback OCR).
+
+Uso:
+    python utils/mapa_sintetico.py PASTA QUANTIDADE [--variante cifrado] [--paginas 3]
+        [--instituicoes 6] [--produtos 3] [--seed 0]
+"""
+import io
+import os
+import zlib
+import random
+import argparse
+import pikepdf
+
+VARIANTES = ("cifrado", "aberto", "digitalizado")
+SENHA_DONO = "senna"
+
+INSTITUICOES = [
+    "BANCO SANTANDER TOTTA, S.A.",
+    "CAIXA GERAL DE DEPÓSITOS, S.A.",
+    "BANCO COMERCIAL PORTUGUÊS, S.A.",
+    "BANCO BPI, S.A.",
+    "COFIDIS",
+    "BNP PARIBAS PERSONAL FINANCE, S.A. - SUCURSAL EM PORTUGAL",
+    "WIZINK BANK, S.A.U. - SUCURSAL EM PORTUGAL",
+    "BANCO CREDIBOM, S.A.",
+    "UNICRE - INSTITUIÇÃO FINANCEIRA DE CRÉDITO, S.A.",
+    "BANKINTER CONSUMER FINANCE, E.F.C., S.A.",
+    "YOUNITED, S.A.",
+    "HEFESTO STC, S.A.",
+]
+
+PRODUTOS = [
+    "Crédito pessoal",
+    "Crédito à habitação",
+    "Cartão de crédito com período de free-float",
+    "Crédito automóvel (excluindo locações financeiras)",
+    "Crédito renovável - linha de crédito",
+    "Facilidades de descoberto",
+    "Outros créditos",
+    "Factoring",
+    "Cartão de crédito - cartão de débito diferido",
+    "Crédito conexo",
+]
+
+MESES = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+         "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+
+NOMES = ["MARIA JOÃO SILVA", "JOSÉ ANTÓNIO COSTA", "ANA LUÍSA PEREIRA", "RUI MIGUEL SANTOS", "INÊS FERREIRA"]
+
+# ----------------------------------------------------------------- PDF
+
+def _escapar(linha):
+    texto = linha.encode("cp1252", errors="replace")
+    return texto.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+def _adicionar_pagina(pdf, linhas):
+    operacoes = [b"BT /F1 7 Tf 8.5 TL 30 820 Td"]
+    operacoes += [b"(" + _escapar(linha) + b") Tj T*" for linha in linhas]
+    operacoes.append(b"ET")
+    fonte = pikepdf.Dictionary(
+        Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1,
+        BaseFont=pikepdf.Name.Helvetica, Encoding=pikepdf.Name.WinAnsiEncoding,
+    )
+    pagina = pikepdf.Dictionary(
+        Type=pikepdf.Name.Page, MediaBox=[0, 0, 595, 842],
+        Resources=pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=fonte)),
+        Contents=pdf.make_stream(b"\n".join(operacoes)),
+    )
+    pdf.pages.append(pikepdf.Page(pagina))
+
+def _fonte_digitalizacao(tamanho):
+    """DejaVu Sans (tem os acentos) se estiver instalada; senão a fonte embutida do Pillow."""
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", tamanho)
+    except OSError:
+        pass
+    try:
+        return ImageFont.load_default(size=tamanho)
+    except TypeError:  # Pillow < 10.1: só a fonte bitmap, sem tamanho
+        return ImageFont.load_default()
+
+def _adicionar_pagina_imagem(pdf, linhas, dpi=150):
+    """Página A4 com o texto rasterizado (tons de cinza), como um MDR digitalizado."""
+    from PIL import Image, ImageDraw
+
+    largura, altura = int(595 / 72 * dpi), int(842 / 72 * dpi)
+    imagem = Image.new("L", (largura, altura), 255)
+    desenho = ImageDraw.Draw(imagem)
+    tamanho = max(8, int(7 / 72 * dpi * 1.3))
+    fonte = _fonte_digitalizacao(tamanho)
+    y = int(22 / 72 * dpi)
+    for linha in linhas:
+        desenho.text((int(30 / 72 * dpi), y), linha, fill=0, font=fonte)
+        y += int(tamanho * 1.2)
+
+    xobjeto = pikepdf.Stream(pdf, zlib.compress(imagem.tobytes()))
+    xobjeto.Type = pikepdf.Name.XObject
+    xobjeto.Subtype = pikepdf.Name.Image
+    xobjeto.Width, xobjeto.Height = largura, altura
+    xobjeto.ColorSpace = pikepdf.Name.DeviceGray
+    xobjeto.BitsPerComponent = 8
+    xobjeto.Filter = pikepdf.Name.FlateDecode
+    pagina = pikepdf.Dictionary(
+        Type=pikepdf.Name.Page, MediaBox=[0, 0, 595, 842],
+        Resources=pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=xobjeto)),
+        Contents=pdf.make_stream(b"q 595 0 0 842 0 0 cm /Im0 Do Q"),
+    )
+    pdf.pages.append(pikepdf.Page(pagina))
+
+def gerar_pdf(paginas, senha_dono=None, digitalizado=False):
+    """Bytes de um PDF com uma página por lista de linhas (cifrado se senha_dono)."""
+    pdf = pikepdf.new()
+    for linhas in paginas:
+        if digitalizado:
+            _adicionar_pagina_imagem(pdf, linhas)
+        else:
+            _adicionar_pagina(pdf, linhas)
+    saida = io.BytesIO()
+    if senha_dono:
+        pdf.save(saida, encryption=pikepdf.Encryption(owner=senha_dono, user="", R=4))
+    else:
+        pdf.save(saida)
+    return saida.getvalue()
+
+# ----------------------------------------------------------------- conteúdo
+
+def _valor(rng):
+    valor = rng.choice([0.0, rng.uniform(100, 50000), rng.uniform(1000, 15000)])
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def _linhas_produto(rng, linhas, produtos):
+    linhas.append("Montantes")
+    if rng.random() < 0.9:
+        linhas += ["Total em dívida", "do qual, em incumprimento", f"{_valor(rng)} € {_valor(rng)} €"]
+    else:
+        linhas += ["Total em dívida Vencido", f"{_valor(rng)} €"]
+    if rng.random() < 0.8:
+        linhas.append(f"Abatido ao ativo {_valor(rng)} €")
+    linhas.append("Em litígio judicial " + rng.choice(["Não", "Não", "Não", "Sim"]))
+    linhas += ["Produto financeiro " + rng.choice(produtos), "Tipo de responsabilidade Devedor"]
+    linhas.append(f"Nº devedores no contrato {rng.randint(1, 3)}")
+    linhas.append(f"Início 20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}")
+    linhas.append("Fim " + rng.choice(["-", f"20{rng.randint(25, 40)}-0{rng.randint(1, 9)}-2{rng.randint(0, 8)}"]))
+    linhas.append("Entrada incumpr. " + rng.choice(["-", "2023-05-01"]))
+    linhas += ["Garantias Tipo Valor", "Número", rng.choice(["-", "-", "1 Hipoteca 120.000,00 €"]), "Garantias"]
+
+def gerar_paginas(seed=0, paginas=3, instituicoes=6, produtos=3, catalogo_produtos=PRODUTOS):
+    """
+    Linhas de cada página de um MDR: até 'instituicoes' blocos por página, cada um com
+    1 a 'produtos' responsabilidades escolhidas em catalogo_produtos. Determinístico por seed.
+    """
+    rng = random.Random(seed)
+    nome = rng.choice(NOMES)
+    nif = str(rng.randint(100000000, 299999999))
+    referencia = f"{rng.choice(MESES)} de 20{rng.randint(23, 25)}"
+    resultado = []
+    for numero in range(paginas):
+        linhas = [
+            "Banco de Portugal",
+            "Central de Responsabilidades de Crédito",
+            f"Nome: {nome}",
+            f"Nº de Identificação: {nif}",
+            f"Responsabilidades de crédito referentes a {referencia}",
+            f"Página {numero + 1}",
+        ]
+        for _ in range(rng.randint(1, instituicoes)):
+            linhas.append("Informação comunicada pela instituição: " + rng.choice(INSTITUICOES))
+            for _ in range(rng.randint(1, produtos)):
+                _linhas_produto(rng, linhas, catalogo_produtos)
+        resultado.append(linhas)
+    return resultado
+
+def gerar_mapa(seed=0, paginas=3, instituicoes=6, produtos=3, variante="cifrado"):
+    """Bytes de um MDR sintético na variante pedida (ver VARIANTES)."""
+    if variante not in VARIANTES:
+        raise ValueError(f"Variante desconhecida: {variante} (use uma de {VARIANTES})")
+    conteudo = gerar_paginas(seed, paginas, instituicoes, produtos)
+    return gerar_pdf(
+        conteudo,
+        senha_dono=SENHA_DONO if variante == "cifrado" else None,
+        digitalizado=variante == "digitalizado",
+    )
+
+def gerar_corpus(pasta, quantidade, variante="cifrado", seed=0, **opcoes):
+    """Grava 'quantidade' MDR em pasta (mapa_<variante>_NNNN.pdf) e devolve os caminhos."""
+    os.makedirs(pasta, exist_ok=True)
+    caminhos = []
+    for i in range(quantidade):
+        caminho = os.path.join(pasta, f"mapa_{variante}_{i:04d}.pdf")
+        with open(caminho, "wb") as f:
+            f.write(gerar_mapa(seed + i, variante=variante, **opcoes))
+        caminhos.append(caminho)
+    return caminhos
+
+# ----------------------------------------------------------------- aquecimento
+
+def linhas_mapa_exemplo():
+    """Uma página de MDR com duas instituições (uma perfila, outra com garantia)."""
+    return [
+        "Banco de Portugal",
+        "Central de Responsabilidades de Crédito",
+        "Nome: CLIENTE SINTÉTICO",
+        "Nº de Identificação: 100000002",
+        "Responsabilidades de crédito referentes a Janeiro de 2025",
+        "Informação comunicada pela instituição: BANCO SANTANDER TOTTA, S.A.",
+        "Montantes",
+        "Total em dívida",
+        "do qual, em incumprimento",
+        "12.345,67 € 0,00 €",
+        "Abatido ao ativo 0,00 €",
+        "Em litígio judicial Não",
+        "Produto financeiro Crédito pessoal",
+        "Tipo de responsabilidade Devedor",
+        "Nº devedores no contrato 1",
+        "Início 2020-01-15",
+        "Fim 2030-01-15",
+        "Entrada incumpr. -",
+        "Garantias Tipo Valor",
+        "Número",
+        "-",
+        "Garantias",
+        "Informação comunicada pela instituição: CAIXA GERAL DE DEPÓSITOS, S.A.",
+        "Montantes",
+        "Total em dívida",
+        "do qual, em incumprimento",
+        "95.000,00 € 0,00 €",
+        "Em litígio judicial Não",
+        "Produto financeiro Crédito à habitação",
+        "Tipo de responsabilidade Devedor",
+        "Nº devedores no contrato 2",
+        "Início 2015-03-10",
+        "Fim 2045-03-10",
+        "Entrada incumpr. -",
+        "Garantias Tipo Valor",
+        "Número",
+        "1 Hipoteca 120.000,00 €",
+        "Garantias",
+    ]
+
+def pdf_mapa_exemplo():
+    """PDF cifrado (só senha de dono, como os MDR reais) com o mapa de exemplo."""
+    return gerar_pdf([linhas_mapa_exemplo()], senha_dono=SENHA_DONO)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera MDR sintéticos para testes e benchmarks.")
+    parser.add_argument("pasta")
+    parser.add_argument("quantidade", type=int)
+    parser.add_argument("--variante", choices=VARIANTES, default="cifrado")
+    parser.add_argument("--paginas", type=int, default=3)
+    parser.add_argument("--instituicoes", type=int, default=6, help="máximo de instituições por página")
+    parser.add_argument("--produtos", type=int, default=3, help="máximo de produtos por instituição")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    caminhos = gerar_corpus(args.pasta, args.quantidade, args.variante, args.seed,
+                            paginas=args.paginas, instituicoes=args.instituicoes, produtos=args.produtos)
+    print(f"✅ {len(caminhos)} MDR sintéticos ({args.variante}) gravados em: {args.pasta}")
@@ -1,7 +1,10 @@
 import unicodedata
 import re
 import logging
+from functools import lru_cache
 from typing import Union, Optional
+import numpy as np
+import pandas as pd
 
 #Formatar tipos créditos
 
@@ -114,6 +117,10 @@ def clean_text(text: str) -> str:
     
     return text.strip()
 
+SLUG_PONTUACAO_REGEX = re.compile(r'[^\w\s]')
+SLUG_ESPACOS_REGEX = re.compile(r'\s+')
+
+@lru_cache(maxsize=1024)
 def slugify_product_name(product_name):
     """
     Convierte un nombre de producto financiero a formato slug
@@ -125,12 +132,38 @@ def slugify_product_name(product_name):
     
     normalized = unicodedata.normalize('NFKD', product_name.lower())
     normalized = ''.join([c for c in normalized if not unicodedata.combining(c)])
-    slug = re.sub(r'[^\w\s]', '', normalized)
+    slug = SLUG_PONTUACAO_REGEX.sub('', normalized)
     # Reemplazar espacios con guiones bajos en lugar de eliminarlos
-    slug = re.sub(r'\s+', '', slug)
+    slug = SLUG_ESPACOS_REGEX.sub('', slug)
     
     return slug
 
+# Mapa de slugs de productos a categorías estandarizadas
+MAP_PRODUTOS = {
+    "creditorenovavellinhadecredito": "Empréstimo bancário",
+    "cartaodecreditosemperiododefreefloat": "Cartão de crédito",
+    "creditoautomovelexcluindolocacoesfinanceiras": "Empréstimo bancário",
+    "creditopessoal": "Empréstimo bancário",
+    "cartaodecreditocomperiododefreefloat": "Cartão de crédito",
+    "ultrapassagensdecredito": "Cartão de crédito",
+    "cartaodecredito": "Cartão de crédito",
+    "locacaofinanceiramobiliaria": "Empréstimo bancário",
+    "creditoconexo": "Empréstimo bancário",
+    "outroscreditos": "Empréstimo bancário",
+    "cartaodecreditocartaodedebitodiferido": "Cartão de crédito",
+    "creditonaorenovavel": "Empréstimo bancário",
+    "creditorenovavelcontacorrentebancaria": "Empréstimo bancário",
+    "facilidadesdedescoberto": "Empréstimo bancário",
+    "financiamentoaatividadeempresarial": "Empréstimo bancário",
+    "locacaofinanceiraimobiliaria": "Empréstimo bancário",
+    "outrosavalesegarantiasbancariasprestadas": "Empréstimo bancário",
+    "descontoeoutroscreditostituladosporefeitos": "Empréstimo bancário",
+    "factoring": "Empréstimo bancário",
+    "creditoahabitacao": "Empréstimo bancário",
+    "facilidadesdedescobertocomdomiciliacaodeordenadoe": "Empréstimo bancário",
+}
+
+@lru_cache(maxsize=1024)
 def map_financial_product(product_name):
     """
     Mapea un producto financiero a su categoría estandarizada
@@ -141,33 +174,31 @@ def map_financial_product(product_name):
     Returns:
         str: La categoría estandarizada
     """
-    # Mapa de slugs de productos a categorías estandarizadas
-    map_produtos = {
-        "creditorenovavellinhadecredito": "Empréstimo bancário",
-        "cartaodecreditosemperiododefreefloat": "Cartão de crédito",
-        "creditoautomovelexcluindolocacoesfinanceiras": "Empréstimo bancário",
-        "creditopessoal": "Empréstimo bancário",
-        "cartaodecreditocomperiododefreefloat": "Cartão de crédito",
-        "ultrapassagensdecredito": "Cartão de crédito",
-        "cartaodecredito": "Cartão de crédito",
-        "locacaofinanceiramobiliaria": "Empréstimo bancário",
-        "creditoconexo": "Empréstimo bancário",
-        "outroscreditos": "Empréstimo bancário",
-        "cartaodecreditocartaodedebitodiferido": "Cartão de crédito",
-        "creditonaorenovavel": "Empréstimo bancário",
-        "creditorenovavelcontacorrentebancaria": "Empréstimo bancário",
-        "facilidadesdedescoberto": "Empréstimo bancário",
-        "financiamentoaatividadeempresarial": "Empréstimo bancário",
-        "locacaofinanceiraimobiliaria": "Empréstimo bancário",
-        "outrosavalesegarantiasbancariasprestadas": "Empréstimo bancário",
-        "descontoeoutroscreditostituladosporefeitos": "Empréstimo bancário",
-        "factoring": "Empréstimo bancário",
-        "creditoahabitacao": "Empréstimo bancário",
-        "facilidadesdedescobertocomdomiciliacaodeordenadoe": "Empréstimo bancário",
-    }
-
     # Convertir el nombre del producto a slug
     slug = slugify_product_name(product_name)
 
     # Buscar en el mapa o devolver un valor predeterminado
-    return map_produtos.get(slug)
\ No newline at end of file
+    return MAP_PRODUTOS.get(slug)
+
+@lru_cache(maxsize=1024)
+def is_habitacao_product(product_name):
+    """
+    Indica si el producto es de habitación ('habitacao' en el nombre sin acentos, en minúsculas)
+    """
+    ascii_name = unicodedata.normalize('NFKD', product_name).encode('ascii', errors='ignore').decode('ascii')
+    return 'habitacao' in ascii_name.lower()
+
+def map_by_category(series: pd.Series, func) -> pd.Series:
+    """
+    Aplica func solo a las categorías distintas de la serie (convertida a categorical)
+    y devuelve el resultado por fila, con dtype object. Los nulos devuelven None.
+    """
+    categorical = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    results = np.array([func(c) for c in categorical.cat.categories] + [None], dtype=object)
+    return pd.Series(results[categorical.cat.codes.to_numpy()], index=series.index, dtype=object)
+
+def map_financial_products(series: pd.Series) -> pd.Series:
+    """
+    Versión por columna de map_financial_product: slugify y mapeo una vez por producto distinto
+    """
+    return map_by_category(series, map_financial_product)
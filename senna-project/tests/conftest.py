@@ -0,0 +1,14 @@
+"""
+Configuração comum dos testes: o código é importado como no main.py (src no sys.path) e as
+pastas de dados do Config apontam para um diretório temporário, nunca para maps/.
+"""
+import os
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# o Config lê as variáveis no import: têm de estar definidas antes de qualquer "from config import Config"
+os.environ.setdefault("SENNA_MAPS_DIR", tempfile.mkdtemp(prefix="senna-testes-"))
+os.environ.setdefault("SENNA_LOG_ERROR_FILE", os.path.join(os.environ["SENNA_MAPS_DIR"], "erros.txt"))
+sys.path.insert(0, SRC)
@@ -0,0 +1,4 @@
+"""
+Implementações anteriores às versões otimizadas (parser de MDR, Senninha e mapeamento de
+produtos), mantidas só como referência: os testes comparam as saídas atuais com as delas.
+"""
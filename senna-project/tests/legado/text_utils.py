@@ -0,0 +1,64 @@
+"""
+Mapeamento de produtos anterior ao cache por categoria (utils/text_utils.py): slug e
+dicionário recalculados a cada chamada, copiados sem alterações de lógica.
+"""
+import unicodedata
+import re
+
+def slugify_product_name(product_name):
+    """
+    Convierte un nombre de producto financiero a formato slug
+    con guiones bajos entre palabras
+    """
+    
+    if product_name is None or product_name == "":
+        return ""
+    
+    normalized = unicodedata.normalize('NFKD', product_name.lower())
+    normalized = ''.join([c for c in normalized if not unicodedata.combining(c)])
+    slug = re.sub(r'[^\w\s]', '', normalized)
+    # Reemplazar espacios con guiones bajos en lugar de eliminarlos
+    slug = re.sub(r'\s+', '', slug)
+    
+    return slug
+
+def map_financial_product(product_name):
+    """
+    Mapea un producto financiero a su categoría estandarizada
+
+    Args:
+        product_name (str): El nombre del producto financiero
+
+    Returns:
+        str: La categoría estandarizada
+    """
+    # Mapa de slugs de productos a categorías estandarizadas
+    map_produtos = {
+        "creditorenovavellinhadecredito": "Empréstimo bancário",
+        "cartaodecreditosemperiododefreefloat": "Cartão de crédito",
+        "creditoautomovelexcluindolocacoesfinanceiras": "Empréstimo bancário",
+        "creditopessoal": "Empréstimo bancário",
+        "cartaodecreditocomperiododefreefloat": "Cartão de crédito",
+        "ultrapassagensdecredito": "Cartão de crédito",
+        "cartaodecredito": "Cartão de crédito",
+        "locacaofinanceiramobiliaria": "Empréstimo bancário",
+        "creditoconexo": "Empréstimo bancário",
+        "outroscreditos": "Empréstimo bancário",
+        "cartaodecreditocartaodedebitodiferido": "Cartão de crédito",
+        "creditonaorenovavel": "Empréstimo bancário",
+        "creditorenovavelcontacorrentebancaria": "Empréstimo bancário",
+        "facilidadesdedescoberto": "Empréstimo bancário",
+        "financiamentoaatividadeempresarial": "Empréstimo bancário",
+        "locacaofinanceiraimobiliaria": "Empréstimo bancário",
+        "outrosavalesegarantiasbancariasprestadas": "Empréstimo bancário",
+        "descontoeoutroscreditostituladosporefeitos": "Empréstimo bancário",
+        "factoring": "Empréstimo bancário",
+        "creditoahabitacao": "Empréstimo bancário",
+        "facilidadesdedescobertocomdomiciliacaodeordenadoe": "Empréstimo bancário",
+    }
+
+    # Convertir el nombre del producto a slug
+    slug = slugify_product_name(product_name)
+
+    # Buscar en el mapa o devolver un valor predeterminado
+    return map_produtos.get(slug)
\ No newline at end of file
@@ -0,0 +1,65 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from config import Config
+import api.app as api
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    # o pipeline não interessa aqui: cada mapa "processado" devolve o tamanho lido
+    monkeypatch.setattr(api, "processar_mapa", lambda conteudo: {"valid_map": True, "bytes": len(conteudo)})
+    return api.app.test_client()
+
+
+def _zip(membros):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as pacote:
+        for nome, conteudo in membros.items():
+            pacote.writestr(nome, conteudo)
+    buffer.seek(0)
+    return buffer
+
+
+def _lote(cliente, *arquivos):
+    return cliente.post("/perfilamento/lote", data={"mdr": list(arquivos)}, content_type="multipart/form-data")
+
+
+def test_lote_abre_zip_e_ignora_o_que_nao_e_pdf(cliente, monkeypatch):
+    pacote = _zip({"a.pdf": b"%PDF-a", "sub/b.PDF": b"%PDF-bb", "leia-me.txt": b"x" * 10})
+    lidos = []
+    abrir = zipfile.ZipFile.open
+    monkeypatch.setattr(zipfile.ZipFile, "open",
+                        lambda self, nome, *a, **k: lidos.append(getattr(nome, "filename", nome)) or abrir(self, nome, *a, **k))
+
+    resposta = _lote(cliente, (pacote, "parceiro.zip"), (io.BytesIO(b"%PDF-solto"), "solto.pdf"))
+
+    assert resposta.status_code == 200
+    linhas = {linha["arquivo"]: linha["bytes"] for linha in map(json.loads, resposta.get_data(as_text=True).splitlines())}
+    assert linhas == {"parceiro.zip/a.pdf": 6, "parceiro.zip/sub/b.PDF": 7, "solto.pdf": 10}
+    assert "leia-me.txt" not in lidos
+
+
+@pytest.mark.parametrize("limite, valor, membros", [
+    ("BATCH_ZIP_MAX_MEMBERS", 2, {f"{i}.pdf": b"%PDF" for i in range(3)}),
+    ("BATCH_ZIP_MAX_MEMBER_MB", 1, {"bomba.pdf": b"\0" * (2 * 1024 * 1024)}),
+    ("BATCH_ZIP_MAX_TOTAL_MB", 1, {"a.pdf": b"\0" * (600 * 1024), "b.pdf": b"\0" * (600 * 1024)}),
+])
+def test_lote_recusa_zip_acima_dos_limites(cliente, monkeypatch, limite, valor, membros):
+    monkeypatch.setattr(Config, limite, valor)
+    pacote = _zip(membros)
+    monkeypatch.setattr(zipfile.ZipFile, "open", lambda self, *a, **k: pytest.fail("membro descompactado"))
+
+    resposta = _lote(cliente, (pacote, "bomba.zip"))
+
+    assert resposta.status_code == 400
+    assert "zip" in resposta.get_json()["error"]
+
+
+def test_pedido_acima_do_limite_de_upload(cliente, monkeypatch):
+    monkeypatch.setitem(api.app.config, "MAX_CONTENT_LENGTH", 1024)
+    resposta = _lote(cliente, (io.BytesIO(b"%PDF" + b"\0" * 4096), "grande.pdf"))
+    assert resposta.status_code == 413
@@ -0,0 +1,38 @@
+import os
+import json
+import stat
+import numpy as np
+import pytest
+from utils.arquivos import converter_json, criar_temporario, gravar_atomico
+
+@pytest.fixture
+def umask_022():
+    anterior = os.umask(0o022)
+    yield
+    os.umask(anterior)
+
+def _modo(caminho):
+    return stat.S_IMODE(os.stat(caminho).st_mode)
+
+def test_gravar_atomico_respeita_a_umask(tmp_path, umask_022):
+    caminho = tmp_path / "cliente.json"
+    gravar_atomico(str(caminho), "{}")
+    assert caminho.read_text(encoding="utf-8") == "{}"
+    # como um open() normal, não o 0600 do mkstemp
+    assert _modo(caminho) == 0o644
+
+def test_gravar_atomico_substitui_sem_deixar_temporarios(tmp_path, umask_022):
+    caminho = tmp_path / "cliente.json"
+    gravar_atomico(str(caminho), "antigo")
+    gravar_atomico(str(caminho), "novo")
+    assert caminho.read_text(encoding="utf-8") == "novo"
+    assert os.listdir(tmp_path) == ["cliente.json"]
+
+def test_criar_temporario_tem_modo_de_arquivo_normal(tmp_path, umask_022):
+    fd, caminho = criar_temporario(str(tmp_path), suffix=".tmp")
+    os.close(fd)
+    assert _modo(caminho) == 0o644
+
+def test_converter_json_aceita_tipos_numpy():
+    dados = {"n": np.int64(3), "x": np.float32(1.5), "ok": np.bool_(True), "v": np.array([1, 2])}
+    assert json.loads(json.dumps(dados, default=converter_json)) == {"n": 3, "x": 1.5, "ok": True, "v": [1, 2]}
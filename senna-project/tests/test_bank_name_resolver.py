@@ -0,0 +1,98 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from services import pdf_data_extractor
+from services.bank_name_resolver import BankNameResolver
+from services.senninha import Senninha
+from legado.senninha import Senninha as SenninhaLegado
+
+TOKENS = [
+    "banco", "santander", "totta", "sa", "bnp", "paribas", "bcp", "millennium", "credibom", "consumer", "finance",
+    "consumerfinance", "bankinter", "cofidis", "caixa", "geral", "de", "depósitos", "bpi", "S.A.", ",", "-", "(", ")",
+    "Sucursal em Portugal", "unicre", "wizink", "younited", "hefesto", "x\ny", "Á", "\xa0", "xbnp", "bnpx",
+]
+
+BANCOS_PADRAO = pd.DataFrame({
+    "chave": ["Santander Consumer", "Santander", "BNP Paribas", "Caixa Geral de Depósitos", "Banco BPI, S.A."],
+    "name": ["Santander Consumer Finance", "Banco Santander", "BNP Paribas", "CGD", "BPI"],
+})
+
+
+def _nomes(seed, quantidade):
+    rng = random.Random(seed)
+    nomes = []
+    for _ in range(quantidade):
+        nome = rng.choice([" ", "", "-", "."]).join(rng.choice(TOKENS) for _ in range(rng.randint(0, 5)))
+        if rng.random() < .5:
+            nome = nome.upper() if rng.random() < .5 else nome.title()
+        nomes.append(nome)
+    return nomes
+
+
+def _banco_padrao_legado(nome):
+    # laço de normalizar_nome_banco antes do resolvedor: primeira chave contida no nome limpo
+    nome_limpo = pdf_data_extractor.limpar_nome(nome)
+    for _, row in BANCOS_PADRAO.iterrows():
+        if pdf_data_extractor.limpar_nome(row["chave"]) in nome_limpo:
+            return row["name"]
+    return nome
+
+
+def test_senninha_resolve_como_o_laco_de_regex():
+    nomes = _nomes(0, 3000) + [None, "", "BNP", "Santander BNP", "Consumer   Finance", "Millennium-BCP"]
+    for nome in nomes:
+        assert Senninha.normalize_bank_name(nome) == SenninhaLegado.normalize_bank_name(nome), repr(nome)
+
+    serie = pd.Series(nomes[:500] * 2, index=range(7, 1007))
+    resolvidos = Senninha.bank_resolver().resolve(serie.astype(str))
+    assert resolvidos.index.equals(serie.index)
+    assert resolvidos.tolist() == [SenninhaLegado.normalize_bank_name(nome) for nome in serie.astype(str)]
+
+
+def test_bancos_padrao_resolve_como_o_laco_sobre_o_csv(monkeypatch):
+    monkeypatch.setattr(pdf_data_extractor, "carregar_bancos_padrao", lambda: BANCOS_PADRAO)
+    monkeypatch.setattr(pdf_data_extractor, "_bancos_resolver", None)
+
+    nomes = _nomes(1, 2000) + ["Banco Santander Consumer, Sucursal em Portugal", "CAIXA GERAL DE DEPÓSITOS, S.A."]
+    for nome in nomes:
+        assert pdf_data_extractor.normalizar_nome_banco(nome) == _banco_padrao_legado(nome), repr(nome)
+
+    serie = pd.Series(nomes[:300] + [None, np.nan], index=range(10, 312))
+    resolvidos = pdf_data_extractor.bancos_resolver().resolve(serie)
+    assert resolvidos.index.equals(serie.index)
+    assert resolvidos.iloc[:300].tolist() == [_banco_padrao_legado(nome) for nome in nomes[:300]]
+    assert resolvidos.iloc[300] is None  # nulo sem correspondência devolve o próprio nome (o primeiro nulo)
+
+
+def test_primeira_regra_pela_ordem_vence():
+    resolvedor = BankNameResolver([("a", ["x"]), ("b", ["y", "x"]), ("c", [r"\bz\b"])])
+
+    assert resolvedor.resolve_one("y x") == "a"
+    assert resolvedor.resolve_one("y") == "b"
+    assert resolvedor.resolve_one("zz") is None
+    assert resolvedor.resolve_one("a z") == "c"
+
+
+def test_cache_por_nome_distinto_e_fallback():
+    chamadas = []
+    resolvedor = BankNameResolver(
+        [("santander", ["santander"])],
+        normalizar=lambda nome: chamadas.append(nome) or str(nome).lower(),
+        fallback=lambda nome: f"?{nome}",
+        cache_size=8,
+    )
+
+    serie = pd.Series(["Santander", "CGD", "Santander", "CGD", "santander"] * 100)
+    assert resolvedor.resolve(serie).tolist() == ["santander", "?CGD", "santander", "?CGD", "santander"] * 100
+    assert sorted(chamadas) == ["CGD", "Santander", "santander"]
+
+    resolvedor.resolve_one("CGD")
+    assert resolvedor.cache_info().misses == 3 and resolvedor.cache_info().hits == 1
+    assert resolvedor.resolve_one(["lista"]) == "?['lista']"  # não hashable: resolvido sem cache
+
+
+def test_sem_regras_usa_so_o_fallback():
+    assert BankNameResolver([], fallback=str.upper).resolve(pd.Series(["bpi"])).tolist() == ["BPI"]
+    assert BankNameResolver([]).resolve(pd.Series([], dtype=object)).empty
@@ -0,0 +1,105 @@
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+from services.folder_watcher import FolderWatcher
+
+
+@pytest.fixture(params=[True, False], ids=["inotify", "polling"])
+def observar(request, tmp_path):
+    """Inicia lotes() numa thread; devolve uma fila de (instante, [nomes]) por lote entregue."""
+    observadores = []
+
+    def iniciar(**kwargs):
+        opcoes = dict(debounce_seconds=0.3, batch_size=20, batch_window_seconds=0.1, poll_seconds=0.05,
+                      rescan_seconds=60, usar_inotify=request.param)
+        opcoes.update(kwargs)
+        watcher = FolderWatcher(folder=str(tmp_path), **opcoes)
+        assert watcher.modo == ("inotify" if request.param else "polling")
+        entregues = queue.Queue()
+
+        def consumir():
+            for lote in watcher.lotes():
+                entregues.put((time.monotonic(), [os.path.basename(caminho) for caminho in lote]))
+
+        thread = threading.Thread(target=consumir, daemon=True)
+        thread.start()
+        observadores.append((watcher, thread))
+        return watcher, entregues
+
+    yield iniciar
+    for watcher, thread in observadores:
+        watcher.stop()
+        thread.join(timeout=5)
+        watcher.close()
+
+
+def _gravar(pasta, nome, conteudo=b"%PDF-1.4 conteudo"):
+    with open(os.path.join(pasta, nome), "wb") as f:
+        f.write(conteudo)
+
+
+def _lotes(entregues, esperar=1.0):
+    lotes, limite = [], time.monotonic() + esperar
+    while time.monotonic() < limite:
+        try:
+            lotes.append(entregues.get(timeout=max(0.01, limite - time.monotonic()))[1])
+        except queue.Empty:
+            break
+    return lotes
+
+
+def test_arquivo_em_gravacao_so_e_entregue_depois_de_estavel(observar, tmp_path):
+    watcher, entregues = observar()
+
+    with open(tmp_path / "lento.pdf", "wb") as f:
+        for _ in range(8):
+            f.write(b"x" * 1024)
+            f.flush()
+            time.sleep(0.1)
+            assert entregues.empty()  # ainda a ser copiado
+    fim_da_copia = time.monotonic()
+
+    instante, lote = entregues.get(timeout=5)
+    assert lote == ["lento.pdf"]
+    assert instante - fim_da_copia >= 0.3 - 0.06
+    assert os.path.getsize(tmp_path / "lento.pdf") == 8 * 1024
+    assert _lotes(entregues, 0.8) == []  # não volta a ser entregue sem mudar
+
+
+def test_micro_lotes_por_tamanho_e_janela(observar, tmp_path):
+    watcher, entregues = observar(batch_size=3, batch_window_seconds=0.5)
+    for i in range(5):
+        _gravar(tmp_path, f"{i}.pdf")
+
+    primeiro = entregues.get(timeout=5)
+    segundo = entregues.get(timeout=5)
+
+    assert len(primeiro[1]) == 3 and len(segundo[1]) == 2
+    assert sorted(primeiro[1] + segundo[1]) == [f"{i}.pdf" for i in range(5)]
+    # o lote cheio sai logo; o resto espera a janela
+    assert segundo[0] - primeiro[0] >= 0.5 - 0.06
+
+
+def test_ignora_vazios_e_nao_pdf_e_reentrega_quando_muda(observar, tmp_path):
+    _gravar(tmp_path, "ja_estava.PDF")
+    _gravar(tmp_path, "notas.txt")
+    _gravar(tmp_path, "vazio.pdf", b"")
+    watcher, entregues = observar()
+
+    assert entregues.get(timeout=5)[1] == ["ja_estava.PDF"]
+    assert _lotes(entregues, 0.8) == []
+
+    _gravar(tmp_path, "ja_estava.PDF", b"%PDF-1.4 outra versao")
+    assert entregues.get(timeout=5)[1] == ["ja_estava.PDF"]
+
+
+def test_stop_encerra_os_lotes(tmp_path):
+    watcher = FolderWatcher(folder=str(tmp_path), poll_seconds=0.05, usar_inotify=False)
+    threading.Timer(0.2, watcher.stop).start()
+    inicio = time.monotonic()
+    assert list(watcher.lotes()) == []
+    assert time.monotonic() - inicio < 2
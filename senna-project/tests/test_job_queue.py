@@ -0,0 +1,210 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from services.job_queue import JobQueue, validar_callback_url
+
+
+def _esperar(job_queue, job_id, timeout=10):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        job = job_queue.get(job_id)
+        if job["status"] in (JobQueue.STATUS_DONE, JobQueue.STATUS_FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} não terminou em {timeout}s")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs" / "jobs.sqlite")
+
+
+def test_job_concluido_e_falhado(db_path):
+    def processar(conteudo):
+        if conteudo == b"ruim":
+            raise RuntimeError("PDF ilegível")
+        return json.dumps({"tamanho": len(conteudo)})
+
+    fila = JobQueue(processar, db_path=db_path, workers=1)
+    ok = _esperar(fila, fila.submit(b"%PDF-1.4"))
+    falhou = _esperar(fila, fila.submit(b"ruim"))
+
+    assert ok["status"] == JobQueue.STATUS_DONE
+    assert ok["result"] == {"tamanho": 8}
+    assert falhou["status"] == JobQueue.STATUS_FAILED
+    assert falhou["error"] == "PDF ilegível"
+    stats = fila.stats()
+    assert (stats["done"], stats["failed"], stats["queued"], stats["running"]) == (1, 1, 0, 0)
+
+
+@pytest.mark.parametrize("url", [
+    "file:///etc/passwd",
+    "ftp://exemplo.pt/x",
+    "gopher://exemplo.pt/",
+    "http://127.0.0.1:5001/jobs",
+    "http://localhost/webhook",
+    "http://10.0.0.5/webhook",
+    "http://192.168.1.10/webhook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/webhook",
+    "http:///sem-host",
+])
+def test_callback_url_recusado_sem_lista(url):
+    with pytest.raises(ValueError):
+        validar_callback_url(url)
+
+
+def test_callback_url_publico_aceito_sem_lista():
+    validar_callback_url("https://8.8.8.8/webhook")
+
+
+def test_callback_url_com_lista_de_hosts():
+    hosts = ["n8n", ".exemplo.pt"]
+    validar_callback_url("http://n8n:5678/webhook/mdr-done", hosts)
+    validar_callback_url("https://hooks.exemplo.pt/mdr", hosts)
+    for url in ("http://8.8.8.8/webhook", "http://exemplo.pt.atacante.com/", "file://n8n/etc/passwd"):
+        with pytest.raises(ValueError):
+            validar_callback_url(url, hosts)
+
+
+def test_submit_recusa_callback_invalido(db_path):
+    fila = JobQueue(lambda c: "{}", db_path=db_path, workers=1)
+    with pytest.raises(ValueError):
+        fila.submit(b"%PDF", callback_url="file:///etc/passwd")
+    assert fila.stats()["queued"] == 0
+
+
+def test_heartbeat_impede_reivindicar_job_longo(db_path):
+    liberar = threading.Event()
+    execucoes = []
+
+    def processar(conteudo):
+        execucoes.append(conteudo)
+        liberar.wait(10)
+        return "{}"
+
+    fila = JobQueue(processar, db_path=db_path, workers=1, stale_seconds=0.3, heartbeat_seconds=0.05)
+    job_id = fila.submit(b"%PDF")
+    time.sleep(1.0)  # mais de três vezes o stale_seconds com o job ainda em curso
+
+    outro_processo = JobQueue(processar, db_path=db_path, workers=1, stale_seconds=0.3)
+    assert outro_processo._claim() is None
+    liberar.set()
+    assert _esperar(fila, job_id)["status"] == JobQueue.STATUS_DONE
+    assert execucoes == [b"%PDF"]
+
+
+def test_job_de_worker_morto_e_reivindicado_uma_vez(db_path):
+    fila = JobQueue(lambda c: "{}", db_path=db_path, stale_seconds=0.2)
+    with fila._connect() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, status, pdf, created_at) VALUES (?, ?, ?, ?)",
+            ("j1", JobQueue.STATUS_QUEUED, b"%PDF", time.time()),
+        )
+
+    morto = fila._claim()  # reivindicado e nunca mais renovado
+    assert fila._claim() is None
+    time.sleep(0.3)
+    novo = fila._claim()
+    assert novo["id"] == "j1" and novo["worker"] != morto["worker"]
+
+    # o worker antigo, se voltar, não sobrescreve o resultado nem dispara o callback
+    assert fila._finish("j1", morto["worker"], JobQueue.STATUS_DONE, result='{"dono": "antigo"}') is False
+    assert fila._finish("j1", novo["worker"], JobQueue.STATUS_DONE, result='{"dono": "novo"}') is True
+    assert fila.get("j1")["result"] == {"dono": "novo"}
+
+
+def test_callback_entregue_uma_vez_sem_seguir_redirect(db_path):
+    recebidos = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            corpo = self.rfile.read(int(self.headers["Content-Length"]))
+            recebidos.append((self.path, json.loads(corpo)))
+            if self.path == "/redirect":
+                self.send_response(303)
+                self.send_header("Location", "/seguido")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            # só chega aqui se o 303 do /redirect for seguido
+            recebidos.append((self.path, {}))
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    servidor = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+    try:
+        fila = JobQueue(lambda c: '{"ok": true}', db_path=db_path, workers=1, callback_hosts=["127.0.0.1"])
+        primeiro = fila.submit(b"%PDF", callback_url=f"{base}/webhook")
+        segundo = fila.submit(b"%PDF", callback_url=f"{base}/redirect")
+        limite = time.time() + 10
+        while len(recebidos) < 2 and time.time() < limite:
+            time.sleep(0.02)
+        time.sleep(0.2)
+    finally:
+        servidor.shutdown()
+
+    assert sorted(path for path, _ in recebidos) == ["/redirect", "/webhook"]
+    jobs = {job["job_id"]: job for _, job in recebidos}
+    assert jobs[primeiro]["status"] == JobQueue.STATUS_DONE
+    assert jobs[primeiro]["result"] == {"ok": True}
+    assert segundo in jobs
+
+
+def test_stop_devolve_a_fila_o_job_que_nao_terminou(db_path):
+    liberar = threading.Event()
+    iniciado = threading.Event()
+
+    def processar_lento(conteudo):
+        iniciado.set()
+        liberar.wait(10)
+        return '{"dono": "reciclado"}'
+
+    fila = JobQueue(processar_lento, db_path=db_path, workers=1, stale_seconds=900)
+    job_id = fila.submit(b"%PDF")
+    assert iniciado.wait(5)
+
+    assert fila.stop(timeout=0.2) == 1
+    assert fila.get(job_id)["status"] == JobQueue.STATUS_QUEUED
+    fila.submit(b"%PDF-novo")
+    time.sleep(0.3)
+    assert fila.stats()["queued"] == 2  # parado: o pool deste processo não reivindica mais nada
+
+    # outro worker retoma já, sem esperar stale_seconds; o antigo, se acabar, não grava nada
+    outro_processo = JobQueue(lambda c: '{"dono": "novo"}', db_path=db_path, workers=1, stale_seconds=900)
+    outro_processo.start()
+    assert _esperar(outro_processo, job_id)["result"] == {"dono": "novo"}
+    liberar.set()
+    time.sleep(0.2)
+    assert outro_processo.get(job_id)["result"] == {"dono": "novo"}
+    outro_processo.stop()
+
+
+def test_stop_espera_o_job_em_curso(db_path):
+    iniciado = threading.Event()
+
+    def processar(conteudo):
+        iniciado.set()
+        time.sleep(0.3)
+        return "{}"
+
+    fila = JobQueue(processar, db_path=db_path, workers=1)
+    job_id = fila.submit(b"%PDF")
+    assert iniciado.wait(5)
+
+    assert fila.stop(timeout=5) == 0
+    assert fila.get(job_id)["status"] == JobQueue.STATUS_DONE
+    assert JobQueue(processar, db_path=db_path).stop() == 0  # pool nunca iniciado
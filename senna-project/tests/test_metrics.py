@@ -0,0 +1,58 @@
+import glob
+import os
+import time
+
+from services.metrics import Metrics, PAGINAS, HTTP_SEGUNDOS
+
+
+def _arquivos(pasta):
+    return glob.glob(os.path.join(pasta, "metricas_*.json"))
+
+
+def _esperar(condicao, timeout=5):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if condicao():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_persistencia_periodica_so_grava_quando_muda(tmp_path):
+    pasta = str(tmp_path)
+    worker = Metrics()
+    worker.persistir_periodicamente(pasta, 0.05)
+    worker.persistir_periodicamente(pasta, 0.05)  # segunda chamada no mesmo processo não cria outra thread
+
+    time.sleep(0.2)
+    assert _arquivos(pasta) == []  # nada observado, nada gravado
+
+    worker.incrementar(PAGINAS, origem="texto")
+    worker.observar(HTTP_SEGUNDOS, 0.02, rota="/perfilamento", metodo="POST", status=200)
+    assert _esperar(lambda: len(_arquivos(pasta)) == 1)
+    (arquivo,) = _arquivos(pasta)
+    gravado_em = os.stat(arquivo).st_mtime_ns
+
+    time.sleep(0.2)
+    assert os.stat(arquivo).st_mtime_ns == gravado_em  # sem mudanças, sem regravar
+
+    worker.incrementar(PAGINAS, origem="ocr")
+    assert _esperar(lambda: os.stat(arquivo).st_mtime_ns != gravado_em)
+
+    # outro processo (o worker que responde ao /metrics) soma o snapshot gravado
+    leitor = Metrics()
+    leitor.incrementar(PAGINAS, origem="texto")
+    total = leitor.agregado(pasta)
+    assert total.contador(PAGINAS, origem="texto") == 2
+    assert total.contador(PAGINAS, origem="ocr") == 1
+
+
+def test_consolidar_worker_encerrado(tmp_path):
+    pasta = str(tmp_path)
+    worker = Metrics()
+    worker.incrementar(PAGINAS, origem="texto")
+    worker.persistir(pasta)
+    Metrics.consolidar(pasta, os.getpid())
+
+    assert [os.path.basename(c) for c in _arquivos(pasta)] == ["metricas_encerrados.json"]
+    assert Metrics().agregado(pasta).contador(PAGINAS, origem="texto") == 1
@@ -0,0 +1,43 @@
+import os
+import pandas as pd
+from services.pdf_data_extractor import PDFDataExtractor
+from handlers.parquet_store import ParquetStore
+from handlers.results_query import consultar
+from utils.mapa_sintetico import linhas_mapa_exemplo
+
+def _pagina(mes):
+    return "\n".join(linhas_mapa_exemplo()).replace("Janeiro de 2025", mes)
+
+def test_anomapa_e_o_ano_completo_do_cabecalho():
+    rows = PDFDataExtractor().extract_rows({"mapa.pdf": {1: _pagina("Maio de 2024")}})
+    assert rows and {row["anomapa"] for row in rows} == {"2024"}
+
+def test_anomapa_sem_cabecalho_usa_o_primeiro_ano_da_pagina():
+    texto = _pagina("Maio de 2024").replace("Responsabilidades de crédito referentes a Maio de 2024", "")
+    rows = PDFDataExtractor().extract_rows({"mapa.pdf": {1: texto}})
+    # o primeiro ano de 4 dígitos da página é o da data de início do primeiro contrato
+    assert {row["anomapa"] for row in rows} == {"2020"}
+
+def test_particiona_por_ano_e_le_uma_so_particao(tmp_path):
+    extrator = PDFDataExtractor()
+    rows = extrator.extract_rows({"mapa_2024.pdf": {1: _pagina("Maio de 2024")}})
+    rows += extrator.extract_rows({"mapa_2023.pdf": {1: _pagina("Maio de 2023")}})
+    pasta = str(tmp_path / "parquet")
+
+    assert ParquetStore(folder=pasta).append(extrator.build_dataframe(rows)) == len(rows)
+
+    assert sorted(os.listdir(pasta)) == ["anomapa=2023", "anomapa=2024"]
+    resultado = consultar(anomapa="2024", folder=pasta)
+    assert len(resultado) == 2
+    assert set(resultado["arquivopdf"]) == {"mapa_2024.pdf"}
+    assert set(resultado["mesmapa"]) == {"maio de 2024"}
+
+def test_anomapa_antigo_so_com_o_seculo_vem_do_mesmapa(tmp_path):
+    pasta = str(tmp_path / "parquet")
+    df = pd.DataFrame({
+        "nif": ["1", "2"], "instituicao": ["a", "b"], "divida": [1.0, 2.0],
+        "mesmapa": ["maio de 2024", "maio de 2023"], "anomapa": ["20", "20"],
+    })
+    ParquetStore(folder=pasta).append(df)
+    assert sorted(os.listdir(pasta)) == ["anomapa=2023", "anomapa=2024"]
+    assert consultar(anomapa="2023", folder=pasta)["nif"].tolist() == ["2"]
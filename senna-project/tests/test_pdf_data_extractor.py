@@ -0,0 +1,149 @@
+import random
+
+import pandas as pd
+import pytest
+
+from services.pdf_data_extractor import PDFDataExtractor
+from utils.mapa_sintetico import gerar_paginas, linhas_mapa_exemplo
+from legado.pdf_data_extractor import PDFDataExtractor as PDFDataExtractorLegado
+
+# trechos do layout do MDR (e quebras/espaços estranhos) inseridos pela mutação dos textos
+FRAGMENTOS = [
+    "Montantes", "Produto financeiroMontantes", "Produto financeiro\nMontantes", "Produto financeiro",
+    "Produto financeiro Crédito pessoal", "Total em dívida", "Total em dívida\ndo qual, em incumprimento\n",
+    " €", "€", "12,00", " 1.234,00 € ", "Fim", "Fim 2020-01-01", "Início 2021-02-03",
+    "Informação comunicada pela instituição:", "Informação comunicada pela instituição:\n",
+    "Informação comunicada pela instituição: X", "Informação comunicada pela instituição:  ",
+    "Nome:", "Nome: Zé", "Nº de Identificação: 99", "Nº de Identificação:\n123", "2019", "1999x",
+    "Em litígio judicial sim", "EM LITÍGIO JUDICIAL NÃO", "Número", "Garantias", "número\n-\ngarantias",
+    "Tipo de responsabilidade", "Abatido ao ativo", "Entrada incumpr. 2020-01-01", "Nº devedores no contrato 12",
+    "\xa0", "\r", "\r\n", "\x0c", "\u2028", "\x85", "\n", "\n\n", "  ", "-",
+    "Responsabilidades de crédito referentes a\nMaio",
+]
+
+
+def _mutar(rng, texto):
+    for _ in range(rng.randint(0, 12)):
+        pos = rng.randint(0, len(texto))
+        sorteio = rng.random()
+        if sorteio < 0.45:
+            texto = texto[:pos] + rng.choice(FRAGMENTOS) + texto[pos:]
+        elif sorteio < 0.6:
+            texto = texto[:pos] + texto[pos + rng.randint(1, 60):]
+        elif sorteio < 0.7:
+            texto = texto[:pos] + texto[pos:].replace(" ", "\xa0", 3)
+        elif sorteio < 0.8:
+            texto = texto[:pos]
+        else:
+            origem = rng.randint(0, len(texto))
+            texto = texto[:pos] + texto[origem:origem + rng.randint(0, 300)] + texto[pos:]
+    return texto
+
+
+def _mapa(seed, mutar=False):
+    rng = random.Random(seed)
+    paginas = gerar_paginas(seed, paginas=rng.randint(1, 3), instituicoes=rng.randint(1, 4), produtos=3)
+    textos = {numero: "\n".join(linhas) for numero, linhas in enumerate(paginas, start=1)}
+    if mutar:
+        textos = {numero: _mutar(rng, texto) for numero, texto in textos.items()}
+    return {f"decrypted_mapa_{seed}.pdf": textos}
+
+
+def _comparar_com_legado(mapa):
+    novo = PDFDataExtractor().extract_data(mapa)
+    antigo = PDFDataExtractorLegado().extract_data(mapa)
+
+    # o parser antigo guardava só o século em anomapa ("20"); o atual guarda o ano inteiro
+    if "anomapa" in antigo:
+        assert novo["anomapa"].isna().tolist() == antigo["anomapa"].isna().tolist()
+        ano = novo["anomapa"].dropna()
+        assert ano.str.fullmatch(r"(?:19|20|21)\d{2}").all()
+        assert (ano.str[:2] == antigo["anomapa"].dropna()).all()
+
+    pd.testing.assert_frame_equal(novo.drop(columns="anomapa", errors="ignore"),
+                                  antigo.drop(columns="anomapa", errors="ignore"))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_mesmas_linhas_que_o_parser_antigo(seed):
+    _comparar_com_legado(_mapa(seed))
+
+
+@pytest.mark.parametrize("lote", range(10))
+def test_mesmas_linhas_que_o_parser_antigo_com_textos_mutados(lote):
+    # blocos truncados, marcadores colados, \xa0, quebras \r/\x0c/\u2028 e rótulos soltos
+    for seed in range(lote * 40, (lote + 1) * 40):
+        _comparar_com_legado(_mapa(seed, mutar=True))
+
+
+def test_campos_da_pagina_de_exemplo():
+    rows = PDFDataExtractor().extract_rows({"decrypted_exemplo.pdf": {1: "\n".join(linhas_mapa_exemplo())}})
+
+    assert len(rows) == 2
+    santander, caixa = rows
+    assert santander == {
+        "arquivopdf": "exemplo.pdf", "paginapdf": "texto_pagina1", "nome": "cliente sintético",
+        "nif": "100000002", "mesmapa": "janeiro de 2025", "anomapa": "2025",
+        "instituicao": "banco santander totta, s.a.", "divida": 12345.67, "litigio": "Não", "parcela": 0.0,
+        "numdevedores": 1, "prodfinanceiro": "Créditopessoal", "datinicio": "2020-01-15",
+        "datfim": "2030-01-15", "entradaincumpr": None, "garantias": 0.0,
+    }
+    assert caixa["instituicao"] == "caixa geral de depósitos, s.a."
+    assert (caixa["divida"], caixa["numdevedores"], caixa["garantias"]) == (95000.0, 2, 1.0)
+    assert caixa["prodfinanceiro"] == "Créditoàhabitação"
+
+
+def test_varios_produtos_por_instituicao_e_espacos_nao_separaveis():
+    linhas = linhas_mapa_exemplo()
+    bloco_santander = linhas[6:22]
+    texto = "\n".join(linhas[:22] + bloco_santander + linhas[22:]).replace("12.345,67 €", "12.345,67\xa0€")
+
+    rows = PDFDataExtractor().extract_rows({"mapa.pdf": {1: texto}})
+
+    assert [row["instituicao"] for row in rows] == ["banco santander totta, s.a."] * 2 + ["caixa geral de depósitos, s.a."]
+    assert [row["divida"] for row in rows] == [12345.67, 12345.67, 95000.0]
+
+
+def test_pagina_sem_blocos_nao_gera_linhas():
+    extrator = PDFDataExtractor()
+    assert extrator.extract_rows({"mapa.pdf": {1: "Banco de Portugal\nLegenda dos campos"}}) == []
+
+    df = extrator.extract_data({})
+    assert df.empty
+    assert {"divida", "parcela", "garantias", "numdevedores"} <= set(df.columns)
+
+
+def _sem_prefixo(cabecalho):
+    return {key: valor for key, valor in cabecalho.items() if key != "prefixo"}
+
+
+def test_cabecalho_reaproveitado_so_com_o_mesmo_inicio():
+    extrator = PDFDataExtractor()
+    inicio = "Nome: Zé\nNº de Identificação: 12\nResponsabilidades de crédito referentes a maio de 2024\n"
+    referencia = extrator.cabecalho(inicio + "Página 1")
+    assert referencia["prefixo"] == inicio
+    assert _sem_prefixo(extrator.cabecalho(inicio + "Página 2", referencia)) == _sem_prefixo(referencia)
+    assert extrator.cabecalho(inicio.replace("Zé", "Ana") + "Página 2", referencia)["nome"] == "Ana"
+
+    # match até o fim do texto: numa página mais longa o mesmo campo pode continuar
+    curto = extrator.cabecalho("Nome: Zé")
+    assert curto["prefixo"] is None
+    assert extrator.cabecalho("Nome: Zé Silva", curto)["nome"] == "Zé Silva"
+
+    # campo ausente na primeira página é procurado em cada página
+    sem_nif = extrator.cabecalho("Nome: Zé\nPágina 1")
+    assert extrator.cabecalho("Nome: Zé\nNº de Identificação: 99\n", sem_nif)["nif"] == "99"
+
+
+@pytest.mark.parametrize("lote", range(5))
+def test_cabecalho_reaproveitado_igual_ao_lido_na_pagina(lote):
+    extrator = PDFDataExtractor()
+    for seed in range(lote * 40, (lote + 1) * 40):
+        rng = random.Random(seed)
+        primeira, = _mapa(seed, mutar=True).values()
+        primeira = primeira[1]
+        # páginas com o início da primeira cortado em qualquer ponto e o resto mutado
+        corte = rng.randint(0, min(len(primeira), 250))
+        outra = primeira[:corte] + _mutar(rng, primeira[corte:] or "\n")
+        referencia = extrator.cabecalho(primeira)
+        assert _sem_prefixo(extrator.cabecalho(outra, referencia)) == _sem_prefixo(extrator.cabecalho(outra)), seed
@@ -0,0 +1,50 @@
+import os
+
+import pikepdf
+import pytest
+
+from services.pdf_decryptor import PDFDecryptor, DESCRIPTOGRAFADO, SEM_CRIPTOGRAFIA, ERRO
+from utils.mapa_sintetico import gerar_mapa
+
+
+@pytest.fixture
+def pastas(tmp_path):
+    pastas = {nome: tmp_path / nome for nome in ("encrypted", "processed", "decrypted")}
+    for pasta in pastas.values():
+        pasta.mkdir()
+    (pastas["encrypted"] / "cifrado.pdf").write_bytes(gerar_mapa(1, paginas=1, variante="cifrado"))
+    (pastas["encrypted"] / "aberto.pdf").write_bytes(gerar_mapa(2, paginas=1, variante="aberto"))
+    (pastas["encrypted"] / "corrompido.pdf").write_bytes(b"nao e um pdf")
+    return pastas
+
+
+def _decryptor(pastas):
+    return PDFDecryptor(source_folder=str(pastas["encrypted"]), processed_folder=str(pastas["processed"]),
+                        target_folder=str(pastas["decrypted"]))
+
+
+def test_decrypt_pdfs_with_progress_retorna_caminhos(pastas):
+    caminhos = _decryptor(pastas).decrypt_pdfs_with_progress()
+
+    assert sorted(map(os.path.basename, caminhos)) == ["decrypted_aberto.pdf", "decrypted_cifrado.pdf"]
+    for caminho in caminhos:
+        with pikepdf.open(caminho) as pdf:
+            assert not pdf.is_encrypted
+    assert sorted(os.listdir(pastas["processed"])) == ["aberto.pdf", "cifrado.pdf"]
+    assert os.listdir(pastas["encrypted"]) == ["corrompido.pdf"]
+
+
+def test_decrypt_file_result_por_status(pastas):
+    decryptor = _decryptor(pastas)
+    cifrado, aberto, corrompido = (decryptor.decrypt_file_result(f) for f in ("cifrado.pdf", "aberto.pdf", "corrompido.pdf"))
+
+    assert (cifrado["status"], aberto["status"], corrompido["status"]) == (DESCRIPTOGRAFADO, SEM_CRIPTOGRAFIA, ERRO)
+    assert cifrado["caminho"] == str(pastas["decrypted"] / "decrypted_cifrado.pdf") and cifrado["erro"] is None
+    assert corrompido["caminho"] is None and corrompido["erro"]
+    assert all(r["segundos"] >= 0 for r in (cifrado, aberto, corrompido))
+    # o PDF sem criptografia não é reescrito
+    assert (pastas["decrypted"] / "decrypted_aberto.pdf").read_bytes() == (pastas["processed"] / "aberto.pdf").read_bytes()
+
+
+def test_pasta_vazia(tmp_path):
+    assert PDFDecryptor(source_folder=str(tmp_path)).decrypt_pdfs_with_progress() == []
@@ -0,0 +1,120 @@
+import io
+
+import pdf2image
+import pikepdf
+import pytesseract
+import pytest
+from PIL import Image
+
+from config import Config
+from services.pdf_text_extractor import PDFTextExtractor
+from utils.mapa_sintetico import gerar_mapa, linhas_mapa_exemplo
+
+PAGINA_COMPLETA = linhas_mapa_exemplo()
+# "Total em dívida" ilegível: o parser não encontra a dívida dos blocos
+PAGINA_SEM_DIVIDA = [linha for linha in PAGINA_COMPLETA if not linha.startswith("Total em")]
+
+
+def _misto():
+    with pikepdf.open(io.BytesIO(gerar_mapa(1, paginas=2, variante="aberto"))) as pdf, \
+            pikepdf.open(io.BytesIO(gerar_mapa(2, paginas=1, variante="digitalizado"))) as digitalizado:
+        pdf.pages.extend(digitalizado.pages)
+        saida = io.BytesIO()
+        pdf.save(saida)
+    return saida.getvalue()
+
+
+@pytest.mark.parametrize("conteudo, esperado", [
+    (lambda: gerar_mapa(1, paginas=2, variante="aberto"), ("texto", set(), 2)),
+    (lambda: gerar_mapa(1, paginas=2, variante="cifrado"), ("texto", set(), 2)),
+    (lambda: gerar_mapa(1, paginas=2, variante="digitalizado"), ("digitalizado", {0, 1}, 2)),
+    (_misto, ("misto", {2}, 3)),
+], ids=["aberto", "cifrado", "digitalizado", "misto"])
+def test_classificar(conteudo, esperado):
+    stream = io.BytesIO(conteudo())
+    assert PDFTextExtractor.classificar(stream) == esperado
+    assert stream.tell() == 0
+
+
+def test_classificar_pdf_ilegivel_segue_como_texto():
+    assert PDFTextExtractor.classificar(io.BytesIO(b"nao e um pdf")) == ("texto", set(), None)
+
+
+def _dados(linhas, confianca):
+    """Saída de image_to_data com uma linha do Tesseract por linha do texto."""
+    dados = {chave: [] for chave in ("block_num", "par_num", "line_num", "text", "conf")}
+    for numero, linha in enumerate(linhas, start=1):
+        for palavra in linha.split():
+            for chave, valor in zip(dados, (1, 1, numero, palavra, confianca)):
+                dados[chave].append(valor)
+    return dados
+
+
+@pytest.fixture
+def ocr(monkeypatch):
+    """
+    pdf2image e pytesseract simulados: cada imagem tem largura = DPI e altura = página + 1 e
+    leituras[(página, dpi)] = (linhas, confiança) diz o que o Tesseract "lê" nela.
+    """
+    monkeypatch.setattr(Config, "OCR_ADAPTATIVO", True)
+    monkeypatch.setattr(Config, "OCR_DPI", 200)
+    monkeypatch.setattr(Config, "OCR_DPI_ALTO", 300)
+    monkeypatch.setattr(Config, "OCR_CONFIANCA_MINIMA", 75)
+    simulado = {"leituras": {}, "rasterizacoes": [], "passagens": []}
+
+    def rasterizar(dpi, first_page, last_page, grayscale, **_):
+        simulado["rasterizacoes"].append((first_page - 1, last_page - 1, dpi, grayscale))
+        return [Image.new("RGB" if not grayscale else "L", (dpi, pagina), 255)
+                for pagina in range(first_page, last_page + 1)]
+
+    def image_to_data(imagem, lang, config, output_type):
+        pagina, dpi = imagem.size[1] - 1, imagem.size[0]
+        simulado["passagens"].append((pagina, dpi, imagem.mode))
+        return _dados(*simulado["leituras"][(pagina, dpi)])
+
+    monkeypatch.setattr(pdf2image, "convert_from_path", lambda caminho, **kw: rasterizar(**kw))
+    monkeypatch.setattr(pdf2image, "convert_from_bytes", lambda conteudo, **kw: rasterizar(**kw))
+    monkeypatch.setattr(pytesseract, "image_to_data", image_to_data)
+    return simulado
+
+
+def test_ocr_adaptativo_rele_em_dpi_alto_so_o_necessario(ocr):
+    ocr["leituras"].update({
+        (0, 200): (PAGINA_COMPLETA, 91),
+        (1, 200): (PAGINA_COMPLETA, 40),     # confiança baixa
+        (1, 300): (PAGINA_COMPLETA, 88),
+        (2, 200): (PAGINA_SEM_DIVIDA, 95),   # parser sem "Total em dívida"
+        (2, 300): (PAGINA_COMPLETA, 90),
+        (4, 200): (PAGINA_SEM_DIVIDA, 20),
+        (4, 300): ([], 0),                   # a releitura não leu nada: fica a primeira
+    })
+
+    textos = PDFTextExtractor(ocr_workers=2).extract_text_with_ocr_batch("mapa.pdf", [4, 0, 2, 1])
+
+    assert ocr["rasterizacoes"] == [(0, 2, 200, True), (4, 4, 200, True), (1, 2, 300, True), (4, 4, 300, True)]
+    # a passagem rápida é binarizada; a de DPI alto lê os tons de cinza
+    assert sorted(ocr["passagens"]) == [(0, 200, "1"), (1, 200, "1"), (1, 300, "L"), (2, 200, "1"),
+                                        (2, 300, "L"), (4, 200, "1"), (4, 300, "L")]
+    assert textos == {0: "\n".join(PAGINA_COMPLETA), 1: "\n".join(PAGINA_COMPLETA),
+                      2: "\n".join(PAGINA_COMPLETA), 4: "\n".join(PAGINA_SEM_DIVIDA)}
+
+
+def test_ocr_sem_modo_adaptativo(ocr, monkeypatch):
+    monkeypatch.setattr(Config, "OCR_ADAPTATIVO", False)
+    lidas = []
+    monkeypatch.setattr(pytesseract, "image_to_string",
+                        lambda imagem, lang: lidas.append(imagem.size) or f"pagina {imagem.size[1] - 1}")
+
+    textos = PDFTextExtractor().extract_text_with_ocr_batch("mapa.pdf", [0, 1])
+
+    assert textos == {0: "pagina 0", 1: "pagina 1"}
+    assert ocr["rasterizacoes"] == [(0, 1, 300, False)] and ocr["passagens"] == []
+
+
+def test_digitalizado_vai_inteiro_para_o_ocr(ocr):
+    ocr["leituras"].update({(0, 200): (PAGINA_COMPLETA, 90), (1, 200): (PAGINA_COMPLETA, 90)})
+
+    paginas = PDFTextExtractor().extract_pages(io.BytesIO(gerar_mapa(3, paginas=2, variante="digitalizado")))
+
+    assert paginas == {"texto_pagina1": "\n".join(PAGINA_COMPLETA), "texto_pagina2": "\n".join(PAGINA_COMPLETA)}
+    assert ocr["rasterizacoes"] == [(0, 1, 200, True)]
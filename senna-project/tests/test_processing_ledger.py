@@ -0,0 +1,171 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from services.pdf_batch_processor import PDFBatchProcessor
+from services.processing_ledger import ProcessingLedger
+from services.text_cache import TextCache
+from utils.mapa_sintetico import gerar_mapa
+
+
+def _pid_encerrado():
+    processo = subprocess.Popen([sys.executable, "-c", "pass"])
+    processo.wait()
+    return processo.pid
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return ProcessingLedger(db_path=str(tmp_path / "ledger" / "processamento.sqlite"), stale_seconds=3600)
+
+
+def test_etapas_e_erros(ledger):
+    ledger.registrar("a", "a.pdf")
+    ledger.registrar("b", "b.pdf", chave_descriptografado="b-aberto")
+    assert ledger.etapa("a") == ProcessingLedger.RECEBIDO
+    assert ledger.etapa("nunca-visto") is None
+    assert ledger.chave_de_descriptografado("b-aberto") == "b"
+
+    ledger.avancar("a", ProcessingLedger.PARSEADO, linhas=3)
+    ledger.avancar_lote(["a", "b", None], ProcessingLedger.PERFILADO)
+    # só quem já estava parseado/perfilado avança no lote
+    assert (ledger.etapa("a"), ledger.etapa("b")) == (ProcessingLedger.PERFILADO, ProcessingLedger.RECEBIDO)
+
+    ledger.avancar_lote(["a", "b"], ProcessingLedger.EXPORTADO)
+    assert ledger.exportados(["a", "b", "c"]) == {"a"}
+
+    ledger.falhar("b", ValueError("senha"))
+    ledger.registrar("b", "b_de_novo.pdf")  # reenviado: o erro é descartado, a etapa fica
+    ledger._atualizar("b", pid=_pid_encerrado())
+    (pendente,) = ledger.pendentes()
+    assert (pendente["chave"], pendente["arquivo"], pendente["erro"]) == ("b", "b_de_novo.pdf", None)
+
+
+def test_pendentes_so_de_processos_encerrados_ou_parados(ledger):
+    for chave in ("proprio", "encerrado", "vivo", "com_erro", "exportado"):
+        ledger.registrar(chave, f"{chave}.pdf")
+    ledger._atualizar("encerrado", pid=_pid_encerrado())
+    ledger._atualizar("vivo", pid=os.getppid())
+    ledger._atualizar("com_erro", pid=_pid_encerrado())
+    ledger.falhar("com_erro", "sem texto")
+    ledger._atualizar("exportado", pid=_pid_encerrado(), etapa=ProcessingLedger.EXPORTADO)
+
+    assert [r["chave"] for r in ledger.pendentes()] == ["encerrado"]
+
+    parado = ProcessingLedger(db_path=ledger.db_path, stale_seconds=-1)
+    assert [r["chave"] for r in parado.pendentes()] == ["encerrado", "vivo"]
+
+
+def test_desligado_nao_registra_nada(tmp_path):
+    ledger = ProcessingLedger(db_path=str(tmp_path / "ledger" / "processamento.sqlite"), enabled=False)
+    ledger.registrar("a", "a.pdf")
+    ledger.avancar("a", ProcessingLedger.EXPORTADO)
+    ledger.avancar_lote(["a"], ProcessingLedger.EXPORTADO)
+
+    assert ledger.etapa("a") is None
+    assert ledger.exportados(["a"]) == set() and ledger.pendentes() == []
+    assert not os.path.exists(tmp_path / "ledger")
+
+
+@pytest.fixture
+def pastas(tmp_path):
+    pastas = {nome: tmp_path / nome for nome in ("encrypted", "processed_encrypted", "decrypted", "processed_decrypted")}
+    for pasta in pastas.values():
+        pasta.mkdir()
+    return pastas
+
+
+def _processor(pastas, ledger, cache_mb=64):
+    processor = PDFBatchProcessor(
+        workers=1, source_folder=str(pastas["encrypted"]),
+        processed_encrypted_folder=str(pastas["processed_encrypted"]), decrypted_folder=str(pastas["decrypted"]),
+        processed_decrypted_folder=str(pastas["processed_decrypted"]), ledger=ledger,
+    )
+    processor.text_cache = TextCache(folder=str(pastas["encrypted"].parent / "text_cache"), max_mb=cache_mb)
+    return processor
+
+
+def _registro(ledger, chave):
+    with ledger._connect() as conn:
+        return dict(conn.execute("SELECT * FROM arquivos WHERE chave = ?", (chave,)).fetchone())
+
+
+@pytest.mark.parametrize("cache_mb", [64, 0], ids=["com_cache_de_texto", "sem_cache_de_texto"])
+def test_lote_interrompido_e_retomado_sem_duplicar(pastas, ledger, cache_mb):
+    mapa_a, mapa_b = gerar_mapa(1, paginas=1), gerar_mapa(2, paginas=1)
+    (pastas["encrypted"] / "a.pdf").write_bytes(mapa_a)
+    (pastas["encrypted"] / "b.pdf").write_bytes(mapa_b)
+    (pastas["encrypted"] / "copia_de_a.pdf").write_bytes(mapa_a)
+
+    processor = _processor(pastas, ledger, cache_mb)
+    tarefas = processor.list_tasks()
+    assert sorted(os.path.basename(t[0]) for t in tarefas) == ["a.pdf", "b.pdf"]  # mesmo conteúdo, um registro
+    assert os.listdir(pastas["processed_encrypted"]) == ["copia_de_a.pdf"]
+    chaves = {os.path.basename(t[0]): t[2] for t in tarefas}
+    assert {ledger.etapa(c) for c in chaves.values()} == {ProcessingLedger.RECEBIDO}
+
+    df = processor.process(tarefas)
+    registro = _registro(ledger, chaves["a.pdf"])
+    assert registro["etapa"] == ProcessingLedger.PARSEADO
+    assert registro["linhas"] == (df["arquivopdf"] == "a.pdf").sum() > 0
+    assert registro["caminho_original"] == str(pastas["processed_encrypted"] / "a.pdf")
+    assert registro["caminho_descriptografado"] == str(pastas["processed_decrypted"] / "decrypted_a.pdf")
+    assert registro["chave_descriptografado"] == TextCache.hash_file(registro["caminho_descriptografado"])
+
+    # o processo cai antes de exportar: na execução seguinte os dois são retomados
+    morto = _pid_encerrado()
+    for chave in chaves.values():
+        ledger._atualizar(chave, pid=morto)
+    retomado = _processor(pastas, ledger, cache_mb)
+    tarefas_retomadas = retomado.list_tasks()
+    assert sorted(t[2] for t in tarefas_retomadas) == sorted(chaves.values())
+    if cache_mb:
+        assert {t[0] for t in tarefas_retomadas} == {registro["caminho_original"], str(pastas["processed_encrypted"] / "b.pdf")}
+    else:
+        assert all(t[1] for t in tarefas_retomadas)  # sem cache, parte do PDF já descriptografado
+    df_retomado = retomado.process(tarefas_retomadas)
+    assert df_retomado.sort_values(["arquivopdf", "instituicao"]).reset_index(drop=True).equals(
+        df.sort_values(["arquivopdf", "instituicao"]).reset_index(drop=True))
+
+    retomado.mark_stage(ProcessingLedger.PERFILADO)
+    retomado.mark_stage(ProcessingLedger.EXPORTADO)
+    assert ledger.exportados(chaves.values()) == set(chaves.values())
+    assert retomado.pending_export(df_retomado).empty
+
+    # reenviado com outro nome depois de exportado: vai direto para processed
+    (pastas["encrypted"] / "reenviado.pdf").write_bytes(mapa_b)
+    novo = _processor(pastas, ledger, cache_mb)
+    assert novo.list_tasks() == []
+    assert "reenviado.pdf" in os.listdir(pastas["processed_encrypted"])
+
+
+def test_arquivos_sumiram_antes_de_retomar(pastas, ledger):
+    (pastas["encrypted"] / "a.pdf").write_bytes(gerar_mapa(1, paginas=1))
+    processor = _processor(pastas, ledger, cache_mb=0)
+    (tarefa,) = processor.list_tasks()
+    processor.process([tarefa])
+
+    os.remove(pastas["processed_encrypted"] / "a.pdf")
+    os.remove(pastas["processed_decrypted"] / "decrypted_a.pdf")
+    ledger._atualizar(tarefa[2], pid=_pid_encerrado())
+
+    assert _processor(pastas, ledger, cache_mb=0).list_tasks() == []
+    assert _registro(ledger, tarefa[2])["erro"] == "arquivos não encontrados para retomar"
+    assert ledger.pendentes() == []
+
+
+def test_falha_na_descriptografia_fica_no_ledger(pastas, ledger):
+    (pastas["encrypted"] / "a.pdf").write_bytes(gerar_mapa(1, paginas=1))
+    (pastas["encrypted"] / "ruim.pdf").write_bytes(b"nao e um pdf")
+    processor = _processor(pastas, ledger)
+    tarefas = processor.list_tasks()
+    chaves = {os.path.basename(t[0]): t[2] for t in tarefas}
+
+    df = processor.process(tarefas)
+    assert set(df["arquivopdf"]) == {"a.pdf"}
+    bom, ruim = _registro(ledger, chaves["a.pdf"]), _registro(ledger, chaves["ruim.pdf"])
+    assert (bom["descriptografia"], bom["erro"]) == ("descriptografado", None)
+    assert ruim["etapa"] == ProcessingLedger.RECEBIDO and ruim["descriptografia"] == "erro"
+    assert ruim["erro"].startswith("descriptografia: ")
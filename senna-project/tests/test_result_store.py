@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from handlers.result_store import ResultStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(folder=str(tmp_path / "resultado_extracao"), legacy_json_path=str(tmp_path / "resultado_extracao.json"))
+
+
+def _df(*nifs):
+    return pd.DataFrame({"nif": list(nifs), "divida": np.arange(len(nifs), dtype=float), "perfila": np.bool_(True)})
+
+
+def _arquivos(store):
+    return sorted(os.listdir(store.folder))
+
+
+def test_append_grava_um_segmento_por_execucao(store):
+    assert store.append(_df()) is None
+    primeiro = store.append(_df("1", "2"))
+    segundo = store.append(_df("3"))
+
+    assert _arquivos(store) == sorted(map(os.path.basename, [primeiro, segundo]))
+    assert os.path.basename(primeiro) < os.path.basename(segundo)
+    assert store.read_all() == [
+        {"nif": "1", "divida": 0.0, "perfila": True},
+        {"nif": "2", "divida": 1.0, "perfila": True},
+        {"nif": "3", "divida": 0.0, "perfila": True},
+    ]
+    assert store.read_dataframe()["nif"].tolist() == ["1", "2", "3"]
+
+
+def test_compactar_junta_os_segmentos_numa_base(store):
+    assert store.compact() is None
+    ultimo = [store.append(_df(str(i))) for i in range(5)][-1]
+    antes = store.read_all()
+
+    assert store.compact() == 5
+    assert _arquivos(store) == ["base-" + os.path.basename(ultimo)]
+    assert store.read_all() == antes
+    assert store.compact() is None  # nada novo
+
+    store.append(_df("5", "6"))
+    assert [r["nif"] for r in store.read_all()] == ["0", "1", "2", "3", "4", "5", "6"]
+    assert store.compact() == 7
+    assert len(_arquivos(store)) == 1
+    assert [r["nif"] for r in store.read_all()] == ["0", "1", "2", "3", "4", "5", "6"]
+
+
+def test_compactacao_interrompida_nao_duplica_registros(store, tmp_path):
+    for i in range(3):
+        store.append(_df(str(i)))
+    copia = tmp_path / "copia"
+    shutil.copytree(store.folder, copia)
+
+    store.compact()
+    # a base nova foi publicada mas os segmentos antigos não chegaram a ser removidos
+    for nome in os.listdir(copia):
+        shutil.copy(copia / nome, store.folder)
+    store.append(_df("3"))
+
+    assert [r["nif"] for r in store.read_all()] == ["0", "1", "2", "3"]
+    assert store.compact() == 4
+    assert [r["nif"] for r in store.read_all()] == ["0", "1", "2", "3"]
+
+
+def test_json_legado_e_lido_e_migrado(store):
+    with open(store.legacy_json_path, "w", encoding="utf-8") as f:
+        json.dump([{"nif": "antigo", "divida": 1.5}], f)
+    store.append(_df("novo"))
+
+    assert [r["nif"] for r in store.read_all()] == ["antigo", "novo"]
+    assert store.compact() == 2
+    assert not os.path.exists(store.legacy_json_path)
+    assert os.path.exists(store.legacy_json_path + ".migrado")
+    assert [r["nif"] for r in store.read_all()] == ["antigo", "novo"]
+
+
+def test_json_legado_sozinho_tambem_e_compactado(store):
+    with open(store.legacy_json_path, "w", encoding="utf-8") as f:
+        json.dump([{"nif": "antigo"}], f)
+
+    assert store.compact() == 1
+    assert [nome.startswith("base-") for nome in _arquivos(store)] == [True]
+    assert store.read_all() == [{"nif": "antigo"}]
+
+
+def test_json_legado_invalido_e_ignorado(store):
+    with open(store.legacy_json_path, "w", encoding="utf-8") as f:
+        f.write("[{")
+    store.append(_df("1"))
+    assert store.read_all() == [{"nif": "1", "divida": 0.0, "perfila": True}]
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+import api.app as api
+from handlers.results_db import ResultsDB, TIPO_CLIENTE, TIPO_NAO_PERFILA
+
+
+@pytest.fixture
+def db(tmp_path):
+    return ResultsDB(db_path=str(tmp_path / "resultados" / "resultados.sqlite"), cache_size=2)
+
+
+def _perfil(nif, perfila=True, total=1000.0, dividas=()):
+    resumo = {"perfila": perfila, "divida_total_elegivel": total}
+    return nif, resumo, json.dumps({"nif": nif, "total": total}), list(dividas)
+
+
+def test_gravar_perfis_e_dividas(db):
+    dividas = [
+        {"map_id": "mapa.pdf", "instituicao": "cofidis", "divida": "7000", "perfila": True},
+        {"map_id": "mapa.pdf", "instituicao": "cgd", "divida": "x", "perfila": 0},
+        {"instituicao": "bpi"},
+    ]
+    assert db.gravar_perfis(TIPO_CLIENTE, [_perfil("100000002", dividas=dividas), _perfil(200000003)]) == 2
+
+    with db._connect() as conn:
+        perfis = [dict(r) for r in conn.execute("SELECT nif, tipo, perfila, divida_total_elegivel FROM perfis ORDER BY id")]
+        linhas = [tuple(r) for r in conn.execute(
+            "SELECT nif, map_id, instituicao, divida, perfila FROM dividas ORDER BY rowid")]
+    assert perfis == [
+        {"nif": "100000002", "tipo": TIPO_CLIENTE, "perfila": 1, "divida_total_elegivel": 1000.0},
+        {"nif": "200000003", "tipo": TIPO_CLIENTE, "perfila": 1, "divida_total_elegivel": 1000.0},
+    ]
+    assert linhas == [
+        ("100000002", "mapa.pdf", "cofidis", 7000.0, 1),
+        ("100000002", "mapa.pdf", "cgd", None, 0),
+        ("100000002", None, "bpi", None, None),
+    ]
+
+
+def test_gravacao_com_erro_nao_grava_nada(db):
+    with pytest.raises(AttributeError):
+        db.gravar_perfis(TIPO_CLIENTE, [_perfil("1"), ("2", None, "{}", [])])
+    assert db.consultar_nif("1") is None
+
+
+def test_nif_desconhecido(db):
+    assert db.consultar_nif("999999990") is None
+
+
+def test_historico_mais_recente_primeiro(db):
+    db.gravar_perfis(TIPO_CLIENTE, [_perfil("1", total=1.0)])
+    db.gravar_perfis(TIPO_NAO_PERFILA, [_perfil("1", perfila=False, total=2.0)])
+    db.gravar_perfis(TIPO_CLIENTE, [_perfil("1", total=3.0), _perfil("2", total=9.0)])
+
+    cliente = db.consultar_nif("1")
+    assert [p["divida_total_elegivel"] for p in cliente["historico"]] == [3.0, 2.0, 1.0]
+    assert [p["tipo"] for p in cliente["historico"]] == [TIPO_CLIENTE, TIPO_NAO_PERFILA, TIPO_CLIENTE]
+    assert cliente["perfil"]["documento"] == {"nif": "1", "total": 3.0}
+    assert cliente["nao_perfila"]["perfila"] is False
+    assert [p["divida_total_elegivel"] for p in db.consultar_nif("1", limite=2)["historico"]] == [3.0, 2.0]
+
+
+def test_cache_invalidado_por_perfil_novo_de_outro_processo(db):
+    db.gravar_perfis(TIPO_CLIENTE, [_perfil("1", total=1.0)])
+    primeira = db.consultar_nif("1")
+    assert db.consultar_nif("1") is primeira  # acerto: MAX(id) não mudou
+
+    outro_processo = ResultsDB(db_path=db.db_path)
+    outro_processo.gravar_perfis(TIPO_CLIENTE, [_perfil("1", total=5.0)])
+
+    nova = db.consultar_nif("1")
+    assert nova is not primeira
+    assert nova["perfil"]["divida_total_elegivel"] == 5.0
+    assert len(nova["historico"]) == 2
+
+
+def test_cache_lru_limitado(db):
+    db.gravar_perfis(TIPO_CLIENTE, [_perfil(nif) for nif in ("1", "2", "3")])
+    um = db.consultar_nif("1")
+    db.consultar_nif("2")
+    assert db.consultar_nif("1") is um  # "1" passa a ser o mais recente
+    db.consultar_nif("3")  # sai o "2"
+
+    assert db.cache_info() == {"entradas": 2, "limite": 2}
+    assert [nif for nif, _ in db._cache] == ["1", "3"]
+
+
+@pytest.fixture
+def cliente_api(db, monkeypatch):
+    monkeypatch.setitem(api._servicos, "results_db", db)
+    return api.app.test_client()
+
+
+def test_get_clientes(cliente_api, db):
+    db.gravar_perfis(TIPO_CLIENTE, [_perfil("100000002", total=1.0)])
+    db.gravar_perfis(TIPO_CLIENTE, [_perfil("100000002", total=2.0)])
+
+    resposta = cliente_api.get("/clientes/100000002?historico=1")
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert corpo["nif"] == "100000002" and corpo["nao_perfila"] is None
+    assert [p["divida_total_elegivel"] for p in corpo["historico"]] == [2.0]
+
+    resposta = cliente_api.get("/clientes/999999990")
+    assert resposta.status_code == 404
+    assert resposta.get_json() == {"error": "NIF sem perfis exportados", "nif": "999999990"}
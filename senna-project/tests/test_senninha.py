@@ -0,0 +1,139 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.senninha import Senninha
+from legado.senninha import Senninha as SenninhaLegado
+
+INSTITUICOES = [
+    "Banco Santander Totta, S.A.", "BNP Paribas Personal Finance", "Cofidis", "Caixa Geral", "WiZink Bank",
+    "Banco Comercial Português (BCP)", "Millennium bcp", "Unicre", "Younited", "Bankinter Consumer Finance",
+    None, "nao_identificada", "Credibom",
+]
+PRODUTOS = [
+    "Crédito pessoal", "Crédito à habitação", "Cartão de crédito", "Crédito automóvel (excluindo locações financeiras)",
+    "Locação financeira imobiliária", None, "Outros", "Habitacao",
+]
+LITIGIOS = ["Não", "Sim", "nao", " Não\xa0", None, np.nan, "NÃO"]
+
+
+def _linha(**campos):
+    linha = {
+        "arquivopdf": "mapa.pdf", "paginapdf": "texto_pagina1", "nome": "cliente", "nif": "100000002",
+        "mesmapa": "maio de 2024", "anomapa": "2024", "instituicao": "cofidis", "divida": 1000.0,
+        "litigio": "Não", "parcela": 50.0, "numdevedores": 1, "prodfinanceiro": "Crédito pessoal",
+        "datinicio": None, "datfim": None, "entradaincumpr": None, "garantias": 0.0,
+    }
+    linha.update(campos)
+    return linha
+
+
+def _df_aleatorio(seed):
+    rng = random.Random(seed)
+    linhas = [
+        _linha(
+            arquivopdf=rng.choice(["a.pdf", "b.pdf", "c.pdf", None, "", " ", np.nan]),
+            nif=rng.choice(["1", "2", "3", None]) if i else "1",
+            mesmapa=rng.choice(["maio de 2024", None, "", np.nan]),
+            anomapa=rng.choice(["2024", None, ""]),
+            instituicao=(rng.choice(INSTITUICOES) or "").lower() if rng.random() < .95 else None,
+            divida=rng.choice([0.0, 100.0, 3000.0, 4500.0, 9999.0, 12000.0, None, -5.0, "7000"]),
+            litigio=rng.choice(LITIGIOS),
+            parcela=rng.choice([0.0, 1.0]),
+            prodfinanceiro=rng.choice(PRODUTOS),
+            garantias=rng.choice([0.0, 0.0, 0.0, 1.0, None]),
+        )
+        for i in range(rng.randint(1, 60))
+    ]
+    df = pd.DataFrame(linhas)
+    if rng.random() < .2:
+        df.index = rng.sample(range(1000), len(df))
+    return df
+
+
+@pytest.mark.parametrize("lote", range(6))
+def test_mesmo_resultado_que_a_versao_linha_a_linha(lote):
+    for seed in range(lote * 20, (lote + 1) * 20):
+        df = _df_aleatorio(seed)
+        antigo, novo = SenninhaLegado.aplicar(df), Senninha.aplicar(df)
+
+        assert list(novo.columns) == list(antigo.columns), seed
+        assert (novo.dtypes == antigo.dtypes).all(), seed
+        assert novo.equals(antigo), seed
+
+
+def _aplicar(*linhas):
+    return Senninha.aplicar(pd.DataFrame(list(linhas)))
+
+
+def test_regra_individual():
+    df = _aplicar(
+        _linha(),
+        _linha(nif="2", litigio="Sim"),
+        _linha(nif="3", garantias=1.0),
+        _linha(nif="4", divida=0.0),
+        _linha(nif="5", prodfinanceiro="Crédito à habitação", divida=50000.0),
+        _linha(nif="6", litigio=" não\xa0"),
+    )
+    # a categoria padronizada de habitação é "Empréstimo bancário": quem a barra é a regra do grupo
+    assert df["perfil_individual"].tolist() == [True, False, False, False, True, True]
+    assert df["perfila"].tolist() == [True, False, False, False, False, True]
+    assert df["categoria_produto"].tolist() == ["Empréstimo bancário"] * 6
+
+
+def test_habitacao_ou_garantia_no_grupo_bloqueiam_perfila():
+    df = _aplicar(
+        _linha(instituicao="cgd"),
+        _linha(instituicao="cgd", prodfinanceiro="Crédito à habitação", divida=80000.0),
+        _linha(instituicao="bpi"),
+        _linha(instituicao="bpi", garantias=1.0),
+        _linha(instituicao="bpi", arquivopdf="outro_mapa.pdf"),
+    )
+    assert df["perfil_individual"].tolist() == [True, True, True, False, True]
+    # grupo = nif + mapa + instituição: o último é de outro mapa e não herda a garantia
+    assert df["perfila"].tolist() == [False, False, False, False, True]
+
+
+def test_sem_arquivo_o_mapa_e_identificado_por_mes_e_ano():
+    df = _aplicar(
+        _linha(arquivopdf=None, instituicao="bpi"),
+        _linha(arquivopdf=None, instituicao="bpi", garantias=1.0),
+        _linha(arquivopdf="", mesmapa="junho de 2024", instituicao="bpi"),
+    )
+    assert df["perfila"].tolist() == [False, False, True]
+    assert df.index.tolist() == [0, 1, 2]
+
+
+def test_credito_automovel_segue_a_regra_geral():
+    automovel = "Crédito automóvel (excluindo locações financeiras)"
+    df = _aplicar(
+        _linha(prodfinanceiro=automovel, divida=12000.0, instituicao="bpi"),
+        _linha(prodfinanceiro=automovel, divida=9000.0, instituicao="cgd"),
+        _linha(prodfinanceiro=automovel, divida=15000.0, instituicao="bcp", litigio="Sim"),
+    )
+    # a categoria padronizada do crédito automóvel é "Empréstimo bancário": vale a regra dos demais produtos
+    assert df["perfil_individual"].tolist() == [True, True, False]
+    assert df["perfila"].tolist() == [True, True, False]
+
+
+def test_pari_persi_pelo_total_no_banco():
+    df = _aplicar(
+        _linha(instituicao="Cofidis", divida=3000.0),
+        _linha(instituicao="COFIDIS, S.A.", divida=2500.0, prodfinanceiro="Cartão de crédito"),
+        _linha(instituicao="wizink bank", divida=2999.0),
+        _linha(instituicao="cgd", divida=50000.0),
+        _linha(instituicao="Santander", divida=9000.0),
+        _linha(instituicao="Santander Consumer", divida=1500.0, litigio="Sim"),
+    )
+    # cofidis: 5.500 ≥ 5.000; wizink: 2.999 < 3.000; cgd sem mínimo; santander: 10.500 ≥ 10.000,
+    # mas a linha em litígio não perfila individualmente
+    assert df["total_nif_mapa_banco"].tolist() == [5500.0, 5500.0, 2999.0, 50000.0, 10500.0, 10500.0]
+    assert df["pari_persi"].tolist() == [True, True, False, False, True, False]
+
+
+def test_conversoes_numericas():
+    df = _aplicar(_linha(divida="7000", parcela=None, garantias="x"))
+    assert (df.loc[0, "divida"], df.loc[0, "parcela"], df.loc[0, "garantias"]) == (7000.0, 0.0, 0.0)
+    assert df["perfil_individual"].dtype == bool and df["pari_persi"].dtype == bool
@@ -0,0 +1,103 @@
+import os
+import threading
+
+import pytest
+
+from services.text_cache import TextCache
+
+PAGINAS = {"texto_pagina1": "x" * 1000}
+
+
+def _cache(tmp_path, entradas=None):
+    # limite em bytes próximo de "entradas" entradas de PAGINAS
+    max_mb = entradas * 1020 / (1024 * 1024) if entradas else 64
+    return TextCache(folder=str(tmp_path / "texto"), max_mb=max_mb)
+
+
+def _envelhecer(cache, chave, segundos):
+    path = cache._path(chave)
+    mtime = os.stat(path).st_mtime - segundos
+    os.utime(path, (mtime, mtime))
+
+
+def test_acerto_e_falta(tmp_path):
+    cache = _cache(tmp_path)
+    chave = TextCache.hash_bytes(b"%PDF-1")
+
+    assert cache.get(chave) is None
+    cache.put(chave, {"texto_pagina1": "Olá ção €"})
+    assert cache.get(chave) == {"texto_pagina1": "Olá ção €"}
+    assert cache.get(TextCache.hash_bytes(b"%PDF-2")) is None
+    assert cache.get(None) is None
+
+
+def test_desativado(tmp_path):
+    cache = TextCache(folder=str(tmp_path / "texto"), max_mb=0)
+    cache.put("ab" * 32, PAGINAS)
+    assert cache.get("ab" * 32) is None
+    assert not os.path.exists(tmp_path / "texto")
+
+
+def test_remove_os_menos_usados_acima_do_limite(tmp_path):
+    cache = _cache(tmp_path, entradas=3.5)
+    a, b, c, d = (TextCache.hash_bytes(bytes([i])) for i in range(4))
+    for idade, chave in ((300, a), (200, b), (100, c)):
+        cache.put(chave, PAGINAS)
+        _envelhecer(cache, chave, idade)
+
+    assert cache.get(a) == PAGINAS  # o acerto renova o mtime: b passa a ser o mais antigo
+    cache.put(d, PAGINAS)
+
+    assert cache.get(b) is None
+    assert all(cache.get(chave) == PAGINAS for chave in (a, c, d))
+    assert cache._total_bytes == cache._scan_total() <= cache.max_bytes
+
+
+def test_regravar_a_mesma_chave_nao_soma_de_novo(tmp_path):
+    cache = _cache(tmp_path, entradas=2.5)
+    chave = TextCache.hash_bytes(b"%PDF")
+    for _ in range(5):
+        cache.put(chave, PAGINAS)
+    cache.put(chave, {"texto_pagina1": "curto"})
+
+    assert cache._total_bytes == cache._scan_total() == os.path.getsize(cache._path(chave))
+    assert cache.get(chave) == {"texto_pagina1": "curto"}
+
+
+def test_instancias_partilham_a_pasta(tmp_path):
+    primeira, segunda = _cache(tmp_path, entradas=2.5), _cache(tmp_path, entradas=2.5)
+    a, b, c = (TextCache.hash_bytes(bytes([i])) for i in range(3))
+    primeira.put(a, PAGINAS)
+    _envelhecer(primeira, a, 100)
+    primeira.put(b, PAGINAS)
+
+    assert segunda.get(b) == PAGINAS
+    # a segunda conta o que a primeira gravou e remove a entrada mais antiga
+    segunda.put(c, PAGINAS)
+    assert primeira.get(a) is None
+    assert primeira.get(b) == PAGINAS and primeira.get(c) == PAGINAS
+
+
+def test_threads_mantem_a_contagem_de_bytes(tmp_path):
+    cache = _cache(tmp_path, entradas=1000)
+    chaves = [TextCache.hash_bytes(bytes([i % 12])) for i in range(12)]
+    cache.put(chaves[0], PAGINAS)  # a primeira gravação lê o total do disco
+
+    def gravar(n):
+        for i in range(60):
+            cache.put(chaves[(n + i) % len(chaves)], {"texto_pagina1": "y" * (100 * ((n + i) % 7 + 1))})
+
+    threads = [threading.Thread(target=gravar, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache._total_bytes == cache._scan_total()
+
+
+@pytest.mark.parametrize("conteudo", [b"", b"%PDF-1.4\n" * 1000])
+def test_hash_file_igual_a_hash_bytes(tmp_path, conteudo):
+    path = tmp_path / "mapa.pdf"
+    path.write_bytes(conteudo)
+    assert TextCache.hash_file(str(path), chunk_size=7) == TextCache.hash_bytes(conteudo)
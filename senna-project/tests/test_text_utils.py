@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from utils.text_utils import (
+    MAP_PRODUTOS, is_habitacao_product, map_by_category, map_financial_product, map_financial_products,
+    slugify_product_name,
+)
+from legado import text_utils as legado
+
+PRODUTOS = [
+    "Crédito pessoal", "Crédito à habitação", "CRÉDITO À HABITAÇÃO", "Cartão de crédito", "Cartão  de\ncrédito",
+    "Crédito automóvel (excluindo locações financeiras)", "Locação financeira imobiliária", "Factoring", "Outros",
+    "Habitacao", "Crédito renovável - linha de crédito", "Facilidades de descoberto", "Ultrapassagens de crédito",
+    "crédito\xa0pessoal", "Crédito-pessoal", "", " ", "None", "nan",
+]
+
+
+def _serie(seed, tamanho=400):
+    rng = random.Random(seed)
+    return pd.Series([rng.choice(PRODUTOS) for _ in range(tamanho)], index=rng.sample(range(10 * tamanho), tamanho))
+
+
+def _habitacao_legado(serie):
+    # cálculo do grupo de habitação na Senninha antes do cache por categoria
+    return (serie.astype(str).str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
+                 .str.lower().str.contains('habitacao', na=False))
+
+
+def test_slug_e_categoria_como_antes():
+    for produto in PRODUTOS + [None] + [nome.title() for nome in MAP_PRODUTOS]:
+        assert slugify_product_name(produto) == legado.slugify_product_name(produto), repr(produto)
+        assert map_financial_product(produto) == legado.map_financial_product(produto), repr(produto)
+
+
+def test_mapeamento_por_coluna_como_o_apply_por_linha():
+    for seed in range(20):
+        serie = _serie(seed)
+        esperado = serie.astype(str).apply(legado.map_financial_product)
+
+        for entrada in (serie, serie.astype("category")):
+            resultado = map_financial_products(entrada)
+            assert resultado.dtype == object
+            assert resultado.index.equals(serie.index)
+            assert resultado.tolist() == esperado.tolist()
+
+
+def test_habitacao_por_coluna_como_o_pipeline_de_str():
+    for seed in range(20):
+        serie = _serie(seed)
+        resultado = map_by_category(serie.astype(str).astype("category"), is_habitacao_product).astype(bool)
+        assert resultado.tolist() == _habitacao_legado(serie).tolist()
+
+
+def test_categorias_e_nulos():
+    serie = pd.Series(pd.Categorical(["Crédito pessoal", None, "Factoring", np.nan],
+                                     categories=["Factoring", "Crédito pessoal", "Sem uso"]))
+    chamadas = []
+
+    resultado = map_by_category(serie, lambda produto: chamadas.append(produto) or produto.upper())
+
+    assert resultado.tolist() == ["CRÉDITO PESSOAL", None, "FACTORING", None]
+    assert chamadas == ["Factoring", "Crédito pessoal", "Sem uso"]  # uma vez por categoria
+    assert map_financial_products(pd.Series([], dtype=object)).empty
+
+
+def test_categorias_padronizadas():
+    assert map_financial_product("Crédito à habitação") == "Empréstimo bancário"
+    assert map_financial_product("Cartão de crédito") == "Cartão de crédito"
+    assert map_financial_product("Produto desconhecido") is None
+    assert is_habitacao_product("CRÉDITO À HABITAÇÃO") and not is_habitacao_product("Crédito pessoal")
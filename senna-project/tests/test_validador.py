@@ -0,0 +1,75 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import handlers.validador as validador
+import legado.validador as validador_legado
+from handlers.results_db import ResultsDB
+from services.senninha import Senninha
+from test_senninha import _df_aleatorio, _linha
+
+
+def _documentos(pasta):
+    """{nif: JSON} com os motivos de cada dívida ordenados (o legado usava list(set(...)))."""
+    documentos = {}
+    for nome in sorted(os.listdir(pasta)):
+        with open(os.path.join(pasta, nome), encoding="utf-8") as f:
+            documento = json.load(f)
+        for divida in documento["motivos"]:
+            divida["motivos_reprovacao"] = sorted(divida["motivos_reprovacao"])
+        # NaN != NaN: compara o texto
+        documentos[nome] = json.dumps(documento, ensure_ascii=False, sort_keys=True)
+    return documentos
+
+
+def _salvar_os_dois(df, tmp_path, monkeypatch):
+    novo, antigo = tmp_path / "novo", tmp_path / "antigo"
+    monkeypatch.setattr(validador, "NO_PERFILA_DIR", str(novo))
+    monkeypatch.setattr(validador_legado, "NO_PERFILA_DIR", str(antigo))
+    antigo.mkdir()
+    db = ResultsDB(db_path=str(tmp_path / "resultados.sqlite"))
+
+    validador.salvar_nao_perfilar(validador.aplicar_motivos(df), results_db=db)
+    validador_legado.salvar_nao_perfilar(df)
+    return _documentos(novo) if novo.exists() else {}, _documentos(antigo), db
+
+
+@pytest.mark.parametrize("lote", range(4))
+def test_mesmos_json_que_a_versao_linha_a_linha(lote, tmp_path, monkeypatch):
+    for seed in range(lote * 15, (lote + 1) * 15):
+        df = Senninha.aplicar(_df_aleatorio(seed))
+        pasta = tmp_path / str(seed)
+        pasta.mkdir()
+        novo, antigo, _ = _salvar_os_dois(df, pasta, monkeypatch)
+        assert novo == antigo, seed
+
+
+def test_motivos_por_divida(tmp_path, monkeypatch):
+    df = pd.DataFrame([
+        _linha(nif="1", instituicao="bpi", litigio="Sim", perfila=False),
+        _linha(nif="1", instituicao="bpi", perfila=False),
+        _linha(nif="1", instituicao="cgd", garantias=1.0, divida=np.nan, perfila=False),
+        _linha(nif="1", instituicao=None, perfila=False),
+        _linha(nif="1", instituicao="cgd", perfila=True),
+        _linha(nif="2", instituicao="bpi", perfila=True),
+    ])
+
+    motivos = validador.aplicar_motivos(df)
+    assert motivos["reprovacao_litigio"].tolist() == [True, False, False, False, False, False]
+    assert motivos["reprovacao_garantia"].tolist() == [False, False, True, False, False, False]
+    assert motivos["reprovacao_instituicao"].tolist() == [True, True, True, False, False, False]
+
+    novo, antigo, db = _salvar_os_dois(df, tmp_path, monkeypatch)
+    assert list(novo) == ["1.json"] and novo == antigo
+    documento = json.loads(novo["1.json"])
+    assert documento["resumo"] == {"nif": "1", "divida_total_elegivel": 3000.0, "perfila": False}
+    assert [d["motivos_reprovacao"] for d in documento["motivos"]] == [
+        sorted([validador.MOTIVO_LITIGIO, validador.MOTIVO_INSTITUICAO]),
+        [validador.MOTIVO_INSTITUICAO],
+        sorted([validador.MOTIVO_GARANTIA, validador.MOTIVO_INSTITUICAO]),
+        [validador.MOTIVO_PADRAO],
+    ]
+    assert db.consultar_nif("1")["nao_perfila"]["documento"]["resumo"]["divida_total_elegivel"] == 3000.0
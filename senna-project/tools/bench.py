@@ -0,0 +1,274 @@
+"""
+Benchmark ponta a ponta do pipeline sobre um corpus de MDR sintéticos (utils/mapa_sintetico.py).
+
+Mede, por etapa, a vazão e a latência (p50/p95 por chamada):
+  - descriptografia: PDFDecryptor.decrypt_bytes, por documento cifrado;
+  - extracao_texto: PDFTextExtractor.extract_pages, por documento com texto;
+  - ocr: extract_pages dos documentos digitalizados (ignorada sem tesseract/pdftoppm);
+  - parsing: PDFDataExtractor.extract_rows, por documento;
+  - perfilamento: Senninha.aplicar + aplicar_motivos sobre as linhas de todo o corpus;
+  - exportacao: CSV, Parquet, JSON Lines, JSON por cliente e não perfilados.
+
+Os resultados são comparados com o baseline gravado (tools/bench_baseline.json): uma etapa
+cuja vazão cair mais do que a tolerância é uma regressão e o comando termina com código 1.
+A comparação é normalizada por uma carga fixa de calibração (regex, strings e zlib, medida
+ao longo da execução e gravada no baseline): numa máquina duas vezes mais lenta, ou ocupada
+com outro processo, a calibração também demora o dobro e a vazão é corrigida na mesma proporção.
+Python, arquitetura ou número de CPUs diferentes do baseline geram só um aviso.
+As exportações são gravadas num diretório temporário (SENNA_MAPS_DIR), nunca em maps/.
+
+Uso (a partir da raiz do repositório):
+    python senna-project/tools/bench.py
+    python senna-project/tools/bench.py --docs 50 --paginas 5 --digitalizados 2
+    python senna-project/tools/bench.py --salvar-baseline     # grava o baseline desta máquina
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+
+PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(PROJETO, "src")
+BASELINE = os.path.join(PROJETO, "tools", "bench_baseline.json")
+
+ETAPAS = ("descriptografia", "extracao_texto", "ocr", "parsing", "perfilamento", "exportacao")
+UNIDADES = {
+    "descriptografia": "docs",
+    "extracao_texto": "páginas",
+    "ocr": "páginas",
+    "parsing": "páginas",
+    "perfilamento": "linhas",
+    "exportacao": "linhas",
+}
+# parâmetros do corpus que precisam coincidir para a comparação com o baseline fazer sentido
+PARAMETROS_CORPUS = ("docs", "paginas", "instituicoes", "produtos", "digitalizados", "seed")
+# ambiente do baseline: diferente só avisa (a calibração corrige a velocidade da máquina)
+AMBIENTE = ("python", "maquina", "cpus")
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicao = max(0, min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[posicao]
+
+def calibrar(vezes=5):
+    """
+    Durações (s) de uma carga fixa de CPU parecida com o pipeline (zlib, regex de valores e
+    strings): a unidade de velocidade desta máquina no momento da medição.
+    """
+    import re
+    import zlib
+    texto = ("Instituição: Banco Exemplo, S.A. Montante em dívida 12.345,67 € " * 200).encode()
+    valor = re.compile(r"(\d{1,3}(?:\.\d{3})*,\d{2})")
+    duracoes = []
+    for _ in range(vezes):
+        inicio = time.perf_counter()
+        for _ in range(40):
+            dados = zlib.decompress(zlib.compress(texto, 6)).decode()
+            sum(float(v.replace(".", "").replace(",", ".")) for v in valor.findall(dados))
+            sorted(dados.split())
+        duracoes.append(time.perf_counter() - inicio)
+    return duracoes
+
+class Medicao:
+    """Latências (s) de cada chamada de uma etapa e a quantidade de itens processados."""
+
+    def __init__(self):
+        self.latencias = []
+        self.itens = 0
+
+    @contextlib.contextmanager
+    def medir(self, itens=1):
+        inicio = time.perf_counter()
+        yield
+        self.latencias.append(time.perf_counter() - inicio)
+        self.itens += itens
+
+    def resumo(self):
+        total = sum(self.latencias)
+        return {
+            "chamadas": len(self.latencias),
+            "itens": self.itens,
+            "vazao": round(self.itens / total, 2) if total else None,
+            "p50_ms": round(_percentil(self.latencias, 50) * 1000, 3),
+            "p95_ms": round(_percentil(self.latencias, 95) * 1000, 3),
+        }
+
+def executar(args):
+    """
+    Gera o corpus, mede as etapas e devolve ({etapa: resumo ou None se ignorada}, calibração em
+    ms: mediana das medidas intercaladas com as repetições, sujeitas à mesma carga da máquina).
+    """
+    import pandas as pd
+    from utils.mapa_sintetico import gerar_mapa
+    from services.pdf_decryptor import PDFDecryptor
+    from services.pdf_text_extractor import PDFTextExtractor
+    from services.pdf_data_extractor import PDFDataExtractor
+    from services.senninha import Senninha
+    from handlers.pdf_output_handler import PDFOutputHandler
+    from handlers.validador import aplicar_motivos, salvar_nao_perfilar
+    from utils.log_config import configurar_logging
+
+    # modo silencioso de produção: só avisos e erros, pela fila do logging
+    configurar_logging(nivel="WARNING")
+
+    opcoes = dict(paginas=args.paginas, instituicoes=args.instituicoes, produtos=args.produtos)
+    cifrados = [gerar_mapa(args.seed + i, variante="cifrado", **opcoes) for i in range(args.docs)]
+    digitalizados = [gerar_mapa(args.seed + i, variante="digitalizado", **opcoes)
+                     for i in range(args.digitalizados)]
+    print(f"🧪 Corpus: {len(cifrados)} MDR cifrados e {len(digitalizados)} digitalizados "
+          f"({args.paginas} páginas cada).", file=sys.stderr)
+
+    decryptor = PDFDecryptor()
+    text_extractor = PDFTextExtractor(ocr_workers=1)
+    data_extractor = PDFDataExtractor()
+    medicoes = {etapa: Medicao() for etapa in ETAPAS}
+
+    # aquecimento: tabelas de bancos, regex e imports fora da medição
+    paginas = text_extractor.extract_pages(decryptor.decrypt_bytes(cifrados[0]))
+    Senninha.aplicar(data_extractor.extract_data({"aquecimento.pdf": paginas}))
+
+    calibracao = calibrar()
+    rows = []
+    for repeticao in range(args.repeticoes):
+        rows = []
+        for i, conteudo in enumerate(cifrados):
+            nome = f"mapa_{i:04d}.pdf"
+            with medicoes["descriptografia"].medir():
+                stream = decryptor.decrypt_bytes(conteudo)
+            with medicoes["extracao_texto"].medir(args.paginas):
+                paginas = text_extractor.extract_pages(stream)
+            with medicoes["parsing"].medir(len(paginas)):
+                rows.extend(data_extractor.extract_rows({nome: paginas}))
+
+        if shutil.which("tesseract") and shutil.which("pdftoppm"):
+            for conteudo in digitalizados:
+                with medicoes["ocr"].medir(args.paginas):
+                    text_extractor.extract_pages(io.BytesIO(conteudo))
+        elif digitalizados and repeticao == 0:
+            print("⚠️ tesseract/pdftoppm não encontrados: etapa de OCR ignorada.", file=sys.stderr)
+        calibracao += calibrar()
+
+    df_base = data_extractor.build_dataframe(rows)
+    output_handler = PDFOutputHandler()
+    for _ in range(args.repeticoes):
+        with medicoes["perfilamento"].medir(len(df_base)):
+            df = aplicar_motivos(Senninha.aplicar(df_base))
+        with medicoes["exportacao"].medir(len(df)):
+            salvar_nao_perfilar(df)
+            df = df.where(pd.notnull(df), None)
+            output_handler.save_to_csv(df)
+            output_handler.save_to_parquet(df)
+            output_handler.save_to_json(df)
+            output_handler.save_json_by_client(df)
+        calibracao += calibrar()
+
+    resultados = {etapa: (m.resumo() if m.latencias else None) for etapa, m in medicoes.items()}
+    return resultados, round(_percentil(calibracao, 50) * 1000, 3)
+
+def comparar(resultados, baseline, tolerancia, fator=1.0):
+    """
+    Linhas do relatório e lista de etapas com regressão de vazão em relação ao baseline; a vazão
+    atual é multiplicada por fator (calibração atual / do baseline) antes da comparação.
+    """
+    etapas_base = (baseline or {}).get("etapas", {})
+    linhas, regressoes = [], []
+    cabecalho = f"{'etapa':<16}{'chamadas':>9}{'vazão':>18}{'p50 ms':>11}{'p95 ms':>11}{'vs baseline':>14}"
+    linhas += [cabecalho, "-" * len(cabecalho)]
+    for etapa in ETAPAS:
+        atual = resultados.get(etapa)
+        if atual is None:
+            linhas.append(f"{etapa:<16}{'ignorada':>9}")
+            continue
+        vazao = f"{atual['vazao']:.1f} {UNIDADES[etapa]}/s"
+        comparacao = "—"
+        base = etapas_base.get(etapa)
+        if base and base.get("vazao") and atual["vazao"]:
+            variacao = atual["vazao"] * fator / base["vazao"] - 1
+            comparacao = f"{variacao:+.1%}"
+            if variacao < -tolerancia:
+                comparacao += " ❌"
+                regressoes.append(etapa)
+        linhas.append(f"{etapa:<16}{atual['chamadas']:>9}{vazao:>18}{atual['p50_ms']:>11.2f}"
+                      f"{atual['p95_ms']:>11.2f}{comparacao:>14}")
+    return linhas, regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline com MDR sintéticos.")
+    parser.add_argument("--docs", type=int, default=20, help="MDR cifrados no corpus")
+    parser.add_argument("--paginas", type=int, default=3)
+    parser.add_argument("--instituicoes", type=int, default=6, help="máximo de instituições por página")
+    parser.add_argument("--produtos", type=int, default=3, help="máximo de produtos por instituição")
+    parser.add_argument("--digitalizados", type=int, default=1, help="MDR só com imagem (etapa de OCR)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerancia", type=float, default=float(os.getenv("SENNA_BENCH_TOLERANCE", "0.25")),
+                        help="queda de vazão aceita antes de acusar regressão (0.25 = 25%%)")
+    parser.add_argument("--salvar-baseline", action="store_true", help="grava os resultados como novo baseline")
+    parser.add_argument("--json", help="grava o relatório completo neste arquivo")
+    args = parser.parse_args()
+
+    pasta_dados = tempfile.mkdtemp(prefix="senna-bench-")
+    os.environ["SENNA_MAPS_DIR"] = pasta_dados
+    sys.path.insert(0, SRC)
+    try:
+        resultados, calibracao_ms = executar(args)
+    finally:
+        shutil.rmtree(pasta_dados, ignore_errors=True)
+
+    relatorio = {
+        "parametros": {nome: getattr(args, nome) for nome in PARAMETROS_CORPUS + ("repeticoes",)},
+        "ambiente": {"python": platform.python_version(), "maquina": platform.machine(),
+                     "cpus": os.cpu_count(), "calibracao_ms": calibracao_ms},
+        "etapas": resultados,
+    }
+
+    baseline = None
+    fator = 1.0
+    if not args.salvar_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        diferentes = [nome for nome in PARAMETROS_CORPUS
+                      if baseline.get("parametros", {}).get(nome) != relatorio["parametros"][nome]]
+        if diferentes:
+            print(f"⚠️ Corpus diferente do baseline ({', '.join(diferentes)}): comparação apenas indicativa.")
+        ambiente_base = baseline.get("ambiente", {})
+        diferentes = [f"{nome} {ambiente_base.get(nome)} → {relatorio['ambiente'][nome]}" for nome in AMBIENTE
+                      if ambiente_base.get(nome) != relatorio["ambiente"][nome]]
+        if diferentes:
+            print(f"⚠️ Ambiente diferente do baseline ({', '.join(diferentes)}): comparação apenas indicativa.")
+        if ambiente_base.get("calibracao_ms"):
+            fator = calibracao_ms / ambiente_base["calibracao_ms"]
+            print(f"⚖️ Calibração {calibracao_ms:.1f} ms (baseline {ambiente_base['calibracao_ms']:.1f} ms): "
+                  f"vazões comparadas × {fator:.2f}.")
+        else:
+            print("⚠️ Baseline sem calibração: vazões comparadas sem normalização (grave-o de novo).")
+
+    linhas, regressoes = comparar(resultados, baseline, args.tolerancia, fator)
+    print("\n".join(linhas))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    if args.salvar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"💾 Baseline gravado em: {args.baseline}")
+        return 0
+    if regressoes:
+        print(f"❌ Regressão de vazão acima de {args.tolerancia:.0%} em: {', '.join(regressoes)}")
+        return 1
+    print("✅ Sem regressões em relação ao baseline." if baseline else "ℹ️ Sem baseline para comparar.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Verificação de regressão do tempo de import (python -X importtime) da CLI e da API.
+
+Cada módulo é importado num processo novo, com src/ no sys.path, e falha se:
+  - o tempo acumulado do import passar do orçamento;
+  - carregar um módulo que só deve ser importado quando usado (OCR, pandas, pyarrow, ...);
+  - tiver efeitos colaterais no import: criar pastas ou ler arquivos de dados.
+
+Os orçamentos são múltiplos de uma calibração medida na hora: o import de um conjunto fixo
+de módulos da biblioteca padrão num processo novo (o menor de algumas medidas). Numa máquina
+duas vezes mais lenta, a calibração também demora o dobro e o orçamento em ms acompanha.
+Um módulo acima do orçamento é medido mais uma vez antes de falhar (ruído da máquina).
+
+Uso (a partir da raiz do repositório):
+    python senna-project/tools/check_import_time.py
+    SENNA_IMPORT_BUDGET_SCALE=2 python senna-project/tools/check_import_time.py   # folga extra
+"""
+import os
+import re
+import sys
+import subprocess
+
+PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(PROJETO, "src")
+
+# módulo -> (orçamento em unidades de calibração, módulos que não podem ter sido carregados,
+# exige import sem efeitos); (o PIL em si não entra na lista: o pikepdf já o importa)
+OCR = ("pytesseract", "pdf2image")
+VERIFICACOES = {
+    "config": (0.5, OCR + ("pandas",), True),
+    "services.metrics": (0.5, OCR + ("pandas",), True),
+    "main": (2, OCR + ("pikepdf", "PyPDF2", "pandas", "numpy"), True),
+    "services.pdf_text_extractor": (4, OCR, True),
+    "services.pdf_data_extractor": (9, OCR, True),
+    "handlers.validador": (9, OCR, True),
+    "handlers.pdf_output_handler": (9, OCR, True),
+    "services.pdf_batch_processor": (12, OCR, True),
+    "api.app": (15, OCR, True),
+}
+
+# carga de calibração: só biblioteca padrão, nenhum deles carregado na inicialização do Python
+CALIBRACAO = ("decimal", "email.parser", "http.client", "logging.handlers", "sqlite3",
+              "xml.etree.ElementTree", "zipfile", "argparse", "csv", "json", "unittest")
+SONDA_CALIBRACAO = (
+    "import time; inicio = time.perf_counter(); import " + ", ".join(CALIBRACAO)
+    + "; print((time.perf_counter() - inicio) * 1000)"
+)
+
+def calibrar(vezes=5):
+    """ms do import da carga de calibração num processo novo: o menor de 'vezes' medidas."""
+    return min(
+        float(subprocess.run([sys.executable, "-c", SONDA_CALIBRACAO], capture_output=True, text=True,
+                             check=True).stdout)
+        for _ in range(vezes)
+    )
+
+# roda antes do import no processo filho: criar pastas ou abrir arquivos do projeto (caminhos
+# relativos ou dentro do repositório) é um efeito colateral; o import de módulos usa
+# io.open_code e não passa por builtins.open
+SONDA = """
+import builtins, os, sys
+sys.path.insert(0, {src!r})
+efeitos = []
+def _registrar(nome, original):
+    def sonda(*args, **kwargs):
+        caminho = os.fspath(args[0]) if isinstance(args[0], (str, os.PathLike)) else ""
+        if caminho and (not os.path.isabs(caminho) or os.path.realpath(caminho).startswith({raiz!r})):
+            efeitos.append(f"{{nome}}({{caminho!r}})")
+        return original(*args, **kwargs)
+    return sonda
+builtins.open = _registrar("open", builtins.open)
+os.makedirs = _registrar("os.makedirs", os.makedirs)
+os.mkdir = _registrar("os.mkdir", os.mkdir)
+import {modulo}
+proibidos = [m for m in {proibidos!r} if m in sys.modules]
+print("EFEITOS=" + repr(efeitos))
+print("PROIBIDOS=" + repr(proibidos))
+"""
+
+LINHA_IMPORTTIME = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def _importar(modulo, proibidos):
+    codigo = SONDA.format(src=SRC, raiz=os.path.realpath(PROJETO), modulo=modulo, proibidos=tuple(proibidos))
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        capture_output=True, text=True, cwd=SRC,
+    )
+    if resultado.returncode != 0:
+        return None, resultado
+    acumulado_us = next(
+        int(m.group(1)) for m in map(LINHA_IMPORTTIME.match, resultado.stderr.splitlines())
+        if m and m.group(3) == modulo and len(m.group(2)) == 1
+    )
+    return acumulado_us / 1000, resultado
+
+def verificar(modulo, orcamento_ms, proibidos, sem_efeitos):
+    ms, resultado = _importar(modulo, proibidos)
+    if ms is None:
+        return [f"falhou ao importar: {resultado.stderr.strip().splitlines()[-1]}"], None
+    if ms > orcamento_ms:
+        ms = min(ms, _importar(modulo, proibidos)[0] or ms)
+
+    saida = dict(linha.split("=", 1) for linha in resultado.stdout.splitlines() if "=" in linha)
+    problemas = []
+    if sem_efeitos and saida.get("EFEITOS", "[]") != "[]":
+        problemas.append(f"efeitos colaterais no import: {saida['EFEITOS']}")
+    if saida.get("PROIBIDOS", "[]") != "[]":
+        problemas.append(f"módulos carregados cedo demais: {saida['PROIBIDOS']}")
+    if ms > orcamento_ms:
+        problemas.append(f"{ms:.0f} ms acima do orçamento de {orcamento_ms:.0f} ms")
+    return problemas, ms
+
+def main():
+    escala = float(os.getenv("SENNA_IMPORT_BUDGET_SCALE", "1"))
+    unidade_ms = calibrar()
+    print(f"⚖️  Calibração: {unidade_ms:.0f} ms = 1 unidade")
+    falhas = 0
+    for modulo, (orcamento, proibidos, sem_efeitos) in VERIFICACOES.items():
+        orcamento_ms = orcamento * escala * unidade_ms
+        problemas, ms = verificar(modulo, orcamento_ms, proibidos, sem_efeitos)
+        tempo = f"{ms:7.0f} ms {ms / unidade_ms:5.1f} u" if ms is not None else "      - ms       - u"
+        if problemas:
+            falhas += 1
+            print(f"❌ {modulo:32} {tempo}")
+            for problema in problemas:
+                print(f"     {problema}")
+        else:
+            print(f"✅ {modulo:32} {tempo}  (orçamento {orcamento * escala:g} u = {orcamento_ms:.0f} ms)")
+    return 1 if falhas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())